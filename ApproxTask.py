@@ -29,6 +29,10 @@ class ApproxTask(Task):
         self.workload_quota = []
         self.backup_workload_quota = []
 
+        # the time-window and original workload-quota of the fault set by setEncounteredFault(), restored by resetEncounteredFault()
+        self.fault_window = None
+        self.fault_free_workload_quota = None
+
     def getDeadline(self):
         """
         Get the task deadline.
@@ -77,8 +81,12 @@ class ApproxTask(Task):
         """
         Reset for a new time-window whether the task encountered a fault.
         """
-        # reset the encounteredFault flag
-        self.encounteredFault = False
+        # restore the workload-quota that was shortened by the fault
+        if self.fault_window is not None:
+            self.workload_quota[self.fault_window] = self.fault_free_workload_quota
+            self.fault_window = None
+        # reset the encounteredFault flag and executed durations
+        Task.resetEncounteredFault(self)
 
     def setEncounteredFault(self, idx, faultOccurredTime):
         """
@@ -89,6 +97,8 @@ class ApproxTask(Task):
         # set the encounteredFault flag
         self.encounteredFault = True
         # set the new execution times for the task
+        self.fault_window = idx
+        self.fault_free_workload_quota = self.workload_quota[idx]
         self.workload_quota[idx] = self.workload_quota[idx] - faultOccurredTime
         self.lpExecutedDuration = self.workload_quota[idx]
         self.hpExecutedDuration = self.backup_workload_quota[idx]
@@ -1,8 +1,14 @@
+import numpy as np
+
+
 class Core:
     """
     Class which represents a Core in the System.
     It keeps track of the duration it has spent active (i.e. executing a task), and
     calculates its energy consumption based on its energy model parameters.
+
+    The active duration is recorded as busy intervals: the scheduler calls start_busy() when a task is assigned to the core
+    and end_busy() when it is released, and the durations are summed in bulk when they are needed.
     """
     def __init__(self, name, isLP, ai, f, xi, p_idle):
         """
@@ -17,7 +23,14 @@ class Core:
         """
         self.name = name
         self.energy_consumed = 0    # stores how much total energy this core consumed in the simulation duration
-        self.activeDuration = 0     # the duration this core was in active state, i.e. executing a task
+        self.activeDuration = 0     # the duration this core was in active state, in addition to the busy intervals
+
+        # busy intervals, one entry per task assignment to this core
+        self.busy_starts = []
+        self.busy_ends = []
+        self.busy_tasks = []    # id of the task executed in the interval
+        self.busy_windows = []  # time-window the interval belongs to (always 0 for FEST)
+        self.busy_current = None    # (start, task id, window) of the interval that is still open, if any
 
         # whether this core is an LP or HP core
         self.isLPCore = isLP
@@ -55,16 +68,99 @@ class Core:
         """
         Get the duration (in ms) that the core has been active (i.e. time spent executing a task).
         """
-        return self.activeDuration
+        return self.activeDuration + float(np.sum(self.get_busy_durations()))
 
     def update_active_duration(self, duration):
         """
-        Update the duration the core has spent active. This is updated incrementally while task execution is simulated.
+        Update the duration the core has spent active, outside of the recorded busy intervals.
 
         duration: increment the core's activeDuration by this amount.
         """
         self.activeDuration += duration
 
+    def start_busy(self, time, taskId, window=0):
+        """
+        Record that the core starts executing a task. Any interval that is still open is closed first.
+
+        time: the simulation time the task was assigned to the core
+        taskId: the id of the task
+        window: the time-window the task executes in
+        """
+        if self.busy_current is not None:
+            self.end_busy(time)
+        self.busy_current = (time, taskId, window)
+
+    def end_busy(self, time):
+        """
+        Record that the core stops executing its current task. Does nothing if the core is not executing a task.
+
+        time: the simulation time the task was released from the core
+        """
+        if self.busy_current is None:
+            return
+        start, taskId, window = self.busy_current
+        self.busy_starts.append(start)
+        self.busy_ends.append(time)
+        self.busy_tasks.append(taskId)
+        self.busy_windows.append(window)
+        self.busy_current = None
+
+    def add_busy_intervals(self, starts, ends, tasks, windows):
+        """
+        Append busy intervals recorded elsewhere (e.g. by a worker process simulating a time-window on a copy of this core).
+
+        starts: the start time of each interval
+        ends: the end time of each interval
+        tasks: id of the task executed in each interval
+        windows: time-window each interval belongs to
+        """
+        self.busy_starts.extend(starts)
+        self.busy_ends.extend(ends)
+        self.busy_tasks.extend(tasks)
+        self.busy_windows.extend(windows)
+
+    def get_busy_durations(self):
+        """
+        Get the duration of each closed busy interval, as a NumPy array.
+        """
+        return np.asarray(self.busy_ends, dtype=np.float64) - np.asarray(self.busy_starts, dtype=np.float64)
+
+    def get_task_energy(self):
+        """
+        Get the active energy consumption attributed to each task executed on this core, as a dict of task id -> energy.
+        """
+        return self._attribute_energy(self.busy_tasks)
+
+    def get_window_energy(self):
+        """
+        Get the active energy consumption attributed to each time-window, as a dict of time-window -> energy.
+        """
+        return self._attribute_energy(self.busy_windows)
+
+    def _attribute_energy(self, keys):
+        """
+        Sum the active energy consumption of the busy intervals per key.
+
+        keys: the key of each busy interval (e.g. its task id or time-window)
+        """
+        if not keys:
+            return dict()
+        unique_keys, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        durations = np.bincount(inverse, weights=self.get_busy_durations())
+        return {key: self.energy_consumption_active(duration) for key, duration in zip(unique_keys.tolist(), durations.tolist())}
+
+    def reset(self):
+        """
+        Clear the energy consumption, active duration and busy intervals, e.g. before simulating the next frame.
+        """
+        self.energy_consumed = 0
+        self.activeDuration = 0
+        self.busy_starts = []
+        self.busy_ends = []
+        self.busy_tasks = []
+        self.busy_windows = []
+        self.busy_current = None
+
     def update_energy_consumption(self, amount):
         """
         Update the energy consumption of the core.
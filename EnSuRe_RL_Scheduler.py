@@ -1,12 +1,14 @@
 import math
 import copy
 import random
+from Profiler import Profiler
+from TraceRecorder import TraceRecorder
 from stable_baselines3 import DQN  # You can use PPO if needed
 import numpy as np
 
 class EnSuRe_RL_Scheduler:
     # Init method with model integration
-    def __init__(self, k, frame, time_step, m_pri, lp_hp_ratio, log_debug):
+    def __init__(self, k, frame, time_step, m_pri, lp_hp_ratio, log_debug, profiler=None, trace=None):
         """
         Class constructor (__init__).
 
@@ -15,6 +17,8 @@ class EnSuRe_RL_Scheduler:
         time_step: fidelity of each time step for the scheduler/task execution times, in ms
         m_pri: number of primary (LP) cores
         log_debug: whether to print logging statements
+        profiler: Profiler to record phase timers and counters into (disabled if None)
+        trace: TraceRecorder to record the execution trace of simulate() into (disabled if None)
         model_path: path to the pre-trained model (DQN, PPO)
         """
         # Application parameters
@@ -32,9 +36,15 @@ class EnSuRe_RL_Scheduler:
         self.deadlines = None   # Array of task deadlines
         self.backup_start = []  # Backup start times for each time window
         self.backup_list = []   # Backup task lists for each time window
+        self.initial_backup_list = []   # backup_list as generated, restored by reset_simulation()
+        self.initial_backup_start = []
 
         # Logging
         self.log_debug = log_debug  # Whether to print log statements or not
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.trace = trace
+        # np.random.Generator for the fault generation of a run (set by System.run()); the global random module is used if None
+        self.rng = None
 
         model_path = 'dqn_ensure_model.zip'
         # Model loading if provided
@@ -62,10 +72,12 @@ class EnSuRe_RL_Scheduler:
     def remove_from_backup_list(self, idx, taskId, sim_time):
         """Remove task from backup list when it completes execution."""
         self.backup_list[idx] = [b for b in self.backup_list[idx] if b.getId() != taskId]
+        self.profiler.count("backup_removals")
         self.update_BB_overloading(idx, sim_time)
 
     def update_BB_overloading(self, idx, sim_time):
         """Update backup start time with the new size of the BB-overloading window."""
+        self.profiler.count("bb_overloading_updates")
         reserve_cap = 0
         l = min(self.k, len(self.backup_list[idx]))
         for z in range(l):
@@ -154,8 +166,18 @@ class EnSuRe_RL_Scheduler:
                 print("Unable to schedule tasks, WQ < time_window")
                 return False
 
+        self.initial_backup_list = [backup_list.copy() for backup_list in self.backup_list]
+        self.initial_backup_start = self.backup_start.copy()
         return True
 
+    def reset_simulation(self):
+        """Restore the backup lists, backup start times and task faults, to simulate the schedule again."""
+        self.backup_list = [backup_list.copy() for backup_list in self.initial_backup_list]
+        self.backup_start = self.initial_backup_start.copy()
+        for i in self.pri_schedule.keys():
+            for task in self.pri_schedule[i].values():
+                task.resetEncounteredFault()
+
     def print_schedule(self):
         """Print the generated schedule."""
         print("Schedule:")
@@ -168,39 +190,53 @@ class EnSuRe_RL_Scheduler:
         for i in range(len(self.deadlines)):
             print(f"  For time window {i}: {self.backup_start[i]} ms")
 
-    def simulate(self, lp_cores, hp_core):
-        """Simulate the task execution."""
+    def simulate(self, lp_cores, hp_cores):
+        """Simulate the task execution. Backup tasks only run on the first HP core; any others stay idle."""
+        hp_core = hp_cores[0]
         sim_time = 0
+        trace = self.trace
         for i in range(len(self.deadlines)):
             for t in self.pri_schedule[i].values():
                 t.resetEncounteredFault()
+            self.profiler.start("fault_generation")
             self.generate_fault_occurrences(i)
+            self.profiler.stop("fault_generation")
             lp_assignedTask = [None] * len(lp_cores)
             hp_assignedTask = None
             key = list(self.pri_schedule[i].keys())[0]
             keyIdx = 0
+            self.profiler.start("step_loop")
+            steps = 0
             while sim_time <= self.deadlines[i]:
-                for lp in range(len(lp_assignedTask)):
-                    if lp_assignedTask[lp] is not None:
-                        lp_cores[lp].update_active_duration(self.time_step)
-                if hp_assignedTask is not None:
-                    hp_core.update_active_duration(self.time_step)
+                steps += 1
                 for lp in range(len(lp_assignedTask)):
                     if lp_assignedTask[lp] is not None:
                         if sim_time >= lp_assignedTask[lp].getStartTime() + lp_assignedTask[lp].getWorkloadQuota(i):
+                            if trace is not None:
+                                trace.record(sim_time, lp, lp_assignedTask[lp].getId(), TraceRecorder.FAULT if lp_assignedTask[lp].getEncounteredFault() else TraceRecorder.COMPLETE)
                             if not lp_assignedTask[lp].getEncounteredFault():
                                 self.remove_from_backup_list(i, lp_assignedTask[lp].getId(), sim_time)
                                 if hp_assignedTask is not None and hp_assignedTask.getId() == lp_assignedTask[lp].getId():
+                                    if trace is not None:
+                                        trace.record(sim_time, TraceRecorder.HP_CORE, hp_assignedTask.getId(), TraceRecorder.BACKUP_CANCEL)
+                                    hp_core.end_busy(sim_time)
                                     hp_assignedTask = None
+                            lp_cores[lp].end_busy(sim_time)
                             lp_assignedTask[lp] = None
                 if hp_assignedTask is not None:
                     if self.backup_list[i] and sim_time >= hp_assignedTask.getBackupStartTime() + hp_assignedTask.getBackupWorkloadQuota(i):
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE, hp_assignedTask.getId(), TraceRecorder.COMPLETE)
                         self.remove_from_backup_list(i, hp_assignedTask.getId(), sim_time)
+                        hp_core.end_busy(sim_time)
                         hp_assignedTask = None
                 while keyIdx < len(self.pri_schedule[i]) and sim_time >= key[0]:
                     if lp_assignedTask[key[1]] is None or lp_assignedTask[key[1]].getId() != self.pri_schedule[i][key].getId():
                         lp_assignedTask[key[1]] = self.pri_schedule[i][key]
                         lp_assignedTask[key[1]].setStartTime(sim_time)
+                        lp_cores[key[1]].start_busy(sim_time, lp_assignedTask[key[1]].getId(), i)
+                        if trace is not None:
+                            trace.record(sim_time, key[1], lp_assignedTask[key[1]].getId(), TraceRecorder.START)
                     keyIdx += 1
                     if keyIdx >= len(self.pri_schedule[i]):
                         key = None
@@ -209,12 +245,26 @@ class EnSuRe_RL_Scheduler:
                 if sim_time >= self.backup_start[i]:
                     if self.backup_list[i]:
                         if hp_assignedTask is None or hp_assignedTask.getId() != self.backup_list[i][0].getId():
+                            if trace is not None:
+                                if hp_assignedTask is not None:
+                                    trace.record(sim_time, TraceRecorder.HP_CORE, hp_assignedTask.getId(), TraceRecorder.BACKUP_CANCEL)
+                                trace.record(sim_time, TraceRecorder.HP_CORE, self.backup_list[i][0].getId(), TraceRecorder.BACKUP_START)
                             hp_assignedTask = self.backup_list[i][0]
                             hp_assignedTask.setBackupStartTime(sim_time)
+                            hp_core.start_busy(sim_time, hp_assignedTask.getId(), i)
                     else:
+                        if trace is not None and hp_assignedTask is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE, hp_assignedTask.getId(), TraceRecorder.BACKUP_CANCEL)
+                        hp_core.end_busy(sim_time)
                         hp_assignedTask = None
                 sim_time += self.time_step
+            for lpcore in lp_cores:
+                lpcore.end_busy(sim_time - self.time_step)
+            hp_core.end_busy(sim_time - self.time_step)
+            self.profiler.stop("step_loop")
+            self.profiler.count("time_steps", steps)
 
+        self.profiler.start("energy_calculation")
         for lpcore in lp_cores:
             activeConsumption = lpcore.energy_consumption_active(lpcore.get_active_duration())
             lpcore.update_energy_consumption(activeConsumption)
@@ -225,6 +275,19 @@ class EnSuRe_RL_Scheduler:
         hp_core.update_energy_consumption(hp_activeConsumption)
         hp_idleConsumption = hp_core.energy_consumption_idle(self.frame - hp_core.get_active_duration())
         hp_core.update_energy_consumption(hp_idleConsumption)
+        for idle_core in hp_cores[1:]:
+            idle_core.update_energy_consumption(idle_core.energy_consumption_idle(self.frame))
+        self.profiler.stop("energy_calculation")
+
+    def random_time_step(self, num_steps):
+        """
+        Randomly sample a discrete time step in [0, num_steps], using the run's rng if one is set, else the global random module.
+
+        num_steps: the number of time steps in the sampled interval (rounded to an integer, as it is computed with floats)
+        """
+        if self.rng is None:
+            return random.randint(0, round(num_steps))
+        return int(self.rng.integers(0, round(num_steps), endpoint=True))
 
     def generate_fault_occurrences(self, idx):
         """Generate the fault occurrences for tasks."""
@@ -240,7 +303,7 @@ class EnSuRe_RL_Scheduler:
         for f in range(l):
             fault_time = None
             while fault_time is None:
-                rand = random.randint(0, time_window // self.time_step)
+                rand = self.random_time_step(time_window / self.time_step)
                 fault_time = (self.time_step * rand) + start_window
                 for key in self.pri_schedule[idx].keys():
                     task = self.pri_schedule[idx][key]
@@ -253,4 +316,5 @@ class EnSuRe_RL_Scheduler:
                             break
                 else:
                     fault_time = None
+                    self.profiler.count("fault_retries")
         return faulty_tasks
@@ -1,10 +1,54 @@
 import math
-import copy
+import heapq
+import bisect
 import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from ApproxTask import ApproxTask
+from Profiler import Profiler
+from TraceRecorder import TraceRecorder
+
+# the scheduler and cores a simulate_parallel() worker process simulates time-windows with, set by _init_window_worker()
+_worker_state = None
+
+
+def _init_window_worker(scheduler, lp_cores, hp_cores):
+    """
+    Initializer of the simulate_parallel() worker processes: keep their copy of the scheduler and cores.
+    """
+    global _worker_state
+    _worker_state = (scheduler, lp_cores, hp_cores)
+
+
+def _simulate_windows(windows):
+    """
+    Simulate a chunk of time-windows in a simulate_parallel() worker process, each on empty cores and with its own rng.
+    Returns a list with, per time-window: (time-window, busy intervals of each core, backup list state, trace records, profiler stats).
+
+    windows: list of (time-window, simulation time it starts at, seed of its rng)
+    """
+    scheduler, lp_cores, hp_cores = _worker_state
+    results = []
+    for i, start_time, seed in windows:
+        for core in lp_cores + hp_cores:
+            core.reset()
+        scheduler.rng = np.random.default_rng(seed)
+        scheduler.profiler = Profiler(scheduler.profiler.enabled)
+        if scheduler.trace is not None:
+            scheduler.trace = TraceRecorder()
+        scheduler.simulate_window(i, start_time, lp_cores, hp_cores)
+        busy = [(core.busy_starts, core.busy_ends, core.busy_tasks, core.busy_windows) for core in lp_cores + hp_cores]
+        backup = (scheduler.backup_live[i], scheduler.backup_head[i], scheduler.backup_count[i], scheduler.backup_start[i])
+        records = None if scheduler.trace is None else scheduler.trace.get_records()
+        results.append((i, busy, backup, records, scheduler.profiler.get_stats()))
+    return results
+
 
 class EnSuRe_Scheduler:
     # init
-    def __init__(self, k, frame, time_step, m_pri, lp_hp_ratio, log_debug):
+    def __init__(self, k, frame, time_step, m_pri, lp_hp_ratio, log_debug, profiler=None, trace=None, packing="round-robin",
+                 num_hp_cores=1, workers=1):
         """
         Class constructor (__init__).
 
@@ -13,6 +57,12 @@ class EnSuRe_Scheduler:
         time_step: fidelity of each time step for the scheduler/task execution times, in ms
         m_pri: number of primary (LP) cores
         log_debug: whether to print logging statements
+        profiler: Profiler to record phase timers and counters into (disabled if None)
+        trace: TraceRecorder to record the execution trace of simulate() into (disabled if None)
+        packing: how tasks are assigned to the LP cores in each time-window, "round-robin" (the original assignment), "best-fit"
+                 (the core with the least remaining capacity that fits) or "worst-fit" (the core with the most remaining capacity)
+        num_hp_cores: number of HP (backup) cores the backup tasks are spread across
+        workers: number of processes simulate() spreads the time-windows across (see simulate_parallel()); 1 simulates them in order
         """
         # application parameters
         self.k = k
@@ -24,15 +74,31 @@ class EnSuRe_Scheduler:
         # system parameters
         self.m_pri = m_pri  # no. primary cores
         self.lp_hp_ratio = lp_hp_ratio  # LP:HP speed ratio
+        if packing not in ("round-robin", "best-fit", "worst-fit"):
+            raise ValueError("Unknown packing policy {0!r}: expected 'round-robin', 'best-fit' or 'worst-fit'".format(packing))
+        self.packing = packing  # LP core assignment policy
+        self.num_hp_cores = num_hp_cores    # no. backup cores
+        self.workers = workers  # no. processes for simulating the time-windows
 
         # scheduler variables
         self.pri_schedule = dict()
         self.deadlines = None   # an array of the task deadlines, ordered in increasing order
+        self.tasks = []         # all scheduled tasks, ordered in increasing order of deadlines (the task table shared by all time windows)
+        self.task_index = dict()    # task id -> position in self.tasks
+        self.window_first = []  # position in self.tasks of the first task running in each time window (they run up to the last task)
         self.backup_start = []  # an array of backup start times, one per time window
-        self.backup_list = []   # an array of backup lists, one list per time window
+        self.backup_list = []   # an array of backup lists, one per time window: positions in self.tasks, in backup order
+        self.backup_live = []   # an array of bitmaps, one per time window: whether each running task (by position after window_first) is still in the backup list
+        self.backup_head = []   # an array of the position of the first live entry of each backup list
+        self.backup_count = []  # an array of the number of live entries of each backup list
+        self.initial_backup_start = []
 
         # logging
         self.log_debug = log_debug  # whether to print log statements or not
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.trace = trace
+        # np.random.Generator for the fault generation of a run (set by System.run()); the global random module is used if None
+        self.rng = None
 
     # class helper functions
     def getTaskDeadline(task):
@@ -61,23 +127,36 @@ class EnSuRe_Scheduler:
         idx: the current time-window
         taskId: id of the task to be removed
         """
-        # remove task from backup list
-        self.backup_list[idx] = [b for b in self.backup_list[idx] if b.getId() != taskId]
+        # remove task from backup list, by clearing its bit
+        live = self.backup_live[idx]
+        pos = self.task_index[taskId] - self.window_first[idx]
+        if live[pos]:
+            live[pos] = 0
+            self.backup_count[idx] -= 1
+            # move the head past the removed entries, so that the first entries are found without scanning them again
+            backup_list = self.backup_list[idx]
+            head = self.backup_head[idx]
+            while head < len(backup_list) and not live[backup_list[head] - self.window_first[idx]]:
+                head += 1
+            self.backup_head[idx] = head
+        self.profiler.count("backup_removals")
         # update size of BB-overloading window
         self.update_BB_overloading(idx, sim_time)
 
     def update_BB_overloading(self, idx, sim_time):
         """
         Update backup_start with the new size of the BB-overloading window for a particular time-window.
-        Up to k tasks will be reserved for BB-overloading.
+        Up to k tasks will be reserved for BB-overloading. They are spread across the HP cores in backup list order, each going
+        to the core with the least reserved time (a min-heap), as simulate() dispatches them; the window is the largest reserve.
 
         idx: the current time window
         """
+        self.profiler.count("bb_overloading_updates")
         # compute BB-overloading window size
-        reserve_cap = 0
-        l = min(self.k, len(self.backup_list[idx]))
-        for z in range(l):
-            reserve_cap += self.backup_list[idx][z].getBackupWorkloadQuota(idx) # NOTE: modification to schedule by backup workload quota
+        reserve = [0] * self.num_hp_cores
+        for task in self.get_backup_tasks(idx, self.k):
+            heapq.heapreplace(reserve, reserve[0] + task.getBackupWorkloadQuota(idx)) # NOTE: modification to schedule by backup workload quota
+        reserve_cap = max(reserve)
 
         # reserve reserve_cap units of backup slots
         new_backup_start = self.deadlines[idx] - reserve_cap
@@ -86,6 +165,164 @@ class EnSuRe_Scheduler:
         else:
             self.backup_start[idx] = max(sim_time, new_backup_start)
 
+    def get_backup_tasks(self, idx, count=None):
+        """
+        Get the tasks still in the backup list of a time-window, in backup order.
+
+        idx: the time-window
+        count: the maximum number of tasks to get, from the head of the backup list (all if None)
+        """
+        backup_list = self.backup_list[idx]
+        live = self.backup_live[idx]
+        first = self.window_first[idx]
+        if count is None:
+            count = self.backup_count[idx]
+        tasks = []
+        pos = self.backup_head[idx]
+        while len(tasks) < count and pos < len(backup_list):
+            if live[backup_list[pos] - first]:
+                tasks.append(self.tasks[backup_list[pos]])
+            pos += 1
+        return tasks
+
+    def reset_backup_lists(self):
+        """
+        Put every task back in the backup list of each time-window it runs in, as generated.
+        """
+        self.backup_live = [bytearray(b"\x01") * len(backup_list) for backup_list in self.backup_list]
+        self.backup_head = [0] * len(self.backup_list)
+        self.backup_count = [len(backup_list) for backup_list in self.backup_list]
+
+    def get_time_window(self, idx, deadlines=None):
+        """
+        Get the (start, size) of a time-window, in ms.
+
+        idx: the time-window
+        deadlines: the deadline sequence the time-windows are defined by (default: self.deadlines)
+        """
+        deadlines = self.deadlines if deadlines is None else deadlines
+        if idx == 0:  # first deadline
+            return 0, deadlines[idx]
+        return deadlines[idx-1], deadlines[idx] - deadlines[idx-1]
+
+    def assign_to_lp_cores(self, wqs, start_window, time_window):
+        """
+        Assign the primary copies of a time-window's tasks to the LP cores, in non-increasing order of workload-quota,
+        following the packing policy.
+        Returns a list of (task position, start time, core id) in assignment order, or None if a task cannot be assigned to any core.
+
+        wqs: the workload-quota of each task in this time-window
+        start_window: start of the time-window, in ms
+        time_window: size of the time-window, in ms
+        """
+        order = sorted(range(len(wqs)), key=lambda x: wqs[x], reverse=True)
+        if self.packing == "best-fit":
+            return self.assign_best_fit(wqs, order, start_window, time_window)
+        elif self.packing == "worst-fit":
+            return self.assign_worst_fit(wqs, order, start_window, time_window)
+        return self.assign_round_robin(wqs, order, start_window, time_window)
+
+    def assign_worst_fit(self, wqs, order, start_window, time_window):
+        """
+        Worst-fit assignment: each task goes to the core with the most remaining capacity (ties to the lowest core id),
+        kept in a min-heap of the cores' current end times, so each task takes O(log m_pri).
+        As the task is tried on the core with the most room, it fails only if it fits on no core.
+        """
+        end_window = start_window + time_window
+        pri_cores = [(start_window, core) for core in range(self.m_pri)]    # (end of the core's schedule, core id)
+        assignment = []
+        for x in order:
+            core_end, core = pri_cores[0]
+            if core_end + wqs[x] > end_window:     # does not fit on the emptiest core, so on none
+                return None
+            assignment.append((x, core_end, core))
+            heapq.heapreplace(pri_cores, (core_end + wqs[x], core))
+        return assignment
+
+    def assign_best_fit(self, wqs, order, start_window, time_window):
+        """
+        Best-fit assignment: each task goes to the core with the least remaining capacity that still fits it (ties to the
+        lowest core id), found by binary search in the cores sorted by their current end times.
+        The search takes O(log m_pri), but moving the chosen core to its new position in the sorted list is O(m_pri) (a memmove
+        of the list, which is faster than a balanced tree in Python for any practical number of cores), so each task takes O(m_pri).
+        """
+        end_window = start_window + time_window
+        pri_cores = [(start_window, core) for core in range(self.m_pri)]    # (end of the core's schedule, core id), sorted
+        assignment = []
+        for x in order:
+            wq = wqs[x]
+            # the fullest core that fits: the last one with core_end + wq <= end_window (searched around end_window - wq,
+            # then checked with the exact condition, as the subtraction can round differently; the check moves over whole
+            # groups of cores with the same end time, so it does not walk the cores one by one when many share an end time)
+            pos = bisect.bisect_right(pri_cores, (end_window - wq, self.m_pri))
+            while pos < len(pri_cores) and pri_cores[pos][0] + wq <= end_window:
+                pos = bisect.bisect_right(pri_cores, (pri_cores[pos][0], self.m_pri))
+            while pos > 0 and pri_cores[pos-1][0] + wq > end_window:
+                pos = bisect.bisect_left(pri_cores, (pri_cores[pos-1][0], -1))
+            if pos == 0:    # does not fit on the emptiest core, so on none
+                return None
+            # lowest core id among the cores with the same end time
+            first = bisect.bisect_left(pri_cores, (pri_cores[pos-1][0], -1))
+            core_end, core = pri_cores.pop(first)
+            assignment.append((x, core_end, core))
+            bisect.insort(pri_cores, (core_end + wq, core))
+        return assignment
+
+    def assign_round_robin(self, wqs, order, start_window, time_window):
+        """
+        Round-robin assignment (the original EnSuRe implementation): each task goes to the next core that still has room,
+        trying at most m_pri cores per task.
+        """
+        # keep track of cores' schedules
+        currPriCore = 0
+        pri_cores = [start_window] * self.m_pri
+        assignment = []
+        for x in order:
+            lp_executionTime = wqs[x]
+            # attempt to schedule onto this core
+            counter = 0
+            while pri_cores[currPriCore] + lp_executionTime > start_window + time_window:   # cannot be scheduled onto this core
+                # go to another core
+                currPriCore += 1
+                if currPriCore >= self.m_pri:
+                    currPriCore = 0
+                counter += 1
+                if counter > self.m_pri:    # not schedulable, exit
+                    return None
+
+            # schedule onto this core
+            assignment.append((x, pri_cores[currPriCore], currPriCore))
+            pri_cores[currPriCore] += lp_executionTime
+            # go to another core
+            currPriCore += 1
+            if currPriCore >= self.m_pri:
+                currPriCore = 0
+        return assignment
+
+    def build_time_window(self, idx, first, assignment):
+        """
+        Create the primary schedule of a time-window from its LP core assignment, and return the window's backup list.
+        The tasks are not copied: every time-window refers to the same task objects in self.tasks, whose per-window state
+        (fault, start times) is reset when the time-window is simulated, and the backup list holds their positions in self.tasks.
+
+        idx: the time-window
+        first: position in self.tasks of the first task running in this time-window (the tasks from it on, with their workload-quotas computed)
+        assignment: the LP core assignment, as returned by assign_to_lp_cores()
+        """
+        pri_schedule = {}
+        backup_list = array("l")
+        for x, start_time, core in assignment:
+            pri_schedule[(start_time, core)] = self.tasks[first + x]   # 2D array: [deadline] [(start_time, core_id)]
+            backup_list.append(first + x)
+
+        # sort the primary schedule by time
+        self.pri_schedule[idx] = dict(sorted(pri_schedule.items(), key=lambda key: key[0]))
+
+        # vi. schedule optional portion of tasks would come here (not used in this simulation)
+
+        # vii. create backup list, in the order the tasks were assigned (non-increasing workload-quota)
+        return backup_list
+
     # Function to generate schedule
     def generate_schedule(self, tasksList):
         """
@@ -98,16 +335,13 @@ class EnSuRe_Scheduler:
         tasksList.sort(reverse=False, key=EnSuRe_Scheduler.getTaskDeadline)
         self.deadlines = []
         [self.deadlines.append(task.getDeadline()) for task in tasksList if task.getDeadline() not in self.deadlines]   # NOTE: removes duplicate deadlines
+        self.tasks = tasksList.copy()   # all tasks, in order of deadlines (tasksList is consumed below)
+        self.task_index = {task.getId(): pos for pos, task in enumerate(self.tasks)}
 
         # 2. In each time window, schedule primary tasks onto the LP core
         for i in range(len(self.deadlines)): # each task in the list is the next deadline
             # i. calculate time window
-            if i == 0:  # first deadline
-                time_window = self.deadlines[i]
-                start_window = 0
-            else:
-                time_window = self.deadlines[i] - self.deadlines[i-1]
-                start_window = self.deadlines[i-1]
+            start_window, time_window = self.get_time_window(i)
 
             # ii. for each task, calculate workload-quota
             total_wq = 0
@@ -122,52 +356,22 @@ class EnSuRe_Scheduler:
             if total_wq <= time_window * self.m_pri: # equation satisfied, feasible schedule
 
                 # iv. execute tasks in the primary cores as per workload-quota
-                tasksA = copy.deepcopy(tasksList)
-                tasksA.sort(reverse=True, key=EnSuRe_Scheduler.getTaskWQ)
-                # keep track of cores' schedules
-                currPriCore = 0
-                pri_cores = [start_window] * self.m_pri
-                self.pri_schedule[i] = {}
-                for t in tasksA:
-                    lp_executionTime = t.getWorkloadQuota(i)
-                    # attempt to schedule onto this core
-                    counter = 0
-                    while pri_cores[currPriCore] + lp_executionTime > start_window + time_window:   # cannot be scheduled onto this core
-                        # go to another core
-                        currPriCore += 1
-                        if currPriCore >= self.m_pri:
-                            currPriCore = 0
-                        counter += 1
-                        if counter > self.m_pri:    # not schedulable, exit
-                            print("Unable to schedule tasks when trying to assign to LP cores")
-                            return False
-
-                    # schedule onto this core
-                    self.pri_schedule[i][(pri_cores[currPriCore], currPriCore)] = t # 2D array: [deadline] [(start_time, core_id)]
-                    t.setStartTime(pri_cores[currPriCore])
-                    pri_cores[currPriCore] += lp_executionTime
-                    # go to another core
-                    currPriCore += 1
-                    if currPriCore >= self.m_pri:
-                        currPriCore = 0
-
-                    # v. remove task from tasksList if workload-quota completes
-                    if self.deadlines[i] == t.getDeadline():    # true if task would be completed in this time window
-                        for t_toRemove in tasksList:
-                            if t_toRemove.getId() == t.getId():
-                                tasksList.remove(t_toRemove)
-                                break
-
-                # sort the primary schedule by time
-                self.pri_schedule[i] = dict(sorted(self.pri_schedule[i].items(), key=lambda key: key[0]))
-
-
-                # vi. schedule optional portion of tasks would come here (not used in this simulation)
-
-                # vii. create backup list
-                tempList = tasksA.copy()    # NOTE: taskA is used as it still contains the task that would get completed in this time window
-                #tempList.sort(reverse=True, key=EnSuRe_Scheduler.getTaskWQ) # NOTE: modification to schedule by backup workload quota
-                self.backup_list.append(tempList)
+                assignment = self.assign_to_lp_cores([task.getWorkloadQuota(i) for task in tasksList], start_window, time_window)
+                if assignment is None:
+                    print("Unable to schedule tasks when trying to assign to LP cores")
+                    return False
+
+                # vi.-vii. create the primary schedule and backup list
+                # NOTE: tasksList still contains the tasks that would get completed in this time window
+                first = len(self.tasks) - len(tasksList)
+                self.window_first.append(first)
+                self.backup_list.append(self.build_time_window(i, first, assignment))
+                self.backup_live.append(bytearray(b"\x01") * len(tasksList))
+                self.backup_head.append(0)
+                self.backup_count.append(len(tasksList))
+
+                # v. remove tasks from tasksList if workload-quota completes (true if task would be completed in this time window)
+                tasksList[:] = [t for t in tasksList if t.getDeadline() != self.deadlines[i]]
 
                 # viii. compute BB-overloading window size
                 self.update_BB_overloading(i, 0)
@@ -176,9 +380,211 @@ class EnSuRe_Scheduler:
                 print("Unable to schedule tasks, WQ < time_window")
                 return False
 
+        # keep the initial backup state, so that the schedule can be simulated again (the backup lists themselves are not changed)
+        self.initial_backup_start = self.backup_start.copy()
+
         # Generated schedule successfully
         return True
 
+    def admit(self, task):
+        """
+        Online admission: add a task to the generated schedule, without regenerating it from scratch.
+        Only the time-windows the task runs in (the ones up to its deadline, plus the window that is split if its deadline is new)
+        are recomputed; the later time-windows are kept as they are.
+        Returns True if the task was admitted, or False (leaving the schedule unchanged) if it is not schedulable.
+        To be called between simulations.
+
+        task: the ApproxTask to admit
+        """
+        deadline = task.getDeadline()
+        tasks = self.tasks.copy()
+        tasks.insert(bisect.bisect_right([t.getDeadline() for t in tasks], deadline), task)
+
+        j = bisect.bisect_left(self.deadlines, deadline)
+        if j < len(self.deadlines) and self.deadlines[j] == deadline:
+            return self.repair_time_windows(tasks, self.deadlines, j, 0)
+
+        # a new deadline splits time-window j in two
+        deadlines = self.deadlines[:j] + [deadline] + self.deadlines[j:]
+        last_affected = j + 1 if j + 1 < len(deadlines) else j
+        return self.repair_time_windows(tasks, deadlines, last_affected, 1)
+
+    def retire(self, taskId):
+        """
+        Online removal: remove a task from the generated schedule, without regenerating it from scratch.
+        Only the time-windows the task ran in are recomputed (merging its time-window into the next one if no other task has its deadline).
+        Returns True if the task was removed, or False if there is no such task.
+        To be called between simulations.
+
+        taskId: id of the task to remove
+        """
+        tasks = [t for t in self.tasks if t.getId() != taskId]
+        if len(tasks) == len(self.tasks):
+            return False
+        deadline = next(t.getDeadline() for t in self.tasks if t.getId() == taskId)
+
+        j = self.deadlines.index(deadline)
+        if any(t.getDeadline() == deadline for t in tasks):
+            return self.repair_time_windows(tasks, self.deadlines, j, 0)
+
+        # no task has this deadline anymore: time-window j is merged into the next one (or dropped, if it is the last)
+        deadlines = self.deadlines[:j] + self.deadlines[j+1:]
+        last_affected = j if j < len(deadlines) else j - 1
+        return self.repair_time_windows(tasks, deadlines, last_affected, -1)
+
+    def update_task(self, taskId, lp_execTime=None, hp_execTime=None, deadline=None):
+        """
+        Online update: change the execution times and/or deadline of a scheduled task (e.g. after a WCET re-measurement),
+        without regenerating the schedule from scratch.
+        Only the time-windows the task runs in, before or after the change, are recomputed (plus the window that is split or
+        merged if the deadline sequence changed); the later time-windows are kept as they are.
+        Returns True if the task was updated, or False (leaving the schedule unchanged) if there is no such task or it is not schedulable.
+        To be called between simulations.
+
+        taskId: id of the task to update
+        lp_execTime: the new execution time on a LP Core (None to keep the current one)
+        hp_execTime: the new execution time on a HP Core (None to keep the current one)
+        deadline: the new deadline (None to keep the current one)
+        """
+        for pos in range(len(self.tasks)):
+            if self.tasks[pos].getId() == taskId:
+                break
+        else:
+            return False
+
+        old_task = self.tasks[pos]
+        task = ApproxTask(taskId,
+                          old_task.getLPExecutionTime() if lp_execTime is None else lp_execTime,
+                          old_task.getHPExecutionTime() if hp_execTime is None else hp_execTime,
+                          old_task.getDeadline() if deadline is None else deadline)
+        old_deadline = old_task.getDeadline()
+        new_deadline = task.getDeadline()
+
+        tasks = self.tasks.copy()
+        if new_deadline == old_deadline:
+            tasks[pos] = task
+            return self.repair_time_windows(tasks, self.deadlines, self.deadlines.index(old_deadline), 0)
+
+        del tasks[pos]
+        tasks.insert(bisect.bisect_right([t.getDeadline() for t in tasks], new_deadline), task)
+        deadlines = self.deadlines.copy()
+        if not any(t.getDeadline() == old_deadline for t in tasks):
+            deadlines.remove(old_deadline)
+        if new_deadline not in deadlines:
+            bisect.insort(deadlines, new_deadline)
+
+        # the task runs in the time-windows up to the later of its two deadlines, which all change; the time-window after them
+        # changes too, unless it started at a deadline that is in both deadline sequences
+        changed_deadline = max(old_deadline, new_deadline)
+        last_affected = bisect.bisect_right(deadlines, changed_deadline) - 1
+        if deadlines[last_affected] != changed_deadline or changed_deadline not in self.deadlines:
+            last_affected = min(last_affected + 1, len(deadlines) - 1)
+        return self.repair_time_windows(tasks, deadlines, last_affected, len(deadlines) - len(self.deadlines))
+
+    def get_task_time_windows(self, taskId):
+        """
+        Get the time-windows a task runs in, i.e. the ones up to its deadline, which are the ones recomputed when it changes.
+        Returns a range of time-window indices, or None if there is no such task.
+
+        taskId: id of the task
+        """
+        for t in self.tasks:
+            if t.getId() == taskId:
+                return range(self.deadlines.index(t.getDeadline()) + 1)
+        return None
+
+    def repair_time_windows(self, tasks, deadlines, last_affected, shift):
+        """
+        Recompute time-windows 0..last_affected for a changed task set, and keep the later time-windows as they are.
+        The later time-windows are moved by `shift` positions (1 if a time-window was inserted, -1 if one was removed).
+        The workload-quotas and LP core assignment of all affected time-windows are computed before anything is changed, so
+        the schedule is left unchanged if any of them is not schedulable.
+        Cost: O(R log R + n) for the R (task, time-window) pairs of the affected time-windows (every task runs in time-window 0,
+        so R >= n), plus moving the entries of the later time-windows when the no. tasks or time-windows changes: shifting the
+        tasks' workload-quota lists (a memmove per task) and offsetting the task positions in their backup lists.
+        Returns True if the schedule was repaired, or False if it is not schedulable.
+
+        tasks: the new task set, in order of deadlines
+        deadlines: the new deadline sequence
+        last_affected: the last time-window (in the new deadline sequence) that has to be recomputed
+        shift: how many positions the time-windows after last_affected moved
+        """
+        task_deadlines = [t.getDeadline() for t in tasks]
+        window_first = [bisect.bisect_left(task_deadlines, deadline) for deadline in deadlines]
+
+        # 1. compute the workload-quotas and LP core assignment of the affected time-windows
+        windows = []
+        for i in range(last_affected + 1):
+            start_window, time_window = self.get_time_window(i, deadlines)
+            running = tasks[window_first[i]:]
+            wqs = [self.roundUpTimeStep(t.getWeight() * time_window) for t in running]
+            bwqs = [self.roundUpTimeStep(self.lp_hp_ratio * t.getWeight() * time_window) for t in running]
+            if sum(wqs) > time_window * self.m_pri:
+                print("Unable to schedule tasks, WQ < time_window")
+                return False
+            assignment = self.assign_to_lp_cores(wqs, start_window, time_window)
+            if assignment is None:
+                print("Unable to schedule tasks when trying to assign to LP cores")
+                return False
+            windows.append((running, wqs, bwqs, assignment))
+
+        # 2. update the workload-quotas of the tasks in place: the entries of the affected time-windows are replaced by the
+        #    recomputed ones (resizing them if a time-window was inserted or removed), and the entries of the later time-windows
+        #    are kept (restoring any workload-quota shortened by a simulated fault first)
+        keep_from = last_affected + 1 - shift   # first time-window in the old deadline sequence that is kept
+        for pos, t in enumerate(tasks[window_first[0]:], window_first[0]):
+            t.resetEncounteredFault()
+            num_affected = min(bisect.bisect_right(window_first, pos, 0, last_affected + 1), last_affected + 1)
+            num_old = min(keep_from, len(t.workload_quota))
+            t.workload_quota[:num_old] = [0.0] * num_affected
+            t.backup_workload_quota[:num_old] = [0.0] * num_affected
+        for i, (running, wqs, bwqs, _) in enumerate(windows):
+            for t, wq, bwq in zip(running, wqs, bwqs):
+                t.workload_quota[i] = wq
+                t.backup_workload_quota[i] = bwq
+
+        # 3. move the later time-windows to their new positions, and their backup lists to the new positions of their tasks in the
+        #    task table (their bitmaps are unchanged, as the tasks running in them keep their order)
+        kept_pri_schedule = [self.pri_schedule[i] for i in range(keep_from, len(self.deadlines))]
+        old_tasks = self.tasks
+        self.tasks = tasks
+        self.task_index = {t.getId(): pos for pos, t in enumerate(tasks)}
+        self.deadlines = deadlines
+        self.window_first = window_first
+        # the tasks of the later time-windows all come after the changed task, so their positions moved by the change in the no. tasks
+        delta = len(tasks) - len(old_tasks)
+        kept_backup_lists = self.backup_list[keep_from:] if delta == 0 else \
+            [array("l", (pos + delta for pos in backup_list)) for backup_list in self.backup_list[keep_from:]]
+
+        # 4. create the primary schedule, backup list and BB-overloading window of the affected time-windows
+        self.pri_schedule = dict()
+        backup_lists = [self.build_time_window(i, window_first[i], assignment) for i, (_, _, _, assignment) in enumerate(windows)]
+        for i, pri_schedule in enumerate(kept_pri_schedule):
+            self.pri_schedule[last_affected + 1 + i] = pri_schedule
+        self.backup_list = backup_lists + kept_backup_lists
+        self.backup_live = [bytearray(b"\x01") * len(backup_list) for backup_list in backup_lists] + self.backup_live[keep_from:]
+        self.backup_head = [0] * len(backup_lists) + self.backup_head[keep_from:]
+        self.backup_count = [len(backup_list) for backup_list in backup_lists] + self.backup_count[keep_from:]
+        kept_backup_start = self.backup_start[keep_from:]
+        kept_initial_backup_start = self.initial_backup_start[keep_from:]
+        self.backup_start = []
+        for i in range(last_affected + 1):
+            self.update_BB_overloading(i, 0)
+        self.initial_backup_start = self.backup_start + kept_initial_backup_start
+        self.backup_start = self.backup_start + kept_backup_start
+
+        return True
+
+    def reset_simulation(self):
+        """
+        Restore the scheduler state changed by simulate() (backup lists, backup start times, task faults),
+        so that the generated schedule can be simulated again, e.g. for the next frame.
+        """
+        self.reset_backup_lists()
+        self.backup_start = self.initial_backup_start.copy()
+        for task in self.tasks:
+            task.resetEncounteredFault()
+
     def print_schedule(self):
         """
         Print the generated schedule to the console log.
@@ -194,103 +600,33 @@ class EnSuRe_Scheduler:
         for i in range(len(self.deadlines)): # each task in the list is the next deadline 
             print("  For time window {0}: {1} ms".format(i, self.backup_start[i]))
 
-    def simulate(self, lp_cores, hp_core):
+    def simulate(self, lp_cores, hp_cores):
         """
         Simulate the execution of the tasks. The high-level steps:
         1. For each time window,
             a. Generate a list of fault occurrences
             b. Simulate the time steps:
-                i.  Increment the active duration of all cores that were executing a task in the previous time step
+                i.  Record the busy intervals of the cores, as tasks are assigned to and released from them in steps ii-v
                 ii. Update system for primary task(s) that have completed execution
-                iii. Update system if a backup task has completed execution
+                iii. Update system for backup task(s) that have completed execution
                 iv. Update assignment of primary tasks to LP cores
-                v.  Update assignment of backup tasks to HP core
+                v.  Update assignment of backup tasks to HP cores: the first num_hp_cores tasks of the backup list run, each
+                    started on the free HP core that has been available the longest (a min-heap of core availability)
         2. Calculate the energy consumption of the system
+        With workers > 1, the time-windows of step 1 are simulated independently on a process pool (see simulate_parallel()).
 
         lp_cores: list of references to the LP Core objects in the System.
-        hp_core: reference to the HP Core object in the System.
+        hp_cores: list of references to the HP Core objects in the System.
         """
-        sim_time = 0
-        for i in range(len(self.deadlines)):
-            # reset fault encountering for tasks first
-            for t in self.pri_schedule[i].values():
-                t.resetEncounteredFault()
-
-            # 1. Calculate the times when faults occur
-            self.generate_fault_occurrences(i)
-
-            # 2. Simulate time steps
-            lp_assignedTask = [None] * len(lp_cores)
-            hp_assignedTask = None
-            key = list(self.pri_schedule[i].keys())[0]
-            keyIdx = 0
-            while sim_time <= self.deadlines[i]:
-                # i. increment active durations
-                for lp in range(len(lp_assignedTask)):
-                    if not lp_assignedTask[lp] is None:
-                        lp_cores[lp].update_active_duration(self.time_step)
-                if not hp_assignedTask is None:
-                    hp_core.update_active_duration(self.time_step)
-
-                # ii. if a primary task has completed, unassign it from core
-                for lp in range(len(lp_assignedTask)):
-                    if not lp_assignedTask[lp] is None:
-                        if sim_time >= lp_assignedTask[lp].getStartTime() + lp_assignedTask[lp].getWorkloadQuota(i):
-                            # if it is a task that shouldn't have encountered an error
-                            if not lp_assignedTask[lp].getEncounteredFault():
-                                # remove from backup list
-                                self.remove_from_backup_list(i, lp_assignedTask[lp].getId(), sim_time)
-                                # if its backup task is already executing and it completed (i.e. did not encounter a fault), cancel the backup task
-                                if not hp_assignedTask is None and hp_assignedTask.getId() == lp_assignedTask[lp].getId():
-                                    hp_assignedTask = None
-
-                            # unassign from core
-                            lp_assignedTask[lp] = None
-
-                # iii. if a backup task has completed, remove it from backup core
-                if not hp_assignedTask is None:
-                    if self.backup_list[i] and sim_time >= hp_assignedTask.getBackupStartTime() + hp_assignedTask.getBackupWorkloadQuota(i):
-                        #remove from backup list
-                        self.remove_from_backup_list(i, hp_assignedTask.getId(), sim_time)
-
-                        # unassign from core
-                        hp_assignedTask = None
-
-                # iv. update primary task assignment to cores
-                while (keyIdx < len(self.pri_schedule[i])) and sim_time >= key[0]:
-                    # it actually completed execution, but floating point's a bitch
-                    if not lp_assignedTask[key[1]] is None and lp_assignedTask[key[1]].getId() != self.pri_schedule[i][key].getId():
-                        # if it is a task that shouldn't have encountered an error
-                        if not lp_assignedTask[key[1]].getEncounteredFault():
-                            # iii. remove from backup list
-                            self.remove_from_backup_list(i, lp_assignedTask[key[1]].getId(), sim_time)
-                            # if its backup task is already executing and it completed (i.e. did not encounter a fault), cancel the backup task
-                            if hp_assignedTask is not None and hp_assignedTask.getId() == lp_assignedTask[key[1]].getId():
-                                hp_assignedTask = None
-
-                    if lp_assignedTask[key[1]] is None or lp_assignedTask[key[1]].getId() != self.pri_schedule[i][key].getId():
-                        lp_assignedTask[key[1]] = self.pri_schedule[i][key]
-                        lp_assignedTask[key[1]].setStartTime(sim_time)
-
-                    keyIdx += 1
-                    if keyIdx >= len(self.pri_schedule[i]):
-                        key = None
-                    else:
-                        key = list(self.pri_schedule[i].keys())[keyIdx]
-
-                # v. update task assignment to backup core
-                if sim_time >= self.backup_start[i]:
-                    if self.backup_list[i]:
-                        # task hasn't started on backup core yet
-                        if hp_assignedTask is None or hp_assignedTask.getId() != self.backup_list[i][0].getId():
-                            hp_assignedTask = self.backup_list[i][0]
-                            hp_assignedTask.setBackupStartTime(sim_time)
-                    else:
-                        hp_assignedTask = None
-
-                sim_time += self.time_step
+        if self.workers > 1 and len(self.deadlines) > 1:
+            self.simulate_parallel(lp_cores, hp_cores)
+        else:
+            sim_time = 0
+            for i in range(len(self.deadlines)):
+                sim_time = self.simulate_window(i, sim_time, lp_cores, hp_cores)
 
         # 3. Calculate energy consumption of the system from active/idle durations
+        self.profiler.start("energy_calculation")
         for lpcore in lp_cores:
             # i. calculate active energy consumption for this core
             activeConsumption = lpcore.energy_consumption_active(lpcore.get_active_duration())
@@ -299,13 +635,201 @@ class EnSuRe_Scheduler:
             idleConsumption = lpcore.energy_consumption_idle(self.frame - lpcore.get_active_duration())
             lpcore.update_energy_consumption(idleConsumption)
         
-        # iii. calculate active energy consumption for HP core
-        hp_activeConsumption = hp_core.energy_consumption_active(hp_core.get_active_duration())
-        hp_core.update_energy_consumption(hp_activeConsumption)
-        # iv. calculate idle energy consumption for HP core
-        hp_idleConsumption = hp_core.energy_consumption_idle(self.frame - hp_core.get_active_duration())
-        hp_core.update_energy_consumption(hp_idleConsumption)
+        for hp_core in hp_cores:
+            # iii. calculate active energy consumption for HP core
+            hp_activeConsumption = hp_core.energy_consumption_active(hp_core.get_active_duration())
+            hp_core.update_energy_consumption(hp_activeConsumption)
+            # iv. calculate idle energy consumption for HP core
+            hp_idleConsumption = hp_core.energy_consumption_idle(self.frame - hp_core.get_active_duration())
+            hp_core.update_energy_consumption(hp_idleConsumption)
+        self.profiler.stop("energy_calculation")
+
+
+    def simulate_parallel(self, lp_cores, hp_cores):
+        """
+        Simulate the time-windows (step 1 of simulate()) on a pool of self.workers processes, and merge their results.
+        The time-windows only share the running simulation time and the cores' busy intervals: the start time of each
+        time-window is computed up front, by advancing the simulation time the same way simulate_window() does, and the busy
+        intervals, backup list state, trace records and profiler stats of each time-window are merged back in time-window order.
+        Each time-window draws its faults from its own rng, seeded from the run's rng (or the global random module), so the
+        faults differ from those of a sequential run with the same rng, but do not depend on the number of workers.
+        The tasks' fault state of the last simulated time-window is not merged back.
+
+        lp_cores: list of references to the LP Core objects in the System.
+        hp_cores: list of references to the HP Core objects in the System.
+        """
+        # start time of each time-window
+        starts = []
+        sim_time = 0
+        for deadline in self.deadlines:
+            starts.append(sim_time)
+            while sim_time <= deadline:
+                sim_time += self.time_step
+
+        # one rng seed per time-window
+        if self.rng is None:
+            seeds = [random.getrandbits(63) for _ in self.deadlines]
+        else:
+            seeds = self.rng.integers(0, 2**63, size=len(self.deadlines)).tolist()
+
+        # contiguous chunks of time-windows, a few per worker so that the workers stay busy
+        windows = [(i, starts[i], seeds[i]) for i in range(len(self.deadlines))]
+        chunk_size = math.ceil(len(windows) / (self.workers * 4))
+        chunks = [windows[c:c+chunk_size] for c in range(0, len(windows), chunk_size)]
+
+        cores = lp_cores + hp_cores
+        with ProcessPoolExecutor(self.workers, initializer=_init_window_worker, initargs=(self, lp_cores, hp_cores)) as pool:
+            for results in pool.map(_simulate_windows, chunks):
+                for i, busy, backup, records, stats in results:
+                    for core, intervals in zip(cores, busy):
+                        core.add_busy_intervals(*intervals)
+                    self.backup_live[i], self.backup_head[i], self.backup_count[i], self.backup_start[i] = backup
+                    if self.trace is not None:
+                        self.trace.extend(records)
+                    self.profiler.merge(stats)
+
+    def simulate_window(self, i, sim_time, lp_cores, hp_cores):
+        """
+        Simulate the time steps of a time-window (step 1 of simulate()), recording the busy intervals of the cores.
+        Returns the simulation time after the last time step of the time-window, where the next time-window starts.
 
+        i: the time-window
+        sim_time: the simulation time the time-window starts at
+        lp_cores: list of references to the LP Core objects in the System.
+        hp_cores: list of references to the HP Core objects in the System.
+        """
+        trace = self.trace
+        # reset fault encountering for tasks first
+        for t in self.pri_schedule[i].values():
+            t.resetEncounteredFault()
+
+        # 1. Calculate the times when faults occur
+        self.profiler.start("fault_generation")
+        self.generate_fault_occurrences(i)
+        self.profiler.stop("fault_generation")
+
+        # 2. Simulate time steps
+        lp_assignedTask = [None] * len(lp_cores)
+        hp_assignedTask = [None] * len(hp_cores)
+        hp_available = [(sim_time, hp) for hp in range(len(hp_cores))]    # min-heap of (time it became free, core) of the free HP cores
+        key = list(self.pri_schedule[i].keys())[0]
+        keyIdx = 0
+        self.profiler.start("step_loop")
+        steps = 0
+        while sim_time <= self.deadlines[i]:
+            steps += 1
+            # i. active durations are recorded as busy intervals whenever a task is assigned to or released from a core
+
+            # ii. if a primary task has completed, unassign it from core
+            for lp in range(len(lp_assignedTask)):
+                if not lp_assignedTask[lp] is None:
+                    if sim_time >= lp_assignedTask[lp].getStartTime() + lp_assignedTask[lp].getWorkloadQuota(i):
+                        if trace is not None:
+                            trace.record(sim_time, lp, lp_assignedTask[lp].getId(), TraceRecorder.FAULT if lp_assignedTask[lp].getEncounteredFault() else TraceRecorder.COMPLETE)
+                        # if it is a task that shouldn't have encountered an error
+                        if not lp_assignedTask[lp].getEncounteredFault():
+                            # remove from backup list
+                            self.remove_from_backup_list(i, lp_assignedTask[lp].getId(), sim_time)
+                            # if its backup task is already executing and it completed (i.e. did not encounter a fault), cancel the backup task
+                            for hp in range(len(hp_cores)):
+                                if not hp_assignedTask[hp] is None and hp_assignedTask[hp].getId() == lp_assignedTask[lp].getId():
+                                    if trace is not None:
+                                        trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.BACKUP_CANCEL)
+                                    hp_cores[hp].end_busy(sim_time)
+                                    hp_assignedTask[hp] = None
+                                    heapq.heappush(hp_available, (sim_time, hp))
+
+                        # unassign from core
+                        lp_cores[lp].end_busy(sim_time)
+                        lp_assignedTask[lp] = None
+
+            # iii. if a backup task has completed, remove it from backup core
+            for hp in range(len(hp_cores)):
+                if not hp_assignedTask[hp] is None:
+                    if self.backup_count[i] and sim_time >= hp_assignedTask[hp].getBackupStartTime() + hp_assignedTask[hp].getBackupWorkloadQuota(i):
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.COMPLETE)
+                        #remove from backup list
+                        self.remove_from_backup_list(i, hp_assignedTask[hp].getId(), sim_time)
+
+                        # unassign from core
+                        hp_cores[hp].end_busy(sim_time)
+                        hp_assignedTask[hp] = None
+                        heapq.heappush(hp_available, (sim_time, hp))
+
+            # iv. update primary task assignment to cores
+            while (keyIdx < len(self.pri_schedule[i])) and sim_time >= key[0]:
+                # it actually completed execution, but floating point's a bitch
+                if not lp_assignedTask[key[1]] is None and lp_assignedTask[key[1]].getId() != self.pri_schedule[i][key].getId():
+                    if trace is not None:
+                        trace.record(sim_time, key[1], lp_assignedTask[key[1]].getId(), TraceRecorder.FAULT if lp_assignedTask[key[1]].getEncounteredFault() else TraceRecorder.COMPLETE)
+                    # if it is a task that shouldn't have encountered an error
+                    if not lp_assignedTask[key[1]].getEncounteredFault():
+                        # iii. remove from backup list
+                        self.remove_from_backup_list(i, lp_assignedTask[key[1]].getId(), sim_time)
+                        # if its backup task is already executing and it completed (i.e. did not encounter a fault), cancel the backup task
+                        for hp in range(len(hp_cores)):
+                            if hp_assignedTask[hp] is not None and hp_assignedTask[hp].getId() == lp_assignedTask[key[1]].getId():
+                                if trace is not None:
+                                    trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.BACKUP_CANCEL)
+                                hp_cores[hp].end_busy(sim_time)
+                                hp_assignedTask[hp] = None
+                                heapq.heappush(hp_available, (sim_time, hp))
+
+                if lp_assignedTask[key[1]] is None or lp_assignedTask[key[1]].getId() != self.pri_schedule[i][key].getId():
+                    lp_assignedTask[key[1]] = self.pri_schedule[i][key]
+                    lp_assignedTask[key[1]].setStartTime(sim_time)
+                    lp_cores[key[1]].start_busy(sim_time, lp_assignedTask[key[1]].getId(), i)
+                    if trace is not None:
+                        trace.record(sim_time, key[1], lp_assignedTask[key[1]].getId(), TraceRecorder.START)
+
+                keyIdx += 1
+                if keyIdx >= len(self.pri_schedule[i]):
+                    key = None
+                else:
+                    key = list(self.pri_schedule[i].keys())[keyIdx]
+
+            # v. update task assignment to backup cores
+            if sim_time >= self.backup_start[i]:
+                # the tasks at the head of the backup list run on the backup cores; cancel any other running backup task
+                running = self.get_backup_tasks(i, len(hp_cores))
+                running_ids = [task.getId() for task in running]
+                for hp in range(len(hp_cores)):
+                    if hp_assignedTask[hp] is not None and hp_assignedTask[hp].getId() not in running_ids:
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.BACKUP_CANCEL)
+                        hp_cores[hp].end_busy(sim_time)
+                        hp_assignedTask[hp] = None
+                        heapq.heappush(hp_available, (sim_time, hp))
+
+                # task hasn't started on backup core yet
+                assigned_ids = [task.getId() for task in hp_assignedTask if task is not None]
+                for task in running:
+                    if task.getId() not in assigned_ids:
+                        _, hp = heapq.heappop(hp_available)
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE - hp, task.getId(), TraceRecorder.BACKUP_START)
+                        hp_assignedTask[hp] = task
+                        hp_assignedTask[hp].setBackupStartTime(sim_time)
+                        hp_cores[hp].start_busy(sim_time, task.getId(), i)
+
+            sim_time += self.time_step
+        # tasks still executing at the end of the time window were active up to its last time step
+        for core in lp_cores + hp_cores:
+            core.end_busy(sim_time - self.time_step)
+        self.profiler.stop("step_loop")
+        self.profiler.count("time_steps", steps)
+        return sim_time
+
+    def random_time_step(self, num_steps):
+        """
+        Randomly sample a discrete time step in [0, num_steps], using the run's rng if one is set, else the global random module.
+
+        num_steps: the number of time steps in the sampled interval (rounded to an integer, as it is computed with floats)
+        """
+        if self.rng is None:
+            return random.randint(0, round(num_steps))
+        return int(self.rng.integers(0, round(num_steps), endpoint=True))
 
     def generate_fault_occurrences(self, idx):
         """
@@ -344,7 +868,7 @@ class EnSuRe_Scheduler:
             # randomly generate until a valid fault_time for fault to occur is obtained
             while fault_time is None:
                 # randomly generate a time for the fault to occur
-                rand = random.randint(0, time_window / self.time_step)  # randint [0, time_window / self.time_step) generates the random timestep it occurs
+                rand = self.random_time_step(time_window / self.time_step)  # [0, time_window / self.time_step] generates the random timestep it occurs
                 fault_time = (self.time_step * rand) + start_window # get the actual time of the fault in ms
                 # check if time step is valid
                 for key in self.pri_schedule[idx].keys():
@@ -364,6 +888,7 @@ class EnSuRe_Scheduler:
 
                 else:   # the time step is after all the tasks arranged
                     fault_time = None
+                    self.profiler.count("fault_retries")
 
         return faulty_tasks
 
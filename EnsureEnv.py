@@ -6,14 +6,31 @@ from EnSuRe_Scheduler import EnSuRe_Scheduler
 from Task import Task
 from ApproxTask import ApproxTask
 from TasksetGenerator import TasksetGenerator
-import torch
-from torch_geometric.data import Data
-from torch_geometric.utils import dense_to_sparse
 
 class EnSuReEnv(gym.Env):
-    def __init__(self, num_lp_cores=2, frame_duration=200, lp_hp_ratio=0.8, sys_util=0.8, fault_prob=0.15):
+    def __init__(self, num_lp_cores=2, frame_duration=200, lp_hp_ratio=0.8, sys_util=0.8, fault_prob=0.15, graph_obs=False,
+                 compact_obs=False, obs_window=16, rng=None):
         super(EnSuReEnv, self).__init__()
 
+        # Random state of the episodes (task sets and faults): a seed or np.random.RandomState, or the global np.random state
+        # if None (the np.random module functions), so that e.g. each RolloutPool worker's env is reproducible on its own
+        if rng is None:
+            self.rng = np.random
+        elif isinstance(rng, np.random.RandomState):
+            self.rng = rng
+        else:
+            self.rng = np.random.RandomState(rng)
+
+        # Graph-observation mode: the observations also hold the edge_index of the task chain (task i -> task i+1), as a
+        # (2, max_tasks - 1) array zero-padded past the node_num - 1 edges of the episode, built once per episode.
+        self.graph_obs = graph_obs
+
+        # Compact-observation mode: the task features are stored once per episode, and each observation is the current task
+        # index, the features of a window of obs_window tasks from it, and the ready mask bit-packed (about 400 bytes instead
+        # of 24 KB), so the replay buffer can hold many more transitions.
+        self.compact_obs = compact_obs
+        self.obs_window = obs_window
+
         # Scheduling parameters
         self.num_lp_cores = num_lp_cores
         self.frame_duration = frame_duration
@@ -31,32 +48,49 @@ class EnSuReEnv(gym.Env):
         # Define observation space (graph-based state for GNN)
         # Define maximum tasks to set a fixed observation shape
         max_tasks = 2000  # Adjust as needed
+        self.max_tasks = max_tasks
 
         # Define observation space (graph-based state for GNN)
-        self.observation_space = spaces.Dict({
-            "graph": spaces.Box(low=-np.inf, high=np.inf, shape=(max_tasks, 2), dtype=np.float32),
-            "node_num": spaces.Discrete(max_tasks),
-            "ready": spaces.Box(low=0, high=1, shape=(max_tasks, 1), dtype=np.float32)
-        })
+        if self.compact_obs:
+            self.observation_space = spaces.Dict({
+                "index": spaces.Box(low=0, high=max_tasks, shape=(1,), dtype=np.int32),
+                "node_num": spaces.Box(low=0, high=max_tasks, shape=(1,), dtype=np.int32),
+                "window": spaces.Box(low=-np.inf, high=np.inf, shape=(obs_window, 2), dtype=np.float32),
+                "ready": spaces.Box(low=0, high=255, shape=((max_tasks + 7) // 8,), dtype=np.uint8)
+            })
+        else:
+            self.observation_space = spaces.Dict({
+                "graph": spaces.Box(low=-np.inf, high=np.inf, shape=(max_tasks, 2), dtype=np.float32),
+                "node_num": spaces.Discrete(max_tasks),
+                "ready": spaces.Box(low=0, high=1, shape=(max_tasks, 1), dtype=np.float32)
+            })
+        if self.graph_obs:
+            self.observation_space.spaces["edge_index"] = spaces.Box(low=0, high=max_tasks - 1, shape=(2, max_tasks - 1), dtype=np.int64)
 
         # Internal tracking of tasks
         self.current_task_index = 0
         self.tasks = []
+        self.task_features = np.zeros((0, 2), dtype=np.float32)    # features of the episode's tasks, computed once per episode
+        self.edge_index = np.zeros((2, max_tasks - 1), dtype=np.int64)    # edge_index of the episode's task chain (graph_obs)
         self.done = False
 
     def reset(self):
         """Reset the environment at the beginning of each episode using tasks from TasksetGenerator."""
         generator = TasksetGenerator(
-            distribution=np.random.choice(["uniform", "normal"]),  # Random distribution
-            n=np.random.randint(100, 2000),  # Random number of tasks
+            distribution=self.rng.choice(["uniform", "normal"]),  # Random distribution
+            n=self.rng.randint(100, 2000),  # Random number of tasks
             frame_duration=self.frame_duration,
-            sys_util=np.random.uniform(0.6, 0.9),  # Varying system utilization
-            precision_dp=2, num_lpcores=self.num_lp_cores, lp_hp_ratio=self.lp_hp_ratio
+            sys_util=self.rng.uniform(0.6, 0.9),  # Varying system utilization
+            precision_dp=2, num_lpcores=self.num_lp_cores, lp_hp_ratio=self.lp_hp_ratio,
+            seed=self.rng if self.rng is not np.random else None
         )
 
-        filename = f"tasksets/sysutil{self.sys_util}_cores{self.num_lp_cores}_0.csv"
-        generator.generate(filename)
-        self.tasks = self.load_tasks_from_file(filename)
+        # generated in memory, so that envs running in parallel processes do not share a taskset file
+        self.tasks = [ApproxTask(task_id, lp_exec_time, hp_exec_time, deadline)
+                      for task_id, lp_exec_time, hp_exec_time, deadline in generator.generate_rows()]
+        self.task_features = self._get_task_features()
+        if self.graph_obs:
+            self.edge_index = self._chain_edge_index(min(len(self.tasks), self.max_tasks))
 
         self.current_task_index = 0
         self.done = False
@@ -65,7 +99,7 @@ class EnSuReEnv(gym.Env):
     def _rl_decision_on_fault(self):
         """Simulate an RL decision-making step for handling fault cases."""
         # The agent can decide whether to retry on LP or move to HP
-        return np.random.choice(["LP", "HP"], p=[0.5, 0.5])  # 50% probability for each decision
+        return self.rng.choice(["LP", "HP"], p=[0.5, 0.5])  # 50% probability for each decision
 
     def step(self, action):
         """Take a step by scheduling the current task based on the RL action."""
@@ -80,7 +114,7 @@ class EnSuReEnv(gym.Env):
         execution_time = task.getHPExecutionTime() if action == 1 else task.getLPExecutionTime()
 
         # Simulate a fault occurrence with a probability
-        fault_occurred = np.random.rand() < self.fault_prob
+        fault_occurred = self.rng.rand() < self.fault_prob
 
         if fault_occurred:
             retry_action = self._rl_decision_on_fault()
@@ -116,31 +150,52 @@ class EnSuReEnv(gym.Env):
 
         return observation, reward, done, info
 
+    def _get_task_features(self):
+        """Compute the node features of the episode's tasks: LP and HP execution times relative to the frame, shape (n, 2)."""
+        return np.array([
+            [task.getLPExecutionTime() / self.frame_duration,
+             task.getHPExecutionTime() / self.frame_duration]
+            for task in self.tasks
+        ], dtype=np.float32).reshape(-1, 2)
+
     def _get_empty_state(self):
         """Return a fixed-size zeroed-out observation when the episode is done."""
-        max_tasks = 2000
+        max_tasks = self.max_tasks
+
+        if self.compact_obs:
+            state = {
+                "index": np.array([self.current_task_index], dtype=np.int32),
+                "node_num": np.array([0], dtype=np.int32),
+                "window": np.zeros((self.obs_window, 2), dtype=np.float32),
+                "ready": np.zeros((max_tasks + 7) // 8, dtype=np.uint8)
+            }
+        else:
+            state = {
+                "graph": np.zeros((max_tasks, 2), dtype=np.float32),  # ✅ Fixed-size zero padding
+                "node_num": np.array([0], dtype=np.int32),  # ✅ Fixed format
+                "ready": np.zeros((max_tasks, 1), dtype=np.float32)  # ✅ Fixed size
+            }
 
-        return {
-            "graph": np.zeros((max_tasks, 2), dtype=np.float32),  # ✅ Fixed-size zero padding
-            "node_num": np.array([0], dtype=np.int32),  # ✅ Fixed format
-            "ready": np.zeros((max_tasks, 1), dtype=np.float32)  # ✅ Fixed size
-        }
+        if self.graph_obs:
+            state["edge_index"] = np.zeros((2, max_tasks - 1), dtype=np.int64)
+        return state
 
     def _get_state(self):
         """Convert the scheduling state into a fixed-size NumPy array representation."""
-        max_tasks = 2000  # Fixed observation size
+        max_tasks = self.max_tasks  # Fixed observation size
 
         if self.done:
             return self._get_empty_state()
 
         num_tasks = len(self.tasks)
+        if self.compact_obs:
+            state = self._get_compact_state()
+            if self.graph_obs:
+                state["edge_index"] = self.edge_index
+            return state
 
-        # Convert node features into a NumPy array (Variable size)
-        node_features = np.array([
-            [task.getLPExecutionTime() / self.frame_duration,
-             task.getHPExecutionTime() / self.frame_duration]
-            for task in self.tasks
-        ], dtype=np.float32)
+        # Node features of the episode (Variable size)
+        node_features = self.task_features
 
         # **Fix**: Pad or truncate node_features to fit (2000, 2)
         if num_tasks < max_tasks:
@@ -154,11 +209,32 @@ class EnSuReEnv(gym.Env):
         ready = np.ones((max_tasks, 1), dtype=np.float32) if num_tasks > 0 else np.zeros((max_tasks, 1),
                                                                                          dtype=np.float32)
 
-        return {
+        state = {
             "graph": node_features,  # ✅ Always (2000, 2)
             "node_num": node_num,  # ✅ Always scalar array
             "ready": ready  # ✅ Always (2000, 1)
         }
+        if self.graph_obs:
+            state["edge_index"] = self.edge_index
+        return state
+
+    def _get_compact_state(self):
+        """
+        Encode the scheduling state compactly: the current task index and no. tasks, the node features of the window of
+        obs_window tasks from the current one (zero-padded past the last task), and the ready mask of _get_state() bit-packed.
+        """
+        num_tasks = min(len(self.tasks), self.max_tasks)
+        window = np.zeros((self.obs_window, 2), dtype=np.float32)
+        features = self.task_features[self.current_task_index:self.current_task_index + self.obs_window]
+        window[:len(features)] = features
+        ready = np.ones(self.max_tasks, dtype=bool) if num_tasks > 0 else np.zeros(self.max_tasks, dtype=bool)
+
+        return {
+            "index": np.array([self.current_task_index], dtype=np.int32),
+            "node_num": np.array([num_tasks], dtype=np.int32),
+            "window": window,
+            "ready": np.packbits(ready)
+        }
 
     def _calculate_reward(self, task, execution_time, assigned_core, fault_occurred):
         """Reward function with improved fault handling logic."""
@@ -176,20 +252,10 @@ class EnSuReEnv(gym.Env):
         # Ensure task execution is stored
         self.tasks[task_index].execution_time = execution_time
 
-        # Convert updated task features into a NumPy array
-        node_features = np.array([
-            [task.getLPExecutionTime() / self.frame_duration,
-             task.getHPExecutionTime() / self.frame_duration]
-            for task in self.tasks
-        ], dtype=np.float32)
+        # Task features (execution times do not change with the assignment, so the episode's features are reused)
+        node_features = self.task_features
 
-        # Ensure the adjacency matrix is converted into an edge list (compatible format)
         num_tasks = len(self.tasks)
-        adjacency_matrix = np.zeros((num_tasks, num_tasks))
-        for i in range(num_tasks - 1):
-            adjacency_matrix[i, i + 1] = 1
-
-        edge_index = dense_to_sparse(torch.tensor(adjacency_matrix, dtype=torch.float))[0].numpy()
 
         # Update the environment's state representation
         self.state = {
@@ -198,6 +264,21 @@ class EnSuReEnv(gym.Env):
             "ready": np.ones((num_tasks, 1), dtype=np.float32)
         }
 
+        if self.graph_obs:
+            self.state["edge_index"] = self.edge_index
+
+    def _chain_edge_index(self, num_tasks):
+        """
+        Build the edge list of the task chain (task i -> task i+1), in the (2, max_tasks - 1) layout of the observations:
+        the num_tasks - 1 edges in row-major order of the adjacency matrix (as torch_geometric's dense_to_sparse() lists them),
+        then zero padding.
+        """
+        edge_index = np.zeros((2, self.max_tasks - 1), dtype=np.int64)
+        num_edges = max(num_tasks - 1, 0)
+        edge_index[0, :num_edges] = np.arange(num_edges)
+        edge_index[1, :num_edges] = np.arange(1, num_edges + 1)
+        return edge_index
+
     def load_tasks_from_file(self, filepath):
         """Reads a taskset file and returns a list of Task objects."""
         tasks = []
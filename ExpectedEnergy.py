@@ -0,0 +1,219 @@
+import numpy as np
+from EnSuRe_Scheduler import EnSuRe_Scheduler
+
+
+def selection_moments(weights, l, values, num_nodes=256):
+    """
+    Moments of successive sampling: l items are drawn one after another without replacement, each draw picking a remaining
+    item with probability proportional to its weight (as generate_fault_occurrences() picks the faulty tasks, by rejecting
+    fault times that hit an already faulty task).
+    Drawing in this way is the same as giving every item an independent exponential clock with rate equal to its weight and
+    taking the first l clocks to ring, so both moments are integrals over the clock time t of Poisson-binomial distributions
+    of the number of clocks rung by t. These are computed by dynamic programming over the items (prefix and suffix tables of
+    the count up to l, so that each item can be left out in O(l)), at the nodes of a Gauss-Legendre quadrature in log(t).
+    Returns (pi, second_moment): the probability that each item is drawn, and E[(sum of the values of the drawn items)^2].
+
+    weights: the weight of each item (> 0)
+    l: number of items drawn (<= number of items)
+    values: the value of each item
+    num_nodes: number of quadrature nodes
+    """
+    weights = np.asarray(weights, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n = len(weights)
+    if l <= 0 or n == 0:
+        return np.zeros(n), 0.0
+    if l >= n:     # every item is drawn
+        return np.ones(n), values.sum() ** 2
+
+    # quadrature over t in log space, covering from (almost) no clock rung to (almost) all clocks rung
+    weights = weights / weights.sum()
+    x, x_weights = np.polynomial.legendre.leggauss(num_nodes)
+    lo, hi = np.log(1e-9 / weights.max()), np.log(50 / weights.min())
+    t = np.exp((x + 1) / 2 * (hi - lo) + lo)
+    dt = x_weights * (hi - lo) / 2 * t      # dt = t dx
+
+    rung = -np.expm1(-np.outer(t, weights))                   # (nodes, n) probability each clock has rung by t
+    density = weights * np.exp(-np.outer(t, weights))         # (nodes, n) density of each clock ringing at t
+
+    # prefix[j] / suffix[j]: the count distribution (P) and the first/second moments of the sum of values (M1, M2) of the rung
+    # clocks among the items before j / from j on, for counts 0..l-1
+    def tables(order):
+        P = np.zeros((n + 1, num_nodes, l))
+        M1 = np.zeros((n + 1, num_nodes, l))
+        M2 = np.zeros((n + 1, num_nodes, l))
+        P[0, :, 0] = 1
+        for step, i in enumerate(order):
+            p, v = rung[:, i, None], values[i]
+            P[step+1] = P[step] * (1 - p)
+            M1[step+1] = M1[step] * (1 - p)
+            M2[step+1] = M2[step] * (1 - p)
+            P[step+1, :, 1:] += P[step, :, :-1] * p
+            M1[step+1, :, 1:] += (M1[step, :, :-1] + v * P[step, :, :-1]) * p
+            M2[step+1, :, 1:] += (M2[step, :, :-1] + 2 * v * M1[step, :, :-1] + v * v * P[step, :, :-1]) * p
+        return P, M1, M2
+
+    pre_P, pre_M1, pre_M2 = tables(range(n))
+    suf_P, suf_M1, suf_M2 = tables(range(n - 1, -1, -1))
+    suf_P, suf_M1, suf_M2 = suf_P[::-1], suf_M1[::-1], suf_M2[::-1]     # suf[j] is now the items from j on
+
+    # the other items of item j are the ones before it (pre[j]) and after it (suf[j+1])
+    pre_P, pre_M1, pre_M2 = pre_P[:n], pre_M1[:n], pre_M2[:n]
+    suf_P, suf_M1, suf_M2 = suf_P[1:], suf_M1[1:], suf_M2[1:]
+
+    # item j is drawn if fewer than l other clocks rang before its own
+    suf_cum = np.cumsum(suf_P, axis=2)
+    not_full = np.einsum("jta,jta->tj", pre_P, suf_cum[:, :, ::-1])
+    pi = (density * not_full * dt[:, None]).sum(axis=0)
+
+    # E[X^2] by the item drawn last: it is j, ringing at t, with exactly l-1 other clocks rung before
+    rev = slice(None, None, -1)
+    P = np.einsum("jta,jta->tj", pre_P, suf_P[:, :, rev])
+    M1 = np.einsum("jta,jta->tj", pre_M1, suf_P[:, :, rev]) + np.einsum("jta,jta->tj", pre_P, suf_M1[:, :, rev])
+    M2 = (np.einsum("jta,jta->tj", pre_M2, suf_P[:, :, rev]) + 2 * np.einsum("jta,jta->tj", pre_M1, suf_M1[:, :, rev])
+          + np.einsum("jta,jta->tj", pre_P, suf_M2[:, :, rev]))
+    second_moment = (density * (values * values * P + 2 * values * M1 + M2) * dt[:, None]).sum()
+    return pi, second_moment
+
+
+def fault_step_owners(intervals, first_step, num_steps):
+    """
+    Find which task each candidate fault time step is attributed to, as generate_fault_occurrences() does before any fault:
+    the first task (in schedule order) whose interval contains it. Steps outside all intervals are rejected there (owner -1).
+    Returns (owner, overlap): the owner of each step, and whether any step lies in the intervals of tasks on different cores.
+
+    intervals: list of (first step, last step, core) of each task, in schedule order
+    first_step: the first candidate step
+    num_steps: the number of candidate steps
+    """
+    owner = np.full(num_steps, -1)
+    covered = np.zeros(num_steps + 1, dtype=int)
+    core_covered = dict()
+    for j in range(len(intervals) - 1, -1, -1):     # earlier tasks overwrite later ones
+        a, b, core = intervals[j]
+        a, b = max(a - first_step, 0), min(b - first_step, num_steps - 1)
+        if a > b:
+            continue
+        owner[a:b+1] = j
+        if core not in core_covered:
+            core_covered[core] = np.zeros(num_steps + 1, dtype=int)
+        core_covered[core][a] += 1
+        core_covered[core][b+1] -= 1
+    for diff in core_covered.values():
+        covered += np.cumsum(diff) > 0
+    return owner, bool((covered > 1).any())
+
+
+def window_moments(intervals, durations, backups, first_step, num_steps, l, time_step, lp_alpha, hp_beta, min_duration, num_nodes):
+    """
+    Expected value and variance of the change in energy caused by the faults of one frame (FEST) or time-window (EnSuRe),
+    relative to a run with no faults, plus the probability that each task is faulty.
+    A faulty task's primary copy executes (duration - relative fault time), at least min_duration, and its backup copy
+    executes for its whole backup duration on an HP core.
+
+    intervals: list of (first step, last step, core) of the fault time steps of each task, in schedule order
+    durations: the fault-free primary execution duration of each task
+    backups: the backup execution duration of each task
+    first_step, num_steps: the candidate fault time steps
+    l: number of faults
+    time_step: size of a time step, in ms
+    lp_alpha: active minus idle power of each task's LP core
+    hp_beta: active minus idle power of the HP cores
+    min_duration: the shortest primary execution the simulation can record
+    num_nodes: number of quadrature nodes
+    """
+    n = len(intervals)
+    owner, overlap = fault_step_owners(intervals, first_step, num_steps)
+    steps = np.arange(num_steps) + first_step
+    valid = owner >= 0
+
+    # moments of the LP time saved by a fault at a step uniformly chosen among the task's steps
+    starts = np.array([a for a, _, _ in intervals])
+    saved = (steps[valid] - starts[owner[valid]]) * time_step
+    saved = np.minimum(saved, np.maximum(np.asarray(durations)[owner[valid]] - min_duration, 0))
+    count = np.bincount(owner[valid], minlength=n).astype(float)
+    in_task = np.maximum(count, 1)
+    saved_mean = np.bincount(owner[valid], weights=saved, minlength=n) / in_task
+    saved_var = np.bincount(owner[valid], weights=saved * saved, minlength=n) / in_task - saved_mean ** 2
+
+    # tasks without any step cannot be faulty
+    faultable = count > 0
+    l = min(l, int(faultable.sum()))
+    value_mean = hp_beta * np.asarray(backups) - np.asarray(lp_alpha) * saved_mean
+    value_var = np.asarray(lp_alpha) ** 2 * np.maximum(saved_var, 0)
+
+    pi = np.zeros(n)
+    pi[faultable], second_moment = selection_moments(count[faultable], l, value_mean[faultable], num_nodes)
+    mean = (pi * value_mean).sum()
+    variance = max(second_moment - mean ** 2, 0) + (pi * value_var).sum()
+    lp_saved = pi * saved_mean
+    return mean, variance, pi, lp_saved, overlap
+
+
+def expected_energy(scheduler, lp_cores, hp_cores, num_nodes=256):
+    """
+    Compute the expected energy consumption of a generated schedule, and its variance, over the random fault times of
+    generate_fault_occurrences(), instead of averaging repeated simulations.
+    The energy is linear in the active durations of the cores, and a fault only shortens its task's primary execution
+    (linearly in the fault time) and makes its backup execute, so by linearity of expectation only the probability that
+    each task is faulty is needed; see selection_moments() for how it is computed exactly.
+    The result is exact (up to floating-point noise in the simulated times) when every backup task runs after all primary
+    tasks of its frame/time-window, and no fault time step lies in the primary copies of tasks on different LP cores.
+    Otherwise (e.g. EnSuRe with several LP cores, whose cores share the fault time steps and whose partial backups can be
+    cancelled) the expectation would not count the cancelled partial backups, so ValueError is raised instead of returning
+    an approximation.
+    Returns a dict {"energy", "variance", "lp_active_durations", "hp_active_duration"}.
+
+    scheduler: a FEST_Scheduler or EnSuRe_Scheduler that generated a schedule
+    lp_cores: list of the LP Core objects of the System (only their power parameters are used)
+    hp_cores: list of the HP Core objects of the System (only their power parameters are used)
+    num_nodes: number of quadrature nodes
+    """
+    time_step = scheduler.time_step
+    frame = scheduler.frame
+
+    def active_power(core):
+        return core.energy_consumption_active(1) - core.energy_consumption_idle(1)
+
+    hp_beta = active_power(hp_cores[0])
+    lp_active = [0.0] * len(lp_cores)
+    energy = sum(core.energy_consumption_idle(frame) for core in lp_cores + hp_cores)
+    variance = 0.0
+    hp_active = 0.0
+
+    if isinstance(scheduler, EnSuRe_Scheduler):     # EnSuRe: independent faults in every time-window
+        windows = []
+        for i in range(len(scheduler.deadlines)):
+            start_window, time_window = scheduler.get_time_window(i)
+            tasks = [(key, task) for key, task in scheduler.pri_schedule[i].items()]
+            intervals = [(round(key[0] / time_step), round((key[0] + task.getWorkloadQuota(i)) / time_step), key[1]) for key, task in tasks]
+            durations = [task.getWorkloadQuota(i) for _, task in tasks]
+            backups = [task.getBackupWorkloadQuota(i) for _, task in tasks]
+            cores = [key[1] for key, _ in tasks]
+            primary_end = max(key[0] + task.getWorkloadQuota(i) for key, task in tasks)
+            windows.append((intervals, durations, backups, cores, round(start_window / time_step), round(time_window / time_step) + 1,
+                            min(scheduler.k, len(tasks)), primary_end <= scheduler.initial_backup_start[i]))
+    else:                                   # FEST: faults in the frame, tasks run on the first LP core
+        tasks = list(scheduler.pri_schedule.items())
+        intervals = [(round(key / time_step), round((key + task.getLPExecutionTime()) / time_step) - 1, 0) for key, task in tasks]
+        durations = [task.getLPExecutionTime() for _, task in tasks]
+        backups = [task.getHPExecutionTime() for _, task in tasks]
+        primary_end = max(key + task.getLPExecutionTime() for key, task in tasks)
+        windows = [(intervals, durations, backups, [0] * len(tasks), 0, round(frame / time_step) + 1,
+                    min(scheduler.k, len(tasks)), primary_end <= scheduler.initial_backup_start)]
+
+    for intervals, durations, backups, cores, first_step, num_steps, l, backups_after_primaries in windows:
+        lp_alpha = [active_power(lp_cores[core]) for core in cores]
+        mean, var, pi, lp_saved, overlap = window_moments(intervals, durations, backups, first_step, num_steps, l, time_step,
+                                                          lp_alpha, hp_beta, time_step, num_nodes)
+        energy += mean + sum(alpha * duration for alpha, duration in zip(lp_alpha, durations))
+        variance += var
+        for core, duration, saved in zip(cores, durations, lp_saved):
+            lp_active[core] += duration - saved
+        hp_active += (pi * np.asarray(backups)).sum()
+        if not backups_after_primaries:
+            raise ValueError("The expected energy is not exact for this schedule: backup tasks start before the primary tasks end")
+        if overlap:
+            raise ValueError("The expected energy is not exact for this schedule: tasks on different LP cores share fault time steps")
+
+    return {"energy": energy, "variance": variance, "lp_active_durations": lp_active, "hp_active_duration": hp_active}
@@ -0,0 +1,195 @@
+import json
+import os
+import struct
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from System import System
+from Sweep import DEFAULT_PARAMS, tasks_from_rows
+from TasksetGenerator import TasksetGenerator
+
+
+def expert_trajectory(rows, params):
+    """
+    Run EnSuRe_Scheduler on a taskset, and get the (state, action) pairs its decisions imply, one per task per time-window.
+    The state of time-window i is in the format of EnSuRe_RL_Scheduler.extract_state(): a [deadline, weight, workload-quota]
+    row per task running in the time-window (in backup list order, i.e. non-increasing workload-quota), plus [m_pri, i].
+    The action of a task is the scheduler's decision for its backup copy, read from the generated schedule: 1 (HP) if it is
+    one of the first k tasks of the backup list, i.e. its backup is reserved a slot on an HP core by BB-overloading, and 0 (LP)
+    otherwise. The frame is not simulated, as which backups execute then depends on the random fault times, not on the
+    scheduler.
+    Returns a dict of arrays: "features" (rows, 3), "offsets" (time-windows + 1; time-window w is rows offsets[w]..offsets[w+1]),
+    "context" (time-windows, 2) and "actions" (rows,), or None if no feasible schedule is found.
+
+    rows: the taskset rows, as generated by TasksetGenerator.generate_rows()
+    params: dict of System parameters: k, frame, time_step, num_lp_cores, lp_hp_ratio, packing and num_hp_cores
+    """
+    system = System("EnSuRe", params["k"], params["frame"], params["time_step"], params["num_lp_cores"],
+                    params["lp_hp_ratio"], packing=params["packing"], num_hp_cores=params["num_hp_cores"])
+    scheduler = system.scheduler
+    if not scheduler.generate_schedule(tasks_from_rows(rows, "EnSuRe")):
+        return None
+
+    tasks = scheduler.tasks
+    positions = [backup_list.tolist() for backup_list in scheduler.backup_list]
+    lengths = [len(p) for p in positions]
+    features = np.empty((sum(lengths), 3), dtype=np.float64)
+    actions = np.zeros(sum(lengths), dtype=np.int8)
+    row = 0
+    for i, p in enumerate(positions):
+        features[row:row + len(p)] = [[tasks[x].getDeadline(), tasks[x].getWeight(), tasks[x].getWorkloadQuota(i)] for x in p]
+        actions[row:row + min(scheduler.k, len(p))] = 1    # the BB-overloading reserve of the time-window
+        row += len(p)
+    context = np.array([[scheduler.m_pri, i] for i in range(len(positions))], dtype=np.float64).reshape(-1, 2)
+
+    return {"features": features, "offsets": np.cumsum([0] + lengths, dtype=np.int64), "context": context, "actions": actions}
+
+
+def generate_expert_trajectory(config, params):
+    """
+    Generate a taskset in memory and get its expert trajectory (see expert_trajectory()), in a worker process.
+
+    config: dict of TasksetGenerator arguments the taskset is generated with
+    params: dict of System parameters
+    """
+    return expert_trajectory(TasksetGenerator(**config).generate_rows(), params)
+
+
+def load_shard(filename):
+    """
+    Open a shard written by ExpertDatasetBuilder, with each of its arrays memory-mapped read-only instead of read into memory
+    (np.load() cannot memory-map the arrays of a .npz file, but the shards are stored uncompressed, so each array is an
+    ordinary .npy file at some offset of the zip file). Returns a dict of array name -> np.memmap.
+
+    filename: the .npz shard
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                print("Error: {0} in {1} is compressed, and cannot be memory-mapped".format(info.filename, filename))
+                return None
+            # the data of a member follows its local file header, whose extra field can differ from the central directory's
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[info.filename[:-len(".npy")]] = np.memmap(filename, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                                             order="F" if fortran_order else "C")
+    return arrays
+
+
+class ExpertDatasetBuilder:
+    """
+    Class which builds an imitation dataset from EnSuRe_Scheduler for pretraining the RL policy: the tasksets are generated and
+    run through the scheduler on a process pool (see expert_trajectory()), and the trajectories are streamed into sharded .npz
+    files in the output directory, in taskset order, with a manifest.json describing the shards.
+    Each shard holds the trajectories of consecutive tasksets, concatenated:
+        features: float64 (rows, 3)        [deadline, weight, workload-quota] of each task in each state
+        actions:  int8 (rows,)             expert action of the task of each row, 0 (LP) or 1 (HP, in the BB-overloading reserve)
+        offsets:  int64 (states + 1,)      state s is rows offsets[s]..offsets[s+1]
+        context:  float64 (states, 2)      [m_pri, time-window] of each state
+        taskset:  int64 (states,)          index of the taskset each state comes from
+    The shards are uncompressed, so they can be memory-mapped with load_shard().
+    """
+
+    def __init__(self, out_dir, params=None, workers=None, shard_rows=1000000):
+        """
+        Class constructor (__init__).
+
+        out_dir: directory to write the shards and the manifest into
+        params: dict of System parameters; parameters not given take their DEFAULT_PARAMS value
+        workers: number of processes of the pool (the no. CPUs if None)
+        shard_rows: number of rows after which a shard is written
+        """
+        self.out_dir = out_dir
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update(params if params is not None else {})
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.shard_rows = shard_rows
+
+    def write_shard(self, trajectories, manifest):
+        """
+        Concatenate trajectories into the next shard, and add it to the manifest.
+
+        trajectories: list of (taskset index, trajectory dict) of consecutive tasksets
+        manifest: the manifest dict being built
+        """
+        num_rows = [len(trajectory["actions"]) for _, trajectory in trajectories]
+        num_states = [len(trajectory["context"]) for _, trajectory in trajectories]
+        row_offsets = np.cumsum([0] + num_rows[:-1], dtype=np.int64)
+        offsets = np.concatenate([trajectory["offsets"][:-1] + base for (_, trajectory), base in zip(trajectories, row_offsets)]
+                                 + [np.array([sum(num_rows)], dtype=np.int64)])
+        filename = "shard_{0:05d}.npz".format(len(manifest["shards"]))
+        np.savez(os.path.join(self.out_dir, filename),
+                 features=np.concatenate([trajectory["features"] for _, trajectory in trajectories]),
+                 actions=np.concatenate([trajectory["actions"] for _, trajectory in trajectories]),
+                 offsets=offsets,
+                 context=np.concatenate([trajectory["context"] for _, trajectory in trajectories]),
+                 taskset=np.repeat([t for t, _ in trajectories], num_states).astype(np.int64))
+        manifest["shards"].append({"file": filename, "rows": sum(num_rows), "states": sum(num_states),
+                                   "tasksets": [trajectories[0][0], trajectories[-1][0]]})
+        manifest["rows"] += sum(num_rows)
+        manifest["states"] += sum(num_states)
+
+    def build(self, taskset_configs, log_progress=False):
+        """
+        Build the dataset: generate and run every taskset, and write the shards and the manifest. Tasksets without a feasible
+        schedule are skipped (and counted in the manifest's "infeasible").
+        Returns the manifest dict.
+
+        taskset_configs: list (or iterable) of dicts of TasksetGenerator arguments, one per taskset
+        log_progress: whether to print a line per shard that is written
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        manifest = {"params": self.params, "columns": {"features": ["deadline", "weight", "workload_quota"],
+                    "context": ["m_pri", "time_window"]}, "tasksets": 0, "infeasible": 0, "rows": 0, "states": 0, "shards": []}
+        start = time.perf_counter()
+        pending = []        # (taskset index, trajectory) of the next shard
+        pending_rows = 0
+
+        def collect(t, future):
+            nonlocal pending_rows
+            manifest["tasksets"] += 1
+            trajectory = future.result()
+            if trajectory is None:
+                manifest["infeasible"] += 1
+                return
+            pending.append((t, trajectory))
+            pending_rows += len(trajectory["actions"])
+            if pending_rows >= self.shard_rows:
+                self.flush(pending, manifest, start, log_progress)
+                pending_rows = 0
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            # a bounded number of tasksets in flight, collected in order, so that the shards do not depend on the no. workers
+            futures = deque()
+            for t, config in enumerate(taskset_configs):
+                futures.append((t, pool.submit(generate_expert_trajectory, config, self.params)))
+                if len(futures) >= 4 * self.workers:
+                    collect(*futures.popleft())
+            while futures:
+                collect(*futures.popleft())
+        self.flush(pending, manifest, start, log_progress)
+
+        with open(os.path.join(self.out_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=1)
+        return manifest
+
+    def flush(self, pending, manifest, start, log_progress):
+        """
+        Write the trajectories added so far as a shard, and empty the list.
+        """
+        if pending:
+            self.write_shard(pending, manifest)
+            pending.clear()
+            if log_progress:
+                shard = manifest["shards"][-1]
+                print("Wrote {0}: {1} rows, {2} tasksets done in {3:.1f} s".format(shard["file"], shard["rows"], manifest["tasksets"],
+                                                                                  time.perf_counter() - start))
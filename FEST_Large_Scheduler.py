@@ -0,0 +1,521 @@
+import heapq
+import math
+import random
+import numpy as np
+from Profiler import Profiler
+from TraceRecorder import TraceRecorder
+
+
+class FEST_Large_Scheduler:
+    """
+    Class which implements FEST for large tasksets (up to millions of tasks), on NumPy arrays of the task parameters instead of
+    a dict of Task objects, with time and memory linear in the number of tasks and independent of the number of time steps:
+    - the primary start times are a cumulative sum of the sorted LP execution times
+    - the BB-overloading window is computed from prefix sums of the HP execution times of the backup list
+    - the fault times are mapped to their tasks with a binary search of the start times (searchsorted)
+    - the simulation works on the busy intervals of the cores: the primary intervals are computed in one NumPy pass, the first
+      step the backup list is dispatched to the HP cores is found from the prefix sums, and only the steps after it at which
+      something happens (a primary or backup copy ending) are stepped through
+    The simulated behaviour is that of FEST_Scheduler.simulate(), with times rounded up to whole time steps in the same way,
+    and the faults are drawn from the same random numbers, so a run gives the same busy intervals and energy consumption as
+    FEST_Scheduler. This is exact when the time step is a power of two (e.g. 0.0625 ms); otherwise FEST_Scheduler adds up its
+    simulation time in floating point, and the rounding can shift an event by a time step.
+    """
+    # init
+    def __init__(self, k, frame, time_step, log_debug, profiler=None, trace=None, num_hp_cores=1):
+        """
+        Class constructor (__init__).
+
+        k: number of faults the system can support
+        frame: size of the frame, in ms
+        time_step: fidelity of each time step for the scheduler/task execution times, in ms
+        log_debug: whether to print logging statements
+        profiler: Profiler to record phase timers and counters into (disabled if None)
+        trace: TraceRecorder to record the execution trace of simulate() into (disabled if None)
+        num_hp_cores: number of HP (backup) cores the backup tasks are spread across
+        """
+        # application parameters
+        self.k = k
+        self.frame = frame
+        self.time_step = time_step
+
+        # system parameters
+        self.num_hp_cores = num_hp_cores
+
+        # scheduler variables, with the tasks in schedule order (non-increasing LP execution time)
+        self.ids = None
+        self.lp_exec = None
+        self.hp_exec = None
+        self.start_times = None     # start time of each primary task on the LP core
+        self.end_times = None       # end time of each primary task on the LP core (the start time of the next one)
+        self.hp_prefix = None       # hp_prefix[i] is the total HP execution time of the first i tasks of the backup list
+        self.backup_start = 0
+        self.fault_times = None     # time of the fault relative to the task start time of each task, NaN if it has no fault
+        self.backup_ids = None      # ids of the tasks left in the backup list at the end of simulate()
+
+        # logging
+        self.log_debug = log_debug  # whether to print log statements or not
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.trace = trace
+        # np.random.Generator for the fault generation of a run (set by System.run()); the global random module is used if None
+        self.rng = None
+
+    def generate_schedule(self, tasksList):
+        """
+        Try to generate a schedule for the given task set, as FEST_Scheduler.generate_schedule() does.
+        Returns True if a feasible schedule is generated successfully, or False if no feasible schedule can be generated.
+        The tasks are not modified, so the task set does not need to be copied for every run.
+
+        tasksList: the task set to generate a schedule for, as a list of Task objects, or a dict of arrays {"ids", "lp_exec",
+                   "hp_exec"} (e.g. from TasksetCorpus.get_arrays())
+        """
+        if isinstance(tasksList, dict):
+            ids = np.asarray(tasksList["ids"], dtype=np.int64)
+            lp_exec = np.asarray(tasksList["lp_exec"], dtype=np.float64)
+            hp_exec = np.asarray(tasksList["hp_exec"], dtype=np.float64)
+        else:
+            ids = np.fromiter((task.getId() for task in tasksList), dtype=np.int64, count=len(tasksList))
+            lp_exec = np.fromiter((task.getLPExecutionTime() for task in tasksList), dtype=np.float64, count=len(tasksList))
+            hp_exec = np.fromiter((task.getHPExecutionTime() for task in tasksList), dtype=np.float64, count=len(tasksList))
+
+        # 1. Sort tasks in non-increasing order of execution time (stable, as list.sort(reverse=True) is)
+        order = np.argsort(-lp_exec, kind="stable")
+        lp_exec = lp_exec[order]
+
+        # 2. Schedule primary tasks back to back onto the LP core; cumsum adds sequentially, as FEST_Scheduler does
+        end_times = np.cumsum(lp_exec)
+        if len(end_times) > 0 and end_times[-1] > self.frame:
+            print("Unable to schedule tasks")
+            return False
+
+        self.ids = ids[order]
+        self.lp_exec = lp_exec
+        self.hp_exec = hp_exec[order]
+        self.end_times = end_times
+        self.start_times = np.concatenate(([0.0], end_times[:-1]))
+
+        # 3. Create backup list: the backup list is the schedule order, so only the prefix sums of its HP execution times are kept
+        self.hp_prefix = np.concatenate(([0.0], np.cumsum(self.hp_exec)))
+
+        # 4. Compute BB-overloading window size
+        l = min(self.k, len(self.ids))
+        self.backup_start = max(0, self.frame - self.get_reserve(self.hp_exec[:l]))
+        self.fault_times = None
+        self.backup_ids = None
+
+        # Generated schedule successfully
+        return True
+
+    def reset_simulation(self):
+        """
+        Clear the state of simulate() (task faults, backup list), so that the generated schedule can be simulated again, e.g. for
+        the next frame.
+        """
+        self.fault_times = None
+        self.backup_ids = None
+
+    def get_reserve(self, hp_times):
+        """
+        Get the size of the BB-overloading window reserved for backup tasks with the given HP execution times (in backup list
+        order). As in FEST_Scheduler.update_BB_overloading(), they are spread across the HP cores, each going to the core with the
+        least reserved time, and the window is the largest reserve.
+
+        hp_times: the HP execution times of the backup tasks reserved for
+        """
+        if self.num_hp_cores == 1:
+            return float(np.sum(hp_times))
+        reserve = [0] * self.num_hp_cores
+        for hp_time in hp_times:
+            heapq.heapreplace(reserve, reserve[0] + hp_time)
+        return max(reserve)
+
+    def to_step(self, time):
+        """
+        Get the first time step at or after the given time(s), i.e. the first step s with s * time_step >= time, the comparison
+        the simulation of FEST_Scheduler makes at every step (the division is corrected by a step where it is off by rounding).
+
+        time: time or array of times, in ms
+        """
+        time = np.asarray(time)
+        step = np.ceil(time / self.time_step).astype(np.int64)
+        step -= (step - 1) * self.time_step >= time
+        step += step * self.time_step < time
+        return step
+
+    def print_schedule(self):
+        """
+        Print the generated schedule to the console log.
+        """
+        print("Schedule:")
+        print(" Primary Tasks")
+        for start_time, taskId in zip(self.start_times.tolist(), self.ids.tolist()):
+            print("  {0} ms: LP Core, Task {1}".format(start_time, taskId))
+
+        print(" Backup Tasks")
+        print("  Start: {0} ms".format(self.backup_start))
+
+    def simulate(self, lp_cores, hp_cores):
+        """
+        Simulate the execution of the tasks, as FEST_Scheduler.simulate() does. The high-level steps:
+        1. Generate a list of fault occurrences
+        2. Compute the busy intervals of the LP core: each primary task starts at the first time step at or after its start time,
+           and runs until its executed duration has passed or the next task starts, whichever is first
+        3. Compute the busy intervals of the HP cores (see simulate_backups())
+        4. Calculate the energy consumption of the system from the busy intervals
+
+        lp_cores: list of references to the LP Core objects in the System.
+        hp_cores: list of references to the HP Core objects in the System.
+        """
+        time_step = self.time_step
+        last_step = int(self.to_step(self.frame))
+        last_step -= last_step * time_step > self.frame     # the last step s with s * time_step <= frame
+
+        # 1. Calculate the times when faults occur
+        self.profiler.start("fault_generation")
+        self.generate_fault_occurrences()
+        self.profiler.stop("fault_generation")
+
+        # 2. Primary copies on the LP core
+        self.profiler.start("primary_intervals")
+        faulty = ~np.isnan(self.fault_times)
+        executed = np.where(faulty, self.lp_exec - np.nan_to_num(self.fault_times), self.lp_exec)   # as Task.setEncounteredFault()
+        assigned = self.to_step(self.start_times)
+        # a task is released once its executed duration has passed (at least one step after it started), or when the next task starts
+        completed = np.maximum(assigned + 1, self.to_step(assigned * time_step + executed))
+        ended = np.minimum(completed, np.append(assigned[1:], np.iinfo(np.int64).max))
+        started = assigned <= last_step
+        released = ended <= last_step
+        # tasks that completed successfully within the frame are removed from the backup list when they end, the others are kept
+        removed = ~faulty & released
+        ended = np.where(started, np.minimum(ended, last_step), last_step + 1)
+
+        lp_starts = assigned[started] * time_step
+        lp_ends = ended[started] * time_step
+        lp_ids = self.ids[started]
+        lp_cores[0].add_busy_intervals(lp_starts.tolist(), lp_ends.tolist(), lp_ids.tolist(), [0] * len(lp_ids))
+        self.profiler.count("backup_removals", int(removed.sum()))
+        self.profiler.stop("primary_intervals")
+
+        # 3. Backup copies on the HP cores
+        self.profiler.start("backup_events")
+        trace = TraceRecorder() if self.trace is not None else None
+        self.backup_ids = self.ids[self.simulate_backups(ended, ~removed, last_step, hp_cores, trace)]
+        for hp_core in hp_cores:
+            hp_core.end_busy(last_step * time_step)
+        self.profiler.stop("backup_events")
+
+        if self.trace is not None:
+            # the primary copies released before the end of the frame completed, or stopped because of a fault
+            released = released[started]
+            records = np.zeros(len(lp_ids) + int(released.sum()), dtype=TraceRecorder.DTYPE)
+            records["time"] = np.concatenate((lp_starts, lp_ends[released]))
+            records["task"] = np.concatenate((lp_ids, lp_ids[released]))
+            records["kind"] = np.concatenate((np.full(len(lp_ids), TraceRecorder.START),
+                                              np.where(faulty[started][released], TraceRecorder.FAULT, TraceRecorder.COMPLETE)))
+            records = np.concatenate((records, trace.get_records()))
+            self.trace.extend(records[np.argsort(records["time"], kind="stable")])
+
+        # 4. Calculate energy consumption of the system from active/idle durations
+        self.profiler.start("energy_calculation")
+        for lpcore in lp_cores:
+            # i. calculate active energy consumption for this core
+            active = lpcore.get_active_duration()
+            activeConsumption = lpcore.energy_consumption_active(active)
+            lpcore.update_energy_consumption(activeConsumption)
+            # ii. calculate idle energy consumption for this core
+            idleConsumption = lpcore.energy_consumption_idle(self.frame - active)
+            lpcore.update_energy_consumption(idleConsumption)
+
+        for hp_core in hp_cores:
+            # iii. calculate active energy consumption for HP core
+            hp_activeConsumption = hp_core.energy_consumption_active(hp_core.get_active_duration())
+            hp_core.update_energy_consumption(hp_activeConsumption)
+            # iv. calculate idle energy consumption for HP core
+            hp_idleConsumption = hp_core.energy_consumption_idle(self.frame - hp_core.get_active_duration())
+            hp_core.update_energy_consumption(hp_idleConsumption)
+        self.profiler.stop("energy_calculation")
+
+    def simulate_backups(self, ended, kept, last_step, hp_cores, trace=None):
+        """
+        Simulate the backup copies on the HP cores, recording their busy intervals, as FEST_Scheduler.simulate() does: whenever
+        the time reaches the BB-overloading window of the current backup list, the first num_hp_cores tasks of the backup list run
+        on the HP cores, and a task leaves the backup list when its primary copy completes successfully or its backup copy completes.
+        Returns the positions (in schedule order) of the tasks left in the backup list at the end of the frame.
+
+        ended: the step at which each primary copy ends (last_step + 1 if it never starts)
+        kept: whether each task stays in the backup list when its primary copy ends (it has a fault or did not complete in the frame)
+        last_step: the last time step of the frame
+        hp_cores: list of references to the HP Core objects in the System
+        trace: TraceRecorder to record the backup events into (not recorded if None)
+        """
+        n = len(self.ids)
+        k = self.k
+        num_hp_cores = len(hp_cores)
+        time_step = self.time_step
+
+        # a. until the backup list is first dispatched, a task only leaves it when its primary copy completes successfully, so
+        #    from the step the first P primary copies have ended until the next one ends, the backup list is the kept tasks
+        #    among the first P, followed by the tasks from P on; its BB-overloading window follows from the prefix sums
+        kept_positions = np.flatnonzero(kept)
+        kept_prefix = np.concatenate(([0.0], np.cumsum(self.hp_exec[kept_positions])))
+        P = np.arange(n + 1)
+        num_kept = np.searchsorted(kept_positions, P)
+        from_kept = np.minimum(num_kept, k)
+        from_rest = np.minimum(k - from_kept, n - P)
+        reserve = kept_prefix[from_kept] + self.hp_prefix[P + from_rest] - self.hp_prefix[P]
+        state_start = np.concatenate(([0], ended))
+        state_end = np.append(ended, last_step + 1)
+        if num_hp_cores > 1:
+            # spread across several HP cores, no core gets more than the total / no. cores plus the longest task (nor the total),
+            # which bounds the window to find the candidate steps at which the exact window is checked
+            reserve = np.minimum(reserve, reserve / num_hp_cores + self.hp_exec.max(initial=0))
+        dispatch = np.maximum(state_start, self.to_step(self.frame - reserve))
+        candidates = np.flatnonzero(dispatch < state_end)
+        del P, from_rest, reserve
+
+        t = None
+        for p in candidates.tolist():
+            if num_hp_cores == 1:
+                t = int(dispatch[p])
+                break
+            head = np.concatenate((self.hp_exec[kept_positions[:from_kept[p]]], self.hp_exec[p:p + k - from_kept[p]]))
+            step = max(int(state_start[p]), int(self.to_step(self.frame - self.get_reserve(head))))
+            if step < state_end[p]:
+                t = step
+                break
+        if t is None:   # the backup list is never dispatched
+            return kept_positions
+
+        # b. step through the steps at which something happens from the first dispatch on
+        hp_exec = self.hp_exec.tolist()
+        ids = self.ids
+        ended = ended.tolist()
+        kept = kept.tolist()
+        backup_list = BackupList(self.hp_exec, kept_positions, p)
+        hp_assigned = [None] * num_hp_cores
+        hp_done = [0] * num_hp_cores                        # step at which the backup copy on each HP core completes
+        hp_available = [(0, hp) for hp in range(num_hp_cores)]  # min-heap of (step it became free, core) of the free HP cores
+
+        def to_step(time):
+            step = math.ceil(time / time_step)
+            if (step - 1) * time_step >= time:
+                step -= 1
+            elif step * time_step < time:
+                step += 1
+            return step
+
+        def release(hp, kind):
+            if trace is not None:
+                trace.record(t * time_step, TraceRecorder.HP_CORE - hp, int(ids[hp_assigned[hp]]), kind)
+            hp_cores[hp].end_busy(t * time_step)
+            hp_assigned[hp] = None
+            heapq.heappush(hp_available, (t, hp))
+
+        while True:
+            self.profiler.count("backup_events")
+            # v. dispatch the head of the backup list, if the time has reached its BB-overloading window
+            l = min(k, len(backup_list))
+            if num_hp_cores == 1:
+                reserve = backup_list.get_hp_sum(l)
+                running = backup_list.get_head(1)
+            else:
+                head = backup_list.get_head(max(l, num_hp_cores))
+                reserve = self.get_reserve([hp_exec[i] for i in head[:l]])
+                running = head[:num_hp_cores]
+            window_step = to_step(self.frame - reserve)
+            if t >= window_step:
+                for hp in range(num_hp_cores):
+                    if hp_assigned[hp] is not None and hp_assigned[hp] not in running:
+                        release(hp, TraceRecorder.BACKUP_CANCEL)
+                for i in running:
+                    if i not in hp_assigned:
+                        _, hp = heapq.heappop(hp_available)
+                        if trace is not None:
+                            trace.record(t * time_step, TraceRecorder.HP_CORE - hp, int(ids[i]), TraceRecorder.BACKUP_START)
+                        hp_assigned[hp] = i
+                        hp_done[hp] = max(t + 1, to_step(t * time_step + hp_exec[i]))
+                        hp_cores[hp].start_busy(t * time_step, int(ids[i]))
+
+            # next step at which a primary copy ends, a backup copy completes, or the BB-overloading window is reached
+            next_t = last_step + 1
+            if p < n:
+                next_t = min(next_t, ended[p])
+            for hp in range(num_hp_cores):
+                if hp_assigned[hp] is not None:
+                    next_t = min(next_t, hp_done[hp])
+            if t < window_step:
+                next_t = min(next_t, window_step)
+            if next_t > last_step:
+                break
+            t = next_t
+
+            # ii./iv. primary copies ending: the successful ones leave the backup list, cancelling their backup copy if it is running
+            while p < n and ended[p] <= t:
+                if not kept[p] and backup_list.remove(p):
+                    self.profiler.count("backup_removals")
+                    for hp in range(num_hp_cores):
+                        if hp_assigned[hp] == p:
+                            release(hp, TraceRecorder.BACKUP_CANCEL)
+                p += 1
+
+            # iii. backup copies completing leave the backup list
+            for hp in range(num_hp_cores):
+                if hp_assigned[hp] is not None and hp_done[hp] <= t:
+                    i = hp_assigned[hp]
+                    release(hp, TraceRecorder.COMPLETE)
+                    backup_list.remove(i)
+                    self.profiler.count("backup_removals")
+
+        return backup_list.get_positions()
+
+    def random_time_steps(self, num_steps, count):
+        """
+        Randomly sample count discrete time steps in [0, num_steps], using the run's rng if one is set, else the global random module.
+        The steps are the ones count successive calls of FEST_Scheduler.random_time_step() give.
+
+        num_steps: the number of time steps in the sampled interval (rounded to an integer, as it is computed with floats)
+        count: the number of time steps to sample
+        """
+        if self.rng is None:
+            return np.array([random.randint(0, round(num_steps)) for _ in range(count)], dtype=np.int64)
+        return self.rng.integers(0, round(num_steps), size=count, endpoint=True)
+
+    def generate_fault_occurrences(self):
+        """
+        Generate the times at which faults will occur, and mark the affected tasks to have encountered a fault, as
+        FEST_Scheduler.generate_fault_occurrences() does: min(k, no. tasks) faults, each at a random time step that falls in
+        the execution of a task without a fault yet (sampling again otherwise).
+        The time steps are sampled in batches of the number of faults still missing, and all of a batch are mapped to their tasks
+        with one binary search of the start times; within a batch, only the first time step falling in a task is accepted.
+        As each batch is at most the number of faults still missing, the random numbers drawn are exactly the ones the sampling
+        one at a time draws.
+        Returns the ids of the faulty tasks, in the order their faults were generated.
+        """
+        n = len(self.ids)
+        self.fault_times = np.full(n, np.nan)
+        faulty_tasks = []
+        l = min(self.k, n)
+        while len(faulty_tasks) < l:
+            # randomly choose a time for each missing fault to occur
+            fault_times = self.time_step * self.random_time_steps(self.frame / self.time_step, l - len(faulty_tasks))
+            # the task whose execution each fault time falls in, if any, and that does not have a fault yet
+            tasks = np.searchsorted(self.start_times, fault_times, side="right") - 1
+            valid = fault_times < self.end_times[tasks]
+            valid &= np.isnan(self.fault_times[tasks])
+            valid_positions = np.flatnonzero(valid)
+            _, first = np.unique(tasks[valid_positions], return_index=True)
+            accepted = np.sort(valid_positions[first])
+            self.profiler.count("fault_retries", len(fault_times) - len(accepted))
+
+            # calculate the time where fault occurred relative to the task start time, and mark the task as having a fault
+            accepted_tasks = tasks[accepted]
+            self.fault_times[accepted_tasks] = fault_times[accepted] - self.start_times[accepted_tasks]
+            faulty_tasks.extend(self.ids[accepted_tasks].tolist())
+
+        return faulty_tasks
+
+
+class BackupList:
+    """
+    Class which keeps the backup list of FEST_Large_Scheduler.simulate_backups(): the tasks still in it, in schedule order, as
+    Fenwick trees (binary indexed trees) of the count and the total HP execution time of the tasks over the schedule positions.
+    Removing a task, finding the first tasks of the list and the total HP execution time of the first tasks all take
+    O(log no. tasks), however many tasks have left the list ahead of or behind the primary copy currently executing.
+    """
+    def __init__(self, hp_exec, kept_positions, p):
+        """
+        Class constructor (__init__).
+
+        hp_exec: the HP execution time of each task, in schedule order
+        kept_positions: the positions of the tasks that stay in the backup list when their primary copy ends
+        p: the number of primary copies that have ended; the first p tasks are in the list only if they are kept
+        """
+        n = len(hp_exec)
+        present = np.ones(n, dtype=np.int64)
+        present[:p] = 0
+        present[kept_positions[kept_positions < p]] = 1
+        self.n = n
+        self.size = int(present.sum())
+        self.present = bytearray(present.astype(np.uint8).tobytes())
+        self.hp_exec = hp_exec.tolist()
+        # node i (1-based) of a Fenwick tree holds the sum over the positions (i - lowbit(i), i]
+        nodes = np.arange(1, n + 1)
+        lowbit = nodes & -nodes
+        count_prefix = np.concatenate(([0], np.cumsum(present)))
+        hp_prefix = np.concatenate(([0.0], np.cumsum(hp_exec * present)))
+        self.counts = [0] + (count_prefix[nodes] - count_prefix[nodes - lowbit]).tolist()
+        self.hp_sums = [0.0] + (hp_prefix[nodes] - hp_prefix[nodes - lowbit]).tolist()
+        self.top = 1 << (n.bit_length() - 1) if n > 0 else 0
+
+    def __len__(self):
+        """
+        Get the number of tasks in the backup list.
+        """
+        return self.size
+
+    def remove(self, i):
+        """
+        Remove a task from the backup list.
+        Returns True if the task was removed, or False if it was not in the list.
+
+        i: position of the task in schedule order
+        """
+        if not self.present[i]:
+            return False
+        self.present[i] = 0
+        self.size -= 1
+        hp_exec = self.hp_exec[i]
+        node = i + 1
+        while node <= self.n:
+            self.counts[node] -= 1
+            self.hp_sums[node] -= hp_exec
+            node += node & -node
+        return True
+
+    def find(self, count):
+        """
+        Find the count-th task of the backup list (1 <= count <= len(self)).
+        Returns (position, hp_sum): its position in schedule order, and the total HP execution time of the tasks before it.
+
+        count: the number of the task in the list, from 1
+        """
+        node = 0
+        hp_sum = 0.0
+        step = self.top
+        while step:
+            if node + step <= self.n and self.counts[node + step] < count:
+                node += step
+                count -= self.counts[node]
+                hp_sum += self.hp_sums[node]
+            step >>= 1
+        return node, hp_sum
+
+    def get_hp_sum(self, count):
+        """
+        Get the total HP execution time of the first count tasks of the backup list.
+
+        count: the number of tasks (<= len(self))
+        """
+        if count == 0:
+            return 0.0
+        position, hp_sum = self.find(count)
+        return hp_sum + self.hp_exec[position]
+
+    def get_head(self, count):
+        """
+        Get the positions of the first count tasks of the backup list (fewer if the list is shorter).
+
+        count: the number of tasks
+        """
+        head = []
+        position = self.find(1)[0] - 1 if self.size > 0 else -1
+        for _ in range(min(count, self.size)):
+            position = self.present.find(1, position + 1)   # the next task in the list (a byte search)
+            head.append(position)
+        return head
+
+    def get_positions(self):
+        """
+        Get the positions of all tasks in the backup list, in schedule order.
+        """
+        return np.flatnonzero(np.frombuffer(bytes(self.present), dtype=np.uint8))
@@ -1,8 +1,13 @@
+import heapq
+import bisect
 import random
+from Task import Task
+from Profiler import Profiler
+from TraceRecorder import TraceRecorder
 
 class FEST_Scheduler:
     # init
-    def __init__(self, k, frame, time_step, log_debug):
+    def __init__(self, k, frame, time_step, log_debug, profiler=None, trace=None, num_hp_cores=1):
         """
         Class constructor (__init__).
 
@@ -10,19 +15,31 @@ class FEST_Scheduler:
         frame: size of the frame, in ms
         time_step: fidelity of each time step for the scheduler/task execution times, in ms
         log_debug: whether to print logging statements
+        profiler: Profiler to record phase timers and counters into (disabled if None)
+        trace: TraceRecorder to record the execution trace of simulate() into (disabled if None)
+        num_hp_cores: number of HP (backup) cores the backup tasks are spread across
         """
         # application parameters
         self.k = k
         self.frame = frame
         self.time_step = time_step
 
+        # system parameters
+        self.num_hp_cores = num_hp_cores
+
         # scheduler variables
         self.pri_schedule = dict()
         self.backup_start = 0
         self.backup_list = None
+        self.initial_backup_list = None     # backup_list as generated, restored by reset_simulation()
+        self.initial_backup_start = 0
 
         # logging
         self.log_debug = log_debug  # whether to print log statements or not
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.trace = trace
+        # np.random.Generator for the fault generation of a run (set by System.run()); the global random module is used if None
+        self.rng = None
 
     # class helper functions
     def getLPExecutionTime(task):
@@ -66,9 +83,109 @@ class FEST_Scheduler:
         # 4. Compute BB-overloading window size
         self.update_BB_overloading(0)
 
+        # keep the initial backup state, so that the schedule can be simulated again
+        self.initial_backup_list = self.backup_list.copy()
+        self.initial_backup_start = self.backup_start
+
         # Generated schedule successfully
         return True
 
+    def admit(self, task):
+        """
+        Online admission: add a task to the generated schedule, without regenerating it from scratch.
+        The task is spliced into the primary schedule and backup list at its position in the execution time order,
+        and only the start times of the tasks after it are recomputed.
+        Returns True if the task was admitted, or False (leaving the schedule unchanged) if it does not fit in the frame.
+        To be called between simulations.
+
+        task: the Task to admit
+        """
+        tasks = list(self.pri_schedule.values())
+        # after all tasks with a longer or equal execution time, as the (stable) sort in generate_schedule() would place it
+        pos = bisect.bisect_right([-t.getLPExecutionTime() for t in tasks], -task.getLPExecutionTime())
+        tasks.insert(pos, task)
+        return self.splice_schedule(tasks, pos)
+
+    def retire(self, taskId):
+        """
+        Online removal: remove a task from the generated schedule, without regenerating it from scratch.
+        Only the start times of the tasks after it are recomputed.
+        Returns True if the task was removed, or False if there is no such task.
+        To be called between simulations.
+
+        taskId: id of the task to remove
+        """
+        tasks = list(self.pri_schedule.values())
+        for pos in range(len(tasks)):
+            if tasks[pos].getId() == taskId:
+                del tasks[pos]
+                return self.splice_schedule(tasks, pos)
+        return False
+
+    def update_task(self, taskId, lp_execTime=None, hp_execTime=None):
+        """
+        Online update: change the execution times of a scheduled task (e.g. after a WCET re-measurement), without regenerating
+        the schedule from scratch. The task is moved to its new position in the execution time order, and only the start times
+        from the first position that changed onwards are recomputed.
+        Returns True if the task was updated, or False (leaving the schedule unchanged) if there is no such task or it no longer fits in the frame.
+        To be called between simulations.
+
+        taskId: id of the task to update
+        lp_execTime: the new execution time on a LP Core (None to keep the current one)
+        hp_execTime: the new execution time on a HP Core (None to keep the current one)
+        """
+        tasks = list(self.pri_schedule.values())
+        for old_pos in range(len(tasks)):
+            if tasks[old_pos].getId() == taskId:
+                break
+        else:
+            return False
+
+        old_task = tasks.pop(old_pos)
+        task = Task(taskId,
+                    old_task.getLPExecutionTime() if lp_execTime is None else lp_execTime,
+                    old_task.getHPExecutionTime() if hp_execTime is None else hp_execTime)
+        new_pos = bisect.bisect_right([-t.getLPExecutionTime() for t in tasks], -task.getLPExecutionTime())
+        tasks.insert(new_pos, task)
+        return self.splice_schedule(tasks, min(old_pos, new_pos))
+
+    def splice_schedule(self, tasks, pos):
+        """
+        Replace the primary schedule and backup list with an updated task order, recomputing only the start times from position pos onwards.
+        Returns True if the schedule was updated, or False (leaving the schedule unchanged) if the tasks do not fit in the frame.
+
+        tasks: the updated task order (non-increasing execution time)
+        pos: the first position in the task order that changed
+        """
+        keys = list(self.pri_schedule.keys())
+        pri_schedule = {keys[i]: tasks[i] for i in range(pos)}
+        start_time = 0 if pos == 0 else keys[pos-1] + tasks[pos-1].getLPExecutionTime()
+        for task in tasks[pos:]:
+            lp_executionTime = task.getLPExecutionTime()
+            if start_time + lp_executionTime <= self.frame:
+                pri_schedule[start_time] = task
+                start_time += lp_executionTime
+            else:   ## if not schedulable, exit
+                print("Unable to schedule tasks")
+                return False
+
+        self.pri_schedule = pri_schedule
+        self.backup_list = tasks.copy()
+        self.update_BB_overloading(0)
+        self.initial_backup_list = self.backup_list.copy()
+        self.initial_backup_start = self.backup_start
+        return True
+
+    def reset_simulation(self):
+        """
+        Restore the scheduler state changed by simulate() (backup list, backup start, task faults),
+        so that the generated schedule can be simulated again, e.g. for the next frame.
+        """
+        self.backup_list = self.initial_backup_list.copy()
+        self.backup_start = self.initial_backup_start
+        for task in self.pri_schedule.values():
+            task.resetEncounteredFault()
+
     def remove_from_backup_list(self, taskId, sim_time):
         """
         Given a task id, remove its corresponding task from the backup_list.
@@ -78,19 +195,23 @@ class FEST_Scheduler:
         """
         # remove task from backup list
         self.backup_list = [i for i in self.backup_list if i.getId() != taskId]
+        self.profiler.count("backup_removals")
         # update size of BB-overloading window
         self.update_BB_overloading(sim_time)
 
     def update_BB_overloading(self, sim_time):
         """
         Update backup_start with the current size of the BB-overloading window.
-        Up to k tasks will be reserved for BB-overloading.
+        Up to k tasks will be reserved for BB-overloading. They are spread across the HP cores in backup list order, each going
+        to the core with the least reserved time (a min-heap), as simulate() dispatches them; the window is the largest reserve.
         """
+        self.profiler.count("bb_overloading_updates")
         # compute BB-overloading window size
-        reserve_cap = 0
+        reserve = [0] * self.num_hp_cores
         l = min(self.k, len(self.backup_list))
         for i in range(l):
-            reserve_cap += self.backup_list[i].getHPExecutionTime()
+            heapq.heapreplace(reserve, reserve[0] + self.backup_list[i].getHPExecutionTime())
+        reserve_cap = max(reserve)
 
         # reserve reserve_cap units of backup slots
         self.backup_start = max(sim_time, self.frame - reserve_cap)
@@ -107,77 +228,104 @@ class FEST_Scheduler:
         print(" Backup Tasks")
         print("  Start: {0} ms".format(self.backup_start))
 
-    def simulate(self, lp_cores, hp_core):
+    def simulate(self, lp_cores, hp_cores):
         """
         Simulate the execution of the tasks. The high-level steps:
         1. Generate a list of fault occurrences
         2. Simulate the time steps:
-            i.  Increment the active duration of all cores that were executing a task in the previous time step
+            i.  Record the busy intervals of the cores, as tasks are assigned to and released from them in steps ii-v
             ii. Update system for primary task(s) that have completed execution
-            iii. Update system if a backup task has completed execution
+            iii. Update system for backup task(s) that have completed execution
             iv. Update assignment of primary tasks to LP cores
-            v.  Update assignment of backup tasks to HP core
+            v.  Update assignment of backup tasks to HP cores: the first num_hp_cores tasks of the backup list run, each
+                started on the free HP core that has been available the longest (a min-heap of core availability)
         3. Calculate the energy consumption of the system
 
         lp_cores: list of references to the LP Core objects in the System.
-        hp_core: reference to the HP Core object in the System.
+        hp_cores: list of references to the HP Core objects in the System.
         """
         sim_time = 0
 
         # 1. Calculate the times when faults occur
+        self.profiler.start("fault_generation")
         self.generate_fault_occurrences()
+        self.profiler.stop("fault_generation")
 
         # 2. Simulate time steps
         lp_assignedTask = None
-        hp_assignedTask = None
+        hp_assignedTask = [None] * len(hp_cores)
+        hp_available = [(0, hp) for hp in range(len(hp_cores))]     # min-heap of (time it became free, core) of the free HP cores
         key = list(self.pri_schedule.keys())[0]
         keyIdx = 0
+        trace = self.trace
 
+        self.profiler.start("step_loop")
+        steps = 0
         while sim_time <= self.frame:
-            # i. increment active durations
-            if not lp_assignedTask is None:
-                lp_cores[0].update_active_duration(self.time_step)
-            if not hp_assignedTask is None:
-                hp_core.update_active_duration(self.time_step)
+            steps += 1
+            # i. active durations are recorded as busy intervals whenever a task is assigned to or released from a core
 
             # ii. if a primary task has completed, unassign it from core
             if not lp_assignedTask is None:
                 if sim_time >= lp_assignedTask.getStartTime() + lp_assignedTask.getLPExecutedDuration():
+                    if trace is not None:
+                        trace.record(sim_time, 0, lp_assignedTask.getId(), TraceRecorder.FAULT if lp_assignedTask.getEncounteredFault() else TraceRecorder.COMPLETE)
                     # if it is a task that shouldn't have encountered an error
                     if not lp_assignedTask.getEncounteredFault():
                         # remove from backup list
                         self.remove_from_backup_list(lp_assignedTask.getId(), sim_time)
                         # if its backup task is already executing and it completed (i.e. did not encounter a fault), cancel the backup task
-                        if not hp_assignedTask is None and hp_assignedTask.getId() == lp_assignedTask.getId():
-                            hp_assignedTask = None
+                        for hp in range(len(hp_cores)):
+                            if not hp_assignedTask[hp] is None and hp_assignedTask[hp].getId() == lp_assignedTask.getId():
+                                if trace is not None:
+                                    trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.BACKUP_CANCEL)
+                                hp_cores[hp].end_busy(sim_time)
+                                hp_assignedTask[hp] = None
+                                heapq.heappush(hp_available, (sim_time, hp))
 
                     # unassign from core
+                    lp_cores[0].end_busy(sim_time)
                     lp_assignedTask = None
 
             # iii. if a backup task has completed, remove it from backup core
-            if not hp_assignedTask is None:
-                if self.backup_list and sim_time >= hp_assignedTask.getBackupStartTime() + hp_assignedTask.getHPExecutionTime():
-                    #remove from backup list
-                    self.remove_from_backup_list(hp_assignedTask.getId(), sim_time)
-
-                    # unassign from backup core
-                    hp_assignedTask = None
+            for hp in range(len(hp_cores)):
+                if not hp_assignedTask[hp] is None:
+                    if self.backup_list and sim_time >= hp_assignedTask[hp].getBackupStartTime() + hp_assignedTask[hp].getHPExecutionTime():
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.COMPLETE)
+                        #remove from backup list
+                        self.remove_from_backup_list(hp_assignedTask[hp].getId(), sim_time)
+
+                        # unassign from backup core
+                        hp_cores[hp].end_busy(sim_time)
+                        hp_assignedTask[hp] = None
+                        heapq.heappush(hp_available, (sim_time, hp))
 
             # iv. update primary task assignment to cores
             while (keyIdx < len(self.pri_schedule)) and (sim_time >= key):
                 # it actually completed execution, but floating point's a bitch
                 if not lp_assignedTask is None and lp_assignedTask.getId() != self.pri_schedule[key].getId():
+                    if trace is not None:
+                        trace.record(sim_time, 0, lp_assignedTask.getId(), TraceRecorder.FAULT if lp_assignedTask.getEncounteredFault() else TraceRecorder.COMPLETE)
                     # if it is a task that shouldn't have encountered an error
                     if not lp_assignedTask.getEncounteredFault():
                         # iii. remove from backup list
                         self.remove_from_backup_list(lp_assignedTask.getId(), sim_time)
                         # if its backup task is already executing and it completed (i.e. did not encounter a fault), cancel the backup task
-                        if hp_assignedTask is not None and hp_assignedTask.getId() == lp_assignedTask.getId():
-                            hp_assignedTask = None
+                        for hp in range(len(hp_cores)):
+                            if hp_assignedTask[hp] is not None and hp_assignedTask[hp].getId() == lp_assignedTask.getId():
+                                if trace is not None:
+                                    trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.BACKUP_CANCEL)
+                                hp_cores[hp].end_busy(sim_time)
+                                hp_assignedTask[hp] = None
+                                heapq.heappush(hp_available, (sim_time, hp))
 
                 if lp_assignedTask is None or lp_assignedTask.getId() != self.pri_schedule[key].getId():
                     lp_assignedTask = self.pri_schedule[key]
                     lp_assignedTask.setStartTime(sim_time)
+                    lp_cores[0].start_busy(sim_time, lp_assignedTask.getId())
+                    if trace is not None:
+                        trace.record(sim_time, 0, lp_assignedTask.getId(), TraceRecorder.START)
 
                 keyIdx += 1
                 if keyIdx >= len(self.pri_schedule):
@@ -186,19 +334,40 @@ class FEST_Scheduler:
                     key = list(self.pri_schedule.keys())[keyIdx]
 
 
-            # v. update task assignment to backup core
+            # v. update task assignment to backup cores
             if sim_time >= self.backup_start:
-                if self.backup_list:
-                    # task hasn't started on backup core yet
-                    if hp_assignedTask is None or hp_assignedTask.getId() != self.backup_list[0].getId():
-                        hp_assignedTask = self.backup_list[0]
-                        hp_assignedTask.setBackupStartTime(sim_time)
-                else:
-                    hp_assignedTask = None
+                # the tasks at the head of the backup list run on the backup cores; cancel any other running backup task
+                running = self.backup_list[:len(hp_cores)]
+                running_ids = [task.getId() for task in running]
+                for hp in range(len(hp_cores)):
+                    if hp_assignedTask[hp] is not None and hp_assignedTask[hp].getId() not in running_ids:
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE - hp, hp_assignedTask[hp].getId(), TraceRecorder.BACKUP_CANCEL)
+                        hp_cores[hp].end_busy(sim_time)
+                        hp_assignedTask[hp] = None
+                        heapq.heappush(hp_available, (sim_time, hp))
+
+                # task hasn't started on backup core yet
+                assigned_ids = [task.getId() for task in hp_assignedTask if task is not None]
+                for task in running:
+                    if task.getId() not in assigned_ids:
+                        _, hp = heapq.heappop(hp_available)
+                        if trace is not None:
+                            trace.record(sim_time, TraceRecorder.HP_CORE - hp, task.getId(), TraceRecorder.BACKUP_START)
+                        hp_assignedTask[hp] = task
+                        hp_assignedTask[hp].setBackupStartTime(sim_time)
+                        hp_cores[hp].start_busy(sim_time, task.getId())
 
             sim_time += self.time_step                
+        # tasks still executing at the end of the frame were active up to the last time step
+        lp_cores[0].end_busy(sim_time - self.time_step)
+        for hp_core in hp_cores:
+            hp_core.end_busy(sim_time - self.time_step)
+        self.profiler.stop("step_loop")
+        self.profiler.count("time_steps", steps)
 
         # 3. Calculate energy consumption of the system from active/idle durations
+        self.profiler.start("energy_calculation")
         for lpcore in lp_cores:
             # i. calculate active energy consumption for this core
             active = lpcore.get_active_duration()
@@ -208,14 +377,26 @@ class FEST_Scheduler:
             idleConsumption = lpcore.energy_consumption_idle(self.frame - active)
             lpcore.update_energy_consumption(idleConsumption)
         
-        # iii. calculate active energy consumption for HP core
-        hp_activeConsumption = hp_core.energy_consumption_active(hp_core.get_active_duration())
-        hp_core.update_energy_consumption(hp_activeConsumption)
-        # iv. calculate idle energy consumption for HP core
-        hp_idleConsumption = hp_core.energy_consumption_idle(self.frame - hp_core.get_active_duration())
-        hp_core.update_energy_consumption(hp_idleConsumption)
+        for hp_core in hp_cores:
+            # iii. calculate active energy consumption for HP core
+            hp_activeConsumption = hp_core.energy_consumption_active(hp_core.get_active_duration())
+            hp_core.update_energy_consumption(hp_activeConsumption)
+            # iv. calculate idle energy consumption for HP core
+            hp_idleConsumption = hp_core.energy_consumption_idle(self.frame - hp_core.get_active_duration())
+            hp_core.update_energy_consumption(hp_idleConsumption)
+        self.profiler.stop("energy_calculation")
 
 
+    def random_time_step(self, num_steps):
+        """
+        Randomly sample a discrete time step in [0, num_steps], using the run's rng if one is set, else the global random module.
+
+        num_steps: the number of time steps in the sampled interval (rounded to an integer, as it is computed with floats)
+        """
+        if self.rng is None:
+            return random.randint(0, round(num_steps))
+        return int(self.rng.integers(0, round(num_steps), endpoint=True))
+
     def generate_fault_occurrences(self):
         """
         Generate the times at which faults will occur, and mark the affected tasks to have encountered a fault.
@@ -239,7 +420,7 @@ class FEST_Scheduler:
             # randomly generate until a valid fault_time for fault to occur is obtained
             while fault_time is None:
                 # randomly generate a time for the fault to occur
-                rand = random.randint(0, self.frame / self.time_step)   # randint [0, self.frame / self.time_step) generates the random timestep it occurs
+                rand = self.random_time_step(self.frame / self.time_step)   # [0, self.frame / self.time_step] generates the random timestep it occurs
                 fault_time = self.time_step * rand  # get the actual time of the fault in ms
                 # check if time step is valid
                 for key in self.pri_schedule.keys():
@@ -248,6 +429,7 @@ class FEST_Scheduler:
                         # if task already has a fault, skip it
                         if task.getEncounteredFault():
                             fault_time = None
+                            self.profiler.count("fault_retries")
                             break
                         else:
                             # calculate the time step where fault occurred relative to the task start time
@@ -265,5 +447,6 @@ class FEST_Scheduler:
                         break
                 else:   # the time step is after all the tasks arranged
                     fault_time = None
+                    self.profiler.count("fault_retries")
 
         return faulty_tasks
\ No newline at end of file
@@ -0,0 +1,115 @@
+import math
+import numpy as np
+
+
+def pack_tasksets(tasksets, with_deadlines):
+    """
+    Pack a list of tasksets into padded 2D arrays (one row per taskset), for checking them in one NumPy pass.
+    Returns (lp_exec, deadline, valid), where padding entries have lp_exec 0, deadline inf and valid False
+    (deadline is None if with_deadlines is False).
+
+    tasksets: list of tasksets, each a list of Task (FEST) or ApproxTask (EnSuRe) objects
+    with_deadlines: whether to pack the task deadlines too (only ApproxTasks have one)
+    """
+    max_n = max((len(taskset) for taskset in tasksets), default=0)
+    lp_exec = np.zeros((len(tasksets), max_n))
+    deadline = np.full((len(tasksets), max_n), np.inf) if with_deadlines else None
+    valid = np.zeros((len(tasksets), max_n), dtype=bool)
+    for s, taskset in enumerate(tasksets):
+        lp_exec[s, :len(taskset)] = [task.getLPExecutionTime() for task in taskset]
+        if with_deadlines:
+            deadline[s, :len(taskset)] = [task.getDeadline() for task in taskset]
+        valid[s, :len(taskset)] = True
+    return lp_exec, deadline, valid
+
+
+def check_feasibility(scheduler_type, tasksets, frame, time_step, m_pri=1, chunk_size=1000):
+    """
+    Pre-screen tasksets for the schedulability conditions of generate_schedule(), without generating any schedule:
+    - FEST: the LP execution times, summed in non-increasing order, fit in the frame
+    - EnSuRe: in every time-window, the total workload-quota of the running tasks is at most (time_window * m_pri)
+    All tasksets are checked together in NumPy (in chunks of chunk_size tasksets, to bound the memory use).
+    A taskset that fails is certainly not schedulable. For EnSuRe a taskset that passes can still fail when its time-window's
+    tasks are assigned to the LP cores, which is not checked here.
+    Returns (mask, reasons): a bool array that is True for the tasksets passing the conditions, and a list with the reason
+    each taskset fails ("" if it passes).
+
+    scheduler_type: the scheduler to check the conditions of, "FEST", "FEST-Large", "EnSuRe" or "EnSuRe-RL"
+    tasksets: list of tasksets, each a list of Task (FEST) or ApproxTask (EnSuRe) objects
+    frame: size of the frame, in ms
+    time_step: fidelity of each time step, in ms (EnSuRe rounds the workload-quotas up to it)
+    m_pri: number of LP cores (EnSuRe)
+    chunk_size: number of tasksets checked per NumPy pass
+    """
+    mask = np.ones(len(tasksets), dtype=bool)
+    reasons = [""] * len(tasksets)
+    for c in range(0, len(tasksets), chunk_size):
+        chunk = tasksets[c:c+chunk_size]
+        if scheduler_type == "FEST" or scheduler_type == "FEST-Large":
+            chunk_mask, chunk_reasons = _check_fest(chunk, frame)
+        else:
+            chunk_mask, chunk_reasons = _check_ensure(chunk, time_step, m_pri)
+        mask[c:c+len(chunk)] = chunk_mask
+        reasons[c:c+len(chunk)] = chunk_reasons
+    return mask, reasons
+
+
+def _check_fest(tasksets, frame):
+    """
+    FEST frame-sum condition of check_feasibility().
+    """
+    lp_exec, _, _ = pack_tasksets(tasksets, False)
+    # sum in the order generate_schedule() does (non-increasing execution time); cumsum adds sequentially like it does
+    lp_exec = -np.sort(-lp_exec, axis=1)
+    total = np.cumsum(lp_exec, axis=1)[:, -1] if lp_exec.shape[1] > 0 else np.zeros(len(tasksets))
+    mask = total <= frame
+    reasons = ["" if ok else "total LP execution time {0} ms exceeds the frame of {1} ms".format(round(t, 4), frame)
+               for ok, t in zip(mask, total)]
+    return mask, reasons
+
+
+def _check_ensure(tasksets, time_step, m_pri):
+    """
+    EnSuRe per-window workload-quota condition of check_feasibility().
+    """
+    lp_exec, deadline, valid = pack_tasksets(tasksets, True)
+    num_sets, max_n = lp_exec.shape
+    if max_n == 0:
+        return np.ones(num_sets, dtype=bool), [""] * num_sets
+
+    # tasks in order of deadlines (stable, as generate_schedule() sorts them), padding last
+    order = np.argsort(deadline, axis=1, kind="stable")
+    lp_exec = np.take_along_axis(lp_exec, order, axis=1)
+    deadline = np.take_along_axis(deadline, order, axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+
+    # deadline sequence: each task's last time-window, and the end of each time-window
+    first = valid & np.concatenate([np.ones((num_sets, 1), dtype=bool), deadline[:, 1:] != deadline[:, :-1]], axis=1)
+    last_window = np.cumsum(first, axis=1) - 1
+    num_windows = first.sum(axis=1).max()
+    ends = np.full((num_sets, num_windows), np.nan)
+    rows, cols = np.nonzero(first)
+    ends[rows, last_window[rows, cols]] = deadline[rows, cols]
+    starts = np.concatenate([np.zeros((num_sets, 1)), ends[:, :-1]], axis=1)
+    time_window = ends - starts     # nan for the windows a taskset does not have
+
+    # total workload-quota of the running tasks of each time-window, with each workload-quota rounded up to the time step as
+    # roundUpTimeStep() does; accumulated one time-window at a time, so the temporaries are (tasksets, tasks) rather than
+    # (tasksets, time-windows, tasks)
+    weight = np.where(valid, lp_exec / deadline, 0.0)
+    precision_dp = -round(math.log(time_step, 10))
+    total_wq = np.zeros((num_sets, num_windows))
+    for w in range(num_windows):
+        wq = np.round(np.ceil(weight * time_window[:, w, None] / time_step) * time_step, precision_dp)
+        wq = np.maximum(wq, time_step)
+        running = valid & (last_window >= w)
+        total_wq[:, w] = np.cumsum(np.where(running, wq, 0.0), axis=1)[:, -1]
+
+    overloaded = total_wq > time_window * m_pri     # False for the nan windows
+    mask = ~overloaded.any(axis=1)
+    reasons = [""] * num_sets
+    for s in np.nonzero(~mask)[0]:
+        w = np.argmax(overloaded[s])
+        reasons[s] = "workload-quota {0} ms exceeds the capacity {1} ms of time-window {2}".format(
+            round(total_wq[s, w], 4), round(time_window[s, w] * m_pri, 4), w)
+    return mask, reasons
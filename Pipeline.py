@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from TasksetGenerator import TasksetGenerator
+from Sweep import DEFAULT_PARAMS, cell_seed_sequence, simulate_cell
+
+
+def generate_taskset_rows(config):
+    """
+    Generate a taskset in memory (see TasksetGenerator.generate_rows()).
+
+    config: dict of TasksetGenerator arguments: distribution, n, frame_duration, sys_util, precision_dp, num_lpcores,
+            lp_hp_ratio and seed
+    """
+    return TasksetGenerator(**config).generate_rows()
+
+
+def taskset_name(config):
+    """
+    Get the name that identifies an in-memory taskset in the results (and in a Sweep store): its generator config as JSON.
+
+    config: dict of TasksetGenerator arguments the taskset is generated with
+    """
+    return json.dumps(config, sort_keys=True)
+
+
+class Pipeline:
+    """
+    Class which runs sweeps as a producer/consumer pipeline: tasksets are generated in memory and simulated as soon as they
+    are generated, without writing them to disk.
+    The stages run concurrently, coordinated by asyncio, and share a process pool for the generation and simulation work:
+    1. generate: tasksets are generated from their configs by the pool
+    2. load: each generated taskset is expanded into its (scheduler, parameters, seed) cells
+    3. simulate: the cells are simulated by the pool
+    The stages are connected by bounded queues, so a stage that gets ahead of the next one waits instead of piling up tasksets
+    in memory, and the end-to-end time is close to the time of the slowest stage rather than the sum of the stages.
+    """
+
+    def __init__(self, workers=None, queue_size=None):
+        """
+        Class constructor (__init__).
+
+        workers: number of processes of the pool (the no. CPUs if None)
+        queue_size: maximum number of tasksets/cells waiting between two stages (2 * workers if None)
+        """
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.queue_size = queue_size if queue_size is not None else 2 * self.workers
+
+    def run(self, taskset_configs, scheduler_types, params, seeds, sweep=None, log_progress=True, profile=False):
+        """
+        Run the pipeline: simulate every (scheduler, taskset, parameters, seed) cell of the sweep, where the tasksets are generated
+        from taskset_configs. The cells are as in Sweep.run(), and each cell's faults are seeded the same way (with the taskset
+        named by taskset_name()).
+        Returns a list of result dicts, one per simulated cell, in the order they completed: the dict of Sweep.run_cell() plus
+        "scheduler", "taskset" (index in taskset_configs), "params" and "seed".
+
+        taskset_configs: list of dicts of TasksetGenerator arguments, one per taskset (see generate_taskset_rows())
+        scheduler_types: list of schedulers to run, "FEST", "FEST-Large", "EnSuRe" and/or "EnSuRe-RL"
+        params: dict of System parameter name -> list of values to sweep; parameters not given take their DEFAULT_PARAMS value
+        seeds: list of seeds of the fault generation
+        sweep: Sweep to record each cell into as it completes (cells already in its store are skipped), or None
+        log_progress: whether to print a line per cell that is simulated
+        profile: whether to record the per-phase timers and counters of each cell, in its "profile" (see simulate_cell())
+        """
+        return asyncio.run(self.run_async(taskset_configs, scheduler_types, params, seeds, sweep, log_progress, profile))
+
+    async def run_async(self, taskset_configs, scheduler_types, params, seeds, sweep=None, log_progress=True, profile=False):
+        """
+        Coroutine version of run(), for running the pipeline from an event loop that is already running.
+        """
+        loop = asyncio.get_running_loop()
+        tasksets = asyncio.Queue(self.queue_size)  # generated tasksets, waiting to be expanded into cells
+        cells = asyncio.Queue(self.queue_size)     # cells, waiting to be simulated
+        configs = iter(enumerate(taskset_configs))  # shared by the generators, each taking the next config
+        completed = sweep.get_completed_cells() if sweep is not None else set()
+        names = list(params.keys())
+        results = []
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            # 1. generate
+            async def generate():
+                for t, config in configs:
+                    rows = await loop.run_in_executor(pool, generate_taskset_rows, config)
+                    await tasksets.put((t, config, rows))
+
+            async def generate_all():
+                await asyncio.gather(*(generate() for _ in range(self.workers)))
+                await tasksets.put(None)
+
+            # 2. load
+            async def expand():
+                while True:
+                    item = await tasksets.get()
+                    if item is None:
+                        break
+                    t, config, rows = item
+                    for scheduler_type, values, seed in itertools.product(scheduler_types, itertools.product(*params.values()), seeds):
+                        cell_params = dict(DEFAULT_PARAMS)
+                        cell_params.update(zip(names, values))
+                        key = (scheduler_type, taskset_name(config), json.dumps(cell_params, sort_keys=True), seed)
+                        if key in completed:
+                            continue
+                        await cells.put((t, rows, key, cell_params))
+                for _ in range(self.workers):
+                    await cells.put(None)
+
+            # 3. simulate
+            async def simulate():
+                while True:
+                    item = await cells.get()
+                    if item is None:
+                        break
+                    t, rows, key, cell_params = item
+                    scheduler_type, name, _, seed = key
+                    if log_progress:
+                        print("Run {0}, taskset {1}, {2}, seed {3}".format(scheduler_type, t, cell_params, seed))
+                    rng = cell_seed_sequence(seed, scheduler_type, name, cell_params)
+                    result = await loop.run_in_executor(pool, simulate_cell, scheduler_type, rows, cell_params, rng, profile)
+                    if sweep is not None:
+                        sweep.record(key, result)
+                    result.update({"scheduler": scheduler_type, "taskset": t, "params": cell_params, "seed": seed})
+                    results.append(result)
+
+            await asyncio.gather(generate_all(), expand(), *(simulate() for _ in range(self.workers)))
+
+        return results
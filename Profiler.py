@@ -0,0 +1,98 @@
+import time
+
+
+class Profiler:
+    """
+    Class which collects opt-in instrumentation for a simulation run: accumulated phase timers and event counters.
+    When disabled, every method returns immediately, so the hooks left in the schedulers cost close to nothing.
+    """
+    def __init__(self, enabled=False):
+        """
+        Class constructor (__init__).
+
+        enabled: whether to record timers and counters
+        """
+        self.enabled = enabled
+        self.timers = dict()    # phase name -> accumulated wall time, in s
+        self.counters = dict()  # counter name -> accumulated count
+        self.runs = 0           # no. runs recorded
+
+        self._started = dict()  # phase name -> perf_counter() value when the phase was started
+
+    def start(self, phase):
+        """
+        Start (or resume) timing a phase.
+
+        phase: name of the phase
+        """
+        if self.enabled:
+            self._started[phase] = time.perf_counter()
+
+    def stop(self, phase):
+        """
+        Stop timing a phase, adding the elapsed time since start() to its accumulated time.
+
+        phase: name of the phase
+        """
+        if self.enabled:
+            elapsed = time.perf_counter() - self._started.pop(phase)
+            self.timers[phase] = self.timers.get(phase, 0) + elapsed
+
+    def count(self, counter, amount=1):
+        """
+        Increment a counter.
+
+        counter: name of the counter
+        amount: increment the counter by this amount
+        """
+        if self.enabled:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def reset(self):
+        """
+        Clear the recorded timers, counters and runs, e.g. at the start of a new run.
+        """
+        self.timers = dict()
+        self.counters = dict()
+        self.runs = 0
+        self._started = dict()
+
+    def begin_run(self):
+        """
+        Mark the start of a run, so that aggregated stats can be averaged per run.
+        """
+        if self.enabled:
+            self.runs += 1
+
+    def merge(self, stats):
+        """
+        Add the timers and counters of a stats dict (as returned by get_stats(), e.g. from a worker process) into this profiler.
+
+        stats: the stats dict to add
+        """
+        if self.enabled:
+            for name, value in stats["timers"].items():
+                self.timers[name] = self.timers.get(name, 0) + value
+            for name, value in stats["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_stats(self):
+        """
+        Get the recorded timers and counters as a dict: {"runs": int, "timers": {phase: s}, "counters": {name: int}}.
+        """
+        return {"runs": self.runs, "timers": dict(self.timers), "counters": dict(self.counters)}
+
+
+def aggregate_stats(stats_list):
+    """
+    Sum a list of stats dicts (as returned by Profiler.get_stats()) into a single stats dict.
+
+    stats_list: the stats dicts to aggregate, e.g. one per System.run
+    """
+    total = {"runs": 0, "timers": dict(), "counters": dict()}
+    for stats in stats_list:
+        total["runs"] += stats["runs"]
+        for key in ("timers", "counters"):
+            for name, value in stats[key].items():
+                total[key][name] = total[key].get(name, 0) + value
+    return total
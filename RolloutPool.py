@@ -0,0 +1,241 @@
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from EnsureEnv import EnSuReEnv
+from TasksetCorpus import attach_shared_memory
+
+
+def ring_layout(obs_spec, capacity, num_workers):
+    """
+    Get the layout of the ring buffers in the shared memory block: a list, per worker, of (field, dtype, shape, offset) entries,
+    and the size of the block in bytes. The fields of a ring are, per observation key, "obs/<key>" (the observation the action
+    was taken in) and "next_obs/<key>" (the observation the step returned), and "actions", "rewards" and "dones", each with
+    capacity slots. Every field starts 8-byte aligned.
+
+    obs_spec: list of (observation key, shape, dtype string) entries
+    capacity: number of slots of each ring
+    num_workers: number of rings
+    """
+    fields = [("obs/" + key, dtype, shape) for key, shape, dtype in obs_spec]
+    fields += [("next_obs/" + key, dtype, shape) for key, shape, dtype in obs_spec]
+    fields += [("actions", "<i8", ()), ("rewards", "<f4", ()), ("dones", "|b1", ())]
+    layout = []
+    pos = 0
+    for _ in range(num_workers):
+        ring = []
+        for field, dtype, shape in fields:
+            shape = (capacity,) + tuple(shape)
+            ring.append((field, dtype, shape, pos))
+            pos += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+        layout.append(ring)
+    return layout, pos
+
+
+def ring_views(shm, ring):
+    """
+    Get the fields of a ring buffer as NumPy views into the shared memory block: {field: array of shape (capacity, ...)}.
+
+    shm: the shared_memory.SharedMemory block
+    ring: the (field, dtype, shape, offset) entries of the ring (see ring_layout())
+    """
+    return {field: np.ndarray(shape, dtype, shm.buf, offset) for field, dtype, shape, offset in ring}
+
+
+def random_policy(observation):
+    """
+    Default policy of the rollout workers: assign the task to LP or HP uniformly at random.
+    """
+    return np.random.randint(2)
+
+
+def rollout_worker(shm_name, ring, capacity, env_kwargs, policy, seed, free, filled, stop):
+    """
+    Main function of a rollout worker process: step an EnSuReEnv with the policy, and write each transition into the next slot
+    of the worker's ring buffer, once the learner has freed it.
+
+    shm_name: name of the shared memory block of the ring buffers
+    ring: the (field, dtype, shape, offset) entries of the worker's ring (see ring_layout())
+    capacity: number of slots of the ring
+    env_kwargs: dict of EnSuReEnv arguments
+    policy: function of an observation, returning the action to take
+    seed: np.random.SeedSequence of the worker, the seeds of its env's random state (task sets and faults) and of its global
+          np.random state (e.g. for random_policy()) are spawned from
+    free: semaphore counting the free slots of the ring
+    filled: semaphore counting the filled slots of the ring, not yet read by the learner
+    stop: event set when the pool is closed
+    """
+    env_seed, policy_seed = seed.spawn(2)
+    np.random.seed(policy_seed.generate_state(4))
+    shm = attach_shared_memory(shm_name)
+    views = ring_views(shm, ring)
+    keys = [field[len("obs/"):] for field, _, _, _ in ring if field.startswith("obs/")]
+    env = EnSuReEnv(**env_kwargs, rng=np.random.RandomState(env_seed.generate_state(4)))
+    observation = env.reset()
+    slot = 0
+    try:
+        while not stop.is_set():
+            if not free.acquire(timeout=0.1):
+                continue
+            action = policy(observation)
+            next_observation, reward, done, _ = env.step(action)
+            for key in keys:
+                views["obs/" + key][slot] = observation[key]
+                views["next_obs/" + key][slot] = next_observation[key]
+            views["actions"][slot] = action
+            views["rewards"][slot] = reward
+            views["dones"][slot] = done
+            filled.release()
+            slot = (slot + 1) % capacity
+            observation = env.reset() if done else next_observation
+    finally:
+        views = None
+        shm.close()
+
+
+class RolloutPool:
+    """
+    Class which collects EnSuReEnv transitions in parallel: each worker process steps its own env and writes the transitions
+    (observation, action, reward, done, next observation) into its ring buffer, in one shared memory block, and the learner
+    reads them in place, as NumPy views into the block, so the observations are never pickled or copied between processes.
+    Each ring is single-producer single-consumer: a pair of semaphores counts its free and filled slots, so a worker blocks
+    when the learner falls capacity transitions behind it, and the learner blocks when no worker has a transition ready.
+    The workers act with a fixed policy (random by default), e.g. to fill the replay buffer of an off-policy learner.
+    """
+
+    def __init__(self, num_workers=None, capacity=1024, env_kwargs=None, policy=None, seed=None, context=None):
+        """
+        Class constructor (__init__).
+
+        num_workers: number of worker processes (the no. CPUs if None)
+        capacity: number of slots of each worker's ring buffer
+        env_kwargs: dict of EnSuReEnv arguments, e.g. {"compact_obs": True}
+        policy: picklable function of an observation, returning the action to take (random_policy() if None)
+        seed: seed the workers' seeds are spawned from (fresh entropy if None)
+        context: multiprocessing context (or start method name) of the workers (the default one if None)
+        """
+        self.num_workers = num_workers if num_workers is not None else multiprocessing.cpu_count()
+        self.capacity = capacity
+        self.env_kwargs = dict(env_kwargs) if env_kwargs is not None else {}
+        self.policy = policy if policy is not None else random_policy
+        self.seed = seed
+        self.context = context if not isinstance(context, (str, type(None))) else multiprocessing.get_context(context)
+        self.shm = None
+        self.rings = []         # views of each worker's ring buffer
+        self.processes = []
+        self.free = []
+        self.filled = []
+        self.stop = None
+        self.slots = []         # next slot the learner reads, per worker
+        self.pending = None     # (worker, no. slots) of the last batch returned by read(), freed by the next read()
+
+    def get_obs_spec(self):
+        """
+        Get the (observation key, shape, dtype string) entries of the env's observations.
+        """
+        env = EnSuReEnv(**self.env_kwargs)
+        return [(key, np.asarray(value).shape, np.asarray(value).dtype.str) for key, value in env._get_empty_state().items()]
+
+    def start(self):
+        """
+        Create the ring buffers and start the workers.
+        """
+        layout, size = ring_layout(self.get_obs_spec(), self.capacity, self.num_workers)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.rings = [ring_views(self.shm, ring) for ring in layout]
+        self.slots = [0] * self.num_workers
+        self.pending = None
+        self.stop = self.context.Event()
+        seeds = np.random.SeedSequence(self.seed).spawn(self.num_workers)
+        for w in range(self.num_workers):
+            self.free.append(self.context.Semaphore(self.capacity))
+            self.filled.append(self.context.Semaphore(0))
+            process = self.context.Process(target=rollout_worker, daemon=True,
+                                           args=(self.shm.name, layout[w], self.capacity, self.env_kwargs, self.policy,
+                                                 seeds[w], self.free[w], self.filled[w], self.stop))
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def release(self):
+        """
+        Free the slots of the last batch returned by read(), so its worker can overwrite them. Its views must not be used after.
+        """
+        if self.pending is not None:
+            w, count = self.pending
+            for _ in range(count):
+                self.free[w].release()
+            self.slots[w] = (self.slots[w] + count) % self.capacity
+            self.pending = None
+
+    def read(self, w, max_steps=None):
+        """
+        Wait for the next transitions of a worker, and get them as views into its ring buffer: {"obs": {key: array},
+        "next_obs": {key: array}, "actions", "rewards", "dones"}, with up to max_steps transitions (fewer if fewer are ready,
+        or if the ring wraps around). The slots of the previous batch are freed first (see release()).
+        Returns None if the worker is no longer running.
+
+        w: index of the worker
+        max_steps: maximum number of transitions of the batch (the capacity if None)
+        """
+        self.release()
+        while not self.filled[w].acquire(timeout=1.0):
+            if not self.processes[w].is_alive():
+                print("Error: rollout worker {0} exited with code {1}".format(w, self.processes[w].exitcode))
+                return None
+        start = self.slots[w]
+        limit = min(max_steps if max_steps is not None else self.capacity, self.capacity - start)
+        count = 1
+        while count < limit and self.filled[w].acquire(False):
+            count += 1
+        self.pending = (w, count)
+
+        batch = {"obs": {}, "next_obs": {}}
+        for field, view in self.rings[w].items():
+            if "/" in field:
+                group, key = field.split("/", 1)
+                batch[group][key] = view[start:start + count]
+            else:
+                batch[field] = view[start:start + count]
+        return batch
+
+    def collect(self, num_steps, max_batch=None):
+        """
+        Collect num_steps transitions, taking batches from the workers in turn: yields (worker index, batch) pairs, where batch
+        is as returned by read() and its views are valid until the next batch is requested.
+
+        num_steps: number of transitions to collect
+        max_batch: maximum number of transitions of a batch (the capacity if None)
+        """
+        collected = 0
+        w = 0
+        while collected < num_steps:
+            batch = self.read(w, min(max_batch if max_batch is not None else self.capacity, num_steps - collected))
+            if batch is None:
+                return
+            collected += len(batch["actions"])
+            yield w, batch
+            w = (w + 1) % self.num_workers
+        self.release()
+
+    def close(self):
+        """
+        Stop the workers and free the ring buffers.
+        """
+        if self.stop is not None:
+            self.stop.set()
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes, self.free, self.filled, self.rings, self.pending = [], [], [], [], None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,55 @@
+import math
+from statistics import NormalDist
+
+
+class RunningStats:
+    """
+    Class which tracks the running mean and variance of a stream of samples with Welford's updates, in constant memory and
+    without the cancellation of the naive sum-of-squares formula.
+    """
+    def __init__(self):
+        """
+        Class constructor (__init__).
+        """
+        self.count = 0      # no. samples added
+        self.mean = 0.0     # running mean of the samples
+        self.m2 = 0.0       # running sum of squared deviations from the mean
+
+    def add(self, x):
+        """
+        Add a sample.
+
+        x: the sample
+        """
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def get_variance(self):
+        """
+        Get the sample variance of the samples added (0 with fewer than two samples).
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def get_ci_half_width(self, confidence=0.95):
+        """
+        Get the half-width of the (normal approximation) confidence interval of the mean (inf with fewer than two samples).
+
+        confidence: confidence level of the interval
+        """
+        if self.count < 2:
+            return math.inf
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * math.sqrt(self.get_variance() / self.count)
+
+    def get_relative_ci_width(self, confidence=0.95):
+        """
+        Get the half-width of the confidence interval of the mean relative to the mean, i.e. the achieved relative precision.
+
+        confidence: confidence level of the interval
+        """
+        half_width = self.get_ci_half_width(confidence)
+        if half_width == 0:
+            return 0.0
+        return half_width / abs(self.mean) if self.mean != 0 else math.inf
@@ -0,0 +1,381 @@
+from csv import reader
+from ast import literal_eval
+import itertools
+import json
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from System import System
+from Feasibility import check_feasibility
+from TasksetCorpus import TasksetCorpus
+from Task import Task
+from ApproxTask import ApproxTask
+
+# System parameters used for any parameter a sweep does not vary (the values of the experiments in Test.py)
+DEFAULT_PARAMS = {
+    "k": 20,
+    "frame": 200,
+    "time_step": 0.0001,
+    "num_lp_cores": 1,
+    "lp_hp_ratio": 0.8,
+    "packing": "round-robin",
+    "num_hp_cores": 1,
+}
+
+
+def load_taskset(filename, scheduler_type, hp_ratio=None):
+    """
+    Load a taskset CSV file (as written by TasksetGenerator) into a list of Task (FEST) or ApproxTask (EnSuRe) objects.
+
+    filename: the taskset CSV file
+    scheduler_type: the scheduler the tasks are for, "FEST", "FEST-Large", "EnSuRe" or "EnSuRe-RL"
+    hp_ratio: if given, the HP execution times are recomputed as (LP execution time * hp_ratio), as in the speed-ratio experiments
+    """
+    return tasks_from_rows(load_taskset_rows(filename), scheduler_type, hp_ratio)
+
+
+def load_taskset_rows(filename):
+    """
+    Load the rows of a taskset CSV file (as written by TasksetGenerator), as (task id, LP execution time, HP execution time, deadline) tuples.
+
+    filename: the taskset CSV file
+    """
+    with open(filename) as read_obj:
+        csv_reader = reader(read_obj)
+        return [tuple(map(literal_eval, x)) for x in map(tuple, csv_reader)]
+
+
+def tasks_from_rows(rows, scheduler_type, hp_ratio=None):
+    """
+    Convert taskset rows (as loaded by load_taskset_rows() or generated by TasksetGenerator.generate_rows()) into a list of
+    Task (FEST) or ApproxTask (EnSuRe) objects.
+
+    rows: the (task id, LP execution time, HP execution time, deadline) tuples
+    scheduler_type: the scheduler the tasks are for, "FEST", "FEST-Large", "EnSuRe" or "EnSuRe-RL"
+    hp_ratio: if given, the HP execution times are recomputed as (LP execution time * hp_ratio), as in the speed-ratio experiments
+    """
+    tasks = []
+    for task in rows:
+        hp_execTime = task[2] if hp_ratio is None else round(task[1] * hp_ratio, 4)
+        if scheduler_type == "FEST" or scheduler_type == "FEST-Large":
+            tasks.append(Task(task[0], task[1], hp_execTime))
+        else:
+            tasks.append(ApproxTask(task[0], task[1], hp_execTime, task[3]))
+    return tasks
+
+
+def cell_seed_sequence(seed, scheduler_type, taskset, cell_params):
+    """
+    Derive the np.random.SeedSequence of a sweep cell from its seed: the child that SeedSequence(seed).spawn() gives at the
+    index crc32(scheduler, taskset, params). The index depends only on the cell itself, not on the other cells of the sweep or
+    the order they run in, so a cell gives the same faults when it is rerun in isolation, resumed, or run in parallel.
+
+    seed: the seed of the cell
+    scheduler_type: the scheduler of the cell
+    taskset: the taskset CSV file of the cell
+    cell_params: dict of the System parameters of the cell
+    """
+    cell = json.dumps([scheduler_type, taskset, cell_params], sort_keys=True)
+    root = np.random.SeedSequence(seed)
+    return np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (zlib.crc32(cell.encode()),))
+
+
+def simulate_cell(scheduler_type, rows, cell_params, rng, profile=False):
+    """
+    Simulate a single cell of a sweep on an in-memory taskset (see Sweep.run_cell() for the returned dict).
+    With profile, the dict also has the "profile" stats of the System (see System.get_profile_stats()), unless no feasible
+    schedule is found.
+
+    scheduler_type: the scheduler to run
+    rows: the taskset rows, as loaded by load_taskset_rows() or generated by TasksetGenerator.generate_rows()
+    cell_params: dict of the System parameters of the cell (see Sweep.run_cell())
+    rng: seed, np.random.SeedSequence or np.random.Generator for the fault generation
+    profile: whether to record the per-phase timers and counters of the simulation
+    """
+    hp_ratio = cell_params["lp_hp_ratio"] if cell_params.get("scale_hp_exec") else None
+    tasks = tasks_from_rows(rows, scheduler_type, hp_ratio)
+
+    start = time.perf_counter()
+    system = System(scheduler_type, cell_params["k"], cell_params["frame"], cell_params["time_step"],
+                    cell_params["num_lp_cores"], cell_params["lp_hp_ratio"], False, profile,
+                    packing=cell_params["packing"], num_hp_cores=cell_params["num_hp_cores"])
+    if cell_params.get("expected"):
+        try:
+            result = system.expected_energy(tasks)
+        except ValueError as error:     # feasible, but no exact expectation: recorded without an energy
+            return {"feasible": True, "reason": str(error), "energy": None, "hp_active_duration": None, "lp_active_durations": None,
+                    "wall_time": time.perf_counter() - start}
+        feasible = result is not None
+    elif "target_rel_ci_width" in cell_params:
+        result = system.run_until_precision(tasks, cell_params["target_rel_ci_width"], max_runs=cell_params["max_runs"], rng=rng)
+        feasible = result is not None
+    else:
+        feasible = system.run(tasks, rng)
+    wall_time = time.perf_counter() - start
+
+    if not feasible:
+        return {"feasible": False, "reason": "no feasible schedule", "energy": None, "hp_active_duration": None, "lp_active_durations": None,
+                "wall_time": wall_time}
+    profile_stats = {"profile": system.get_profile_stats()} if profile else {}
+    if cell_params.get("expected"):
+        return {
+            "feasible": True,
+            "reason": "",
+            "energy": result["energy"],
+            "hp_active_duration": result["hp_active_duration"],
+            "lp_active_durations": result["lp_active_durations"],
+            "wall_time": wall_time,
+            "energy_variance": result["variance"],
+            **profile_stats,
+        }
+    if "target_rel_ci_width" in cell_params:
+        return {
+            "feasible": True,
+            "reason": "" if result["converged"] else "target precision not reached in {0} runs".format(result["num_runs"]),
+            "energy": result["energy"],
+            "hp_active_duration": result["hp_active_duration"],
+            "lp_active_durations": result["lp_active_durations"],
+            "wall_time": wall_time,
+            "energy_variance": result["energy_variance"],
+            "num_runs": result["num_runs"],
+            "rel_ci_width": result["rel_ci_width"],
+            **profile_stats,
+        }
+    return {
+        "feasible": True,
+        "reason": "",
+        "energy": system.get_energy_consumption(),
+        "hp_active_duration": system.get_hpcore_active_duration(),
+        "lp_active_durations": [lpcore.get_active_duration() for lpcore in system.lp_cores],
+        "wall_time": wall_time,
+        **profile_stats,
+    }
+
+
+# the taskset corpus of a Sweep.run() worker process, attached by _init_corpus_worker()
+_worker_corpus = None
+
+
+def _init_corpus_worker(corpus_name):
+    """
+    Initializer of the Sweep.run() worker processes: attach to the sweep's taskset corpus.
+    """
+    global _worker_corpus
+    _worker_corpus = TasksetCorpus.attach(corpus_name)
+
+
+def _run_corpus_cell(scheduler_type, t, cell_params, seed):
+    """
+    Run a cell of the sweep in a Sweep.run() worker process, on taskset t of the corpus (see Sweep.run_cell()).
+    """
+    taskset = _worker_corpus.names[t]
+    rng = cell_seed_sequence(seed, scheduler_type, taskset, cell_params)
+    return simulate_cell(scheduler_type, _worker_corpus.get_rows(t), cell_params, rng)
+
+
+class Sweep:
+    """
+    Class which runs parameter sweeps over schedulers, tasksets, System parameters and seeds, and records the result of every
+    (scheduler, taskset, parameters, seed) cell in a local SQLite store as soon as it completes.
+    Cells already in the store are skipped when a sweep is rerun, so an interrupted sweep resumes where it stopped, and
+    extending a sweep with more parameter values only runs the new cells.
+    """
+    # the columns of get_results() other than the System parameters of the cells
+    COLUMNS = ["scheduler", "taskset", "seed", "feasible", "reason", "energy", "hp_active_duration", "lp_active_durations",
+               "wall_time", "finished_at", "energy_variance", "num_runs", "rel_ci_width"]
+
+    def __init__(self, db_path="sweep_results.sqlite"):
+        """
+        Class constructor (__init__).
+
+        db_path: path of the SQLite store (created if it does not exist)
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                scheduler TEXT NOT NULL,
+                taskset TEXT NOT NULL,
+                params TEXT NOT NULL,
+                seed INTEGER NOT NULL,
+                feasible INTEGER NOT NULL,
+                reason TEXT,
+                energy REAL,
+                hp_active_duration REAL,
+                lp_active_durations TEXT,
+                wall_time REAL NOT NULL,
+                finished_at REAL NOT NULL,
+                energy_variance REAL,
+                num_runs INTEGER,
+                rel_ci_width REAL,
+                PRIMARY KEY (scheduler, taskset, params, seed)
+            )""")
+        # stores created before the infeasibility reasons, expected-energy and adaptive cells do not have their columns yet
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(results)")]
+        for column, column_type in [("reason", "TEXT"), ("energy_variance", "REAL"), ("num_runs", "INTEGER"), ("rel_ci_width", "REAL")]:
+            if column not in columns:
+                self.conn.execute("ALTER TABLE results ADD COLUMN {0} {1}".format(column, column_type))
+        # likewise, the params keys of cells recorded before a System parameter was added lack it: they are completed with its
+        # DEFAULT_PARAMS value (the behaviour the cell ran with), so the cell keys of a rerun match them; a cell recorded again
+        # under the completed key since then keeps its newer result
+        for rowid, params in self.conn.execute("SELECT rowid, params FROM results").fetchall():
+            cell_params = json.loads(params)
+            if not DEFAULT_PARAMS.keys() <= cell_params.keys():
+                cell_params = dict(DEFAULT_PARAMS, **cell_params)
+                if not self.conn.execute("UPDATE OR IGNORE results SET params = ? WHERE rowid = ?",
+                                         (json.dumps(cell_params, sort_keys=True), rowid)).rowcount:
+                    self.conn.execute("DELETE FROM results WHERE rowid = ?", (rowid,))
+        self.conn.commit()
+
+    def close(self):
+        """
+        Close the connection to the store.
+        """
+        self.conn.close()
+
+    def get_completed_cells(self):
+        """
+        Get the set of (scheduler, taskset, params, seed) keys of the cells that are already in the store.
+        """
+        return set(self.conn.execute("SELECT scheduler, taskset, params, seed FROM results"))
+
+    def run(self, scheduler_types, tasksets, params, seeds, scale_hp_exec=False, prescreen=True, log_progress=True, expected=False,
+            rel_ci_width=None, max_runs=500, workers=1):
+        """
+        Run every cell of the sweep that is not in the store yet, recording each one as it completes.
+        The cells are the product of scheduler_types x tasksets x (product of the params value lists) x seeds.
+        Infeasible cells are recorded too (with feasible = 0 and the reason), so they are not retried either.
+        With prescreen, the tasksets are first checked with check_feasibility() for each scheduler and parameter combination,
+        and the cells of tasksets that fail are recorded as infeasible without running them.
+        Returns the number of cells that were run.
+
+        scheduler_types: list of schedulers to run, "FEST", "FEST-Large", "EnSuRe" and/or "EnSuRe-RL"
+        tasksets: list of taskset CSV files
+        params: dict of System parameter name -> list of values to sweep; parameters not given take their DEFAULT_PARAMS value
+        seeds: list of seeds; the fault generation of each cell uses its own rng derived from its seed (see cell_seed_sequence())
+        scale_hp_exec: whether to recompute the HP execution times of the tasksets from each cell's lp_hp_ratio
+        prescreen: whether to skip the simulation of tasksets that fail the schedulability conditions
+        log_progress: whether to print a line per cell that is run
+        expected: whether to record the exact expected energy of each cell (and its variance, over the fault times) instead of
+                  simulating one fault placement per seed; the seed does not change the result, so a single seed is enough.
+                  Cells whose expectation is not exact (see expected_energy() in ExpectedEnergy.py) are recorded as feasible,
+                  without an energy, with the reason
+        rel_ci_width: if given, each cell simulates fault scenarios until the confidence interval of its mean energy is within
+                      rel_ci_width of the mean (see System.run_until_precision()), recording the means, the number of runs and
+                      the achieved precision, instead of simulating one fault placement per seed
+        max_runs: maximum number of runs of a cell with rel_ci_width
+        workers: number of processes to run the cells on; with more than one, the tasksets are loaded once into a shared-memory
+                 TasksetCorpus that the workers read from, and the cells are recorded in the order they complete
+        """
+        names = list(params.keys())
+        completed = self.get_completed_cells()
+        corpus = TasksetCorpus.create([load_taskset_rows(taskset) for taskset in tasksets], tasksets) if workers > 1 else None
+        try:
+            return self._run_cells(scheduler_types, tasksets, params, seeds, scale_hp_exec, prescreen, log_progress, expected,
+                                   rel_ci_width, max_runs, workers, names, completed, corpus)
+        finally:
+            if corpus is not None:
+                corpus.close()
+                corpus.unlink()
+
+    def _run_cells(self, scheduler_types, tasksets, params, seeds, scale_hp_exec, prescreen, log_progress, expected,
+                   rel_ci_width, max_runs, workers, names, completed, corpus):
+        """
+        Run the cells of run(), on a pool of workers reading the tasksets from the corpus if workers > 1.
+        """
+        if not prescreen:
+            screened_tasksets = None
+        elif corpus is not None:
+            screened_tasksets = [tasks_from_rows(corpus.get_rows(t), "EnSuRe") for t in range(len(corpus))]
+        else:
+            screened_tasksets = [load_taskset(taskset, "EnSuRe") for taskset in tasksets]
+        pending = []        # (key, taskset index, cell params) of the cells left for the workers
+        screens = dict()    # (scheduler, frame, time_step, num_lp_cores) -> (mask, reasons) of the tasksets
+        num_run = 0
+        for scheduler_type, (t, taskset), values, seed in itertools.product(scheduler_types, enumerate(tasksets),
+                                                                            itertools.product(*params.values()), seeds):
+            cell_params = dict(DEFAULT_PARAMS)
+            cell_params.update(zip(names, values))
+            if scale_hp_exec:
+                cell_params["scale_hp_exec"] = True
+            if expected:
+                cell_params["expected"] = True
+            elif rel_ci_width is not None:
+                cell_params["target_rel_ci_width"] = rel_ci_width
+                cell_params["max_runs"] = max_runs
+            key = (scheduler_type, taskset, json.dumps(cell_params, sort_keys=True), seed)
+            if key in completed:
+                continue
+
+            if prescreen:
+                screen_key = (scheduler_type, cell_params["frame"], cell_params["time_step"], cell_params["num_lp_cores"])
+                if screen_key not in screens:
+                    screens[screen_key] = check_feasibility(scheduler_type, screened_tasksets, *screen_key[1:])
+                mask, reasons = screens[screen_key]
+                if not mask[t]:
+                    self.record(key, {"feasible": False, "reason": reasons[t], "energy": None, "hp_active_duration": None,
+                                      "lp_active_durations": None, "wall_time": 0})
+                    completed.add(key)
+                    continue
+
+            if log_progress:
+                print("Run {0}, {1}, {2}, seed {3}".format(scheduler_type, taskset, dict(zip(names, values)), seed))
+            if workers > 1:
+                pending.append((key, t, cell_params))
+                continue
+            self.record(key, self.run_cell(scheduler_type, taskset, cell_params, seed))
+            completed.add(key)
+            num_run += 1
+
+        if pending:
+            with ProcessPoolExecutor(workers, initializer=_init_corpus_worker, initargs=(corpus.name,)) as pool:
+                futures = {pool.submit(_run_corpus_cell, key[0], t, cell_params, key[3]): key for key, t, cell_params in pending}
+                for future in as_completed(futures):
+                    self.record(futures[future], future.result())
+                    num_run += 1
+        return num_run
+
+    def run_cell(self, scheduler_type, taskset, cell_params, seed):
+        """
+        Run a single cell of the sweep.
+        Returns a dict with its results: {"feasible", "reason", "energy", "hp_active_duration", "lp_active_durations", "wall_time"},
+        where the energy and durations are their expected values for an expected-energy cell, or their means for an adaptive cell;
+        these also return "energy_variance", and an adaptive cell "num_runs" and the achieved "rel_ci_width".
+
+        scheduler_type: the scheduler to run
+        taskset: the taskset CSV file
+        cell_params: dict of the System parameters of the cell (plus "scale_hp_exec" if the HP execution times are rescaled,
+                     "expected" for an expected-energy cell, and "target_rel_ci_width" and "max_runs" for an adaptive cell)
+        seed: the seed of the fault generation
+        """
+        rng = cell_seed_sequence(seed, scheduler_type, taskset, cell_params)
+        return simulate_cell(scheduler_type, load_taskset_rows(taskset), cell_params, rng)
+
+    def record(self, key, result):
+        """
+        Write the result of a cell to the store, committing immediately so that it survives an interruption of the sweep.
+
+        key: the (scheduler, taskset, params, seed) key of the cell
+        result: the dict returned by run_cell()
+        """
+        lp_active_durations = None if result["lp_active_durations"] is None else json.dumps(result["lp_active_durations"])
+        self.conn.execute("INSERT OR REPLACE INTO results (scheduler, taskset, params, seed, feasible, reason, energy, hp_active_duration, "
+                          "lp_active_durations, wall_time, finished_at, energy_variance, num_runs, rel_ci_width) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          key + (int(result["feasible"]), result["reason"], result["energy"], result["hp_active_duration"],
+                                 lp_active_durations, result["wall_time"], time.time(), result.get("energy_variance"),
+                                 result.get("num_runs"), result.get("rel_ci_width")))
+        self.conn.commit()
+
+    def get_results(self):
+        """
+        Get all recorded cells as a pandas DataFrame, with one column per System parameter (expanded from the params key),
+        e.g. for plotting: sweep.get_results().groupby(["scheduler", "num_lp_cores"])["energy"].mean()
+        """
+        results = pd.read_sql_query("SELECT * FROM results", self.conn)
+        params = pd.DataFrame([json.loads(p) for p in results["params"]], index=results.index)
+        results["feasible"] = results["feasible"].astype(bool)
+        return pd.concat([results.drop(columns="params"), params], axis=1)
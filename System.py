@@ -1,34 +1,54 @@
 from FEST_Scheduler import FEST_Scheduler
+from FEST_Large_Scheduler import FEST_Large_Scheduler
 from EnSuRe_Scheduler import EnSuRe_Scheduler
-from EnSuRe_RL_Scheduler import EnSuRe_RL_Scheduler
+from ExpectedEnergy import expected_energy
 from Core import Core
+from Profiler import Profiler
+from RunningStats import RunningStats
 import copy
+import numpy as np
 
 
 class System:
     """
-    Class which represents a heterogeneous system that has one or more Low-Power (LP) cores, and one High-Performance (HP) core.
+    Class which represents a heterogeneous system that has one or more Low-Power (LP) cores, and one or more High-Performance (HP) cores.
     """
 
-    def __init__(self, scheduler_type, k, frame, time_step, num_lp_cores, lp_hp_ratio, log_debug=False):
+    def __init__(self, scheduler_type, k, frame, time_step, num_lp_cores, lp_hp_ratio, log_debug=False, profile=False, trace=None,
+                 packing="round-robin", num_hp_cores=1, workers=1):
         """
         Class constructor (__init__).
 
-        scheduler_type: the scheduler to use, "FEST" or "EnSuRe"
+        scheduler_type: the scheduler to use, "FEST", "FEST-Large" (FEST for tasksets of up to millions of tasks), "EnSuRe" or "EnSuRe-RL"
         k: number of faults the system can support
         frame: size of the frame, in ms
         time_step: fidelity of each time step for the scheduler/task execution times, in ms
         lp_hp_ratio: ratio of LP to HP frequency
         log_debug: whether to print logging statements
+        profile: whether to record per-phase timers and counters (see get_profile_stats())
+        trace: TraceRecorder to record the execution trace of the simulation into (not recorded if None)
+        packing: LP core assignment policy of EnSuRe, "round-robin" (the original assignment), "best-fit" or "worst-fit"
+        num_hp_cores: number of HP (backup) cores (1 for EnSuRe-RL)
+        workers: number of processes EnSuRe simulates the time-windows on in parallel (1 simulates them in order)
         """
+        self.profiler = Profiler(profile)
+
         # define scheduler
         self.scheduler_type = scheduler_type
         if scheduler_type == "FEST":
-            self.scheduler = FEST_Scheduler(k, frame, time_step, log_debug)
+            self.scheduler = FEST_Scheduler(k, frame, time_step, log_debug, self.profiler, trace, num_hp_cores)
+        elif scheduler_type == "FEST-Large":
+            self.scheduler = FEST_Large_Scheduler(k, frame, time_step, log_debug, self.profiler, trace, num_hp_cores)
         elif scheduler_type == "EnSuRe":
-            self.scheduler = EnSuRe_Scheduler(k, frame, time_step, num_lp_cores, lp_hp_ratio, log_debug)
+            self.scheduler = EnSuRe_Scheduler(k, frame, time_step, num_lp_cores, lp_hp_ratio, log_debug, self.profiler, trace, packing,
+                                              num_hp_cores, workers)
         elif scheduler_type == "EnSuRe-RL":
-            self.scheduler = EnSuRe_RL_Scheduler(k, frame, time_step, num_lp_cores, lp_hp_ratio, log_debug)
+            # its policy decides between the LP cores and a single HP core, so its backup copies only ever run on the first one
+            if num_hp_cores > 1:
+                raise ValueError("EnSuRe-RL supports a single HP core, not {0}".format(num_hp_cores))
+            # imported here so that FEST/EnSuRe runs do not need stable_baselines3
+            from EnSuRe_RL_Scheduler import EnSuRe_RL_Scheduler
+            self.scheduler = EnSuRe_RL_Scheduler(k, frame, time_step, num_lp_cores, lp_hp_ratio, log_debug, self.profiler, trace)
         # else:
         #     raise SystemExit("Invalid scheduler type given.")
 
@@ -38,27 +58,43 @@ class System:
         self.lp_cores = []
         for i in range(num_lp_cores):
             self.lp_cores.append(Core(name="LP_Core{0}".format(i), isLP=True, ai=0.3, f=lp_freq, xi=0.03, p_idle=0.02))
-        self.hp_core = Core(name="HP_Core", isLP=False, ai=1.0, f=hp_freq, xi=0.1, p_idle=0.05)
+        self.hp_cores = []
+        for i in range(num_hp_cores):
+            self.hp_cores.append(Core(name="HP_Core" if i == 0 else "HP_Core{0}".format(i), isLP=False, ai=1.0, f=hp_freq, xi=0.1, p_idle=0.05))
+        self.hp_core = self.hp_cores[0]     # the (first) HP core
 
         # logging
         self.log_debug = log_debug  # whether to print log statements or not
 
-    def run(self, taskset):
+    def run(self, taskset, rng=None):
         """
         Runs the scheduling algorithm with the following high-level steps:
         1. Generate schedule. If no feasible schedule can be generated, exit
         2. Simulate execution of the tasks, and calculate the system's energy consumption
         3. Print the results of the simulation (if log_debug == True)
+        Returns True if the taskset was simulated, or False if no feasible schedule could be generated.
 
         taskset: the taskset to be scheduled by the algorithm.
+        rng: seed, np.random.SeedSequence or np.random.Generator for the fault generation of this run, so that the run is
+             reproducible independently of other runs (the global random module is used if None)
         """
+        # the profiler records the stats of this run only (see get_profile_stats())
+        self.profiler.reset()
+        self.profiler.begin_run()
+        self.set_rng(rng)
+
         # make a copy of the task set to allow reusability
-        tasks = copy.deepcopy(taskset)
+        self.profiler.start("deepcopy")
+        tasks = self.copy_taskset(taskset)
+        self.profiler.stop("deepcopy")
 
         # 1. Generate schedule
-        if not self.scheduler.generate_schedule(tasks):
+        self.profiler.start("generate_schedule")
+        feasible = self.scheduler.generate_schedule(tasks)
+        self.profiler.stop("generate_schedule")
+        if not feasible:
             print("Failed to generate schedule. Exiting simulation")
-            return
+            return False
 
         if self.log_debug:
             print("Schedule generated")
@@ -68,23 +104,31 @@ class System:
         if self.log_debug:
             print("Start running simulation ...")
         # start running the scheduler
-        self.scheduler.simulate(self.lp_cores, self.hp_core)
+        self.scheduler.simulate(self.lp_cores, self.hp_cores)
 
         # 3. RESULTS
         if self.log_debug:
             print("===RESULTS===")
         # check which core executed each tasks
 
-        # check if any tasks did not manage to complete
+        # check if any tasks did not manage to complete (one backup task per HP core may still be finishing at the end)
         if self.scheduler_type == "FEST":
-            if len(self.scheduler.backup_list) > 1:
+            if len(self.scheduler.backup_list) > len(self.hp_cores):
                 print("THIS SHOULD NOT HAPPEN, BUT,")
                 print("Some tasks did not get to execute: ")
                 for task in self.scheduler.backup_list:
                     print(task.getId())
+        elif self.scheduler_type == "FEST-Large":
+            if len(self.scheduler.backup_ids) > len(self.hp_cores):
+                print("THIS SHOULD NOT HAPPEN, BUT,")
+                print("Some tasks did not get to execute: ")
+                for taskId in self.scheduler.backup_ids.tolist():
+                    print(taskId)
         elif self.scheduler_type == "EnSuRe" or self.scheduler_type == "EnSuRe-RL":
-            for backup_list in self.scheduler.backup_list:
-                if len(backup_list) > 1:
+            backup_lists = self.scheduler.backup_list if self.scheduler_type == "EnSuRe-RL" else \
+                [self.scheduler.get_backup_tasks(i) for i in range(len(self.scheduler.deadlines))]
+            for backup_list in backup_lists:
+                if len(backup_list) > len(self.hp_cores):
                     print("THIS SHOULD NOT HAPPEN, BUT,")
                     print("Some tasks did not get to execute: ")
                     for task in backup_list:
@@ -95,11 +139,149 @@ class System:
             print("Active Durations:")
             for lpcore in self.lp_cores:
                 print("  {0}: {1}".format(lpcore.name, lpcore.get_active_duration()))
-            print("  {0}: {1}".format(self.hp_core.name, self.hp_core.get_active_duration()))
+            for hpcore in self.hp_cores:
+                print("  {0}: {1}".format(hpcore.name, hpcore.get_active_duration()))
             print("Energy Consumption:")
             for lpcore in self.lp_cores:
                 print("  {0}: {1}".format(lpcore.name, lpcore.get_energy_consumed()))
-            print("  {0}: {1}".format(self.hp_core.name, self.hp_core.get_energy_consumed()))
+            for hpcore in self.hp_cores:
+                print("  {0}: {1}".format(hpcore.name, hpcore.get_energy_consumed()))
+
+        return True
+
+    def run_frames(self, taskset, num_frames, rng=None):
+        """
+        Streaming mode: simulates num_frames consecutive frames of the taskset, yielding the results of each frame as it completes.
+        The schedule is generated once and reused for every frame, with fresh fault occurrences drawn per frame.
+        The cores are reset after every frame and the energy is accumulated incrementally, so memory use does not grow with num_frames
+        (unless a TraceRecorder is attached, which records every frame).
+
+        Yields a dict per frame: {"frame", "energy", "lp_active_durations", "hp_active_duration", "total_energy"}.
+
+        taskset: the taskset to be scheduled by the algorithm.
+        num_frames: number of frames to simulate.
+        rng: seed, np.random.SeedSequence or np.random.Generator for the fault generation of all frames (see run())
+        """
+        # the profiler records the stats of this run only (see get_profile_stats())
+        self.profiler.reset()
+        self.profiler.begin_run()
+        self.set_rng(rng)
+
+        # make a copy of the task set to allow reusability
+        self.profiler.start("deepcopy")
+        tasks = self.copy_taskset(taskset)
+        self.profiler.stop("deepcopy")
+
+        # 1. Generate schedule once
+        self.profiler.start("generate_schedule")
+        feasible = self.scheduler.generate_schedule(tasks)
+        self.profiler.stop("generate_schedule")
+        if not feasible:
+            print("Failed to generate schedule. Exiting simulation")
+            return
+
+        # 2. Simulate each frame on the same schedule
+        total_energy = 0
+        for frame in range(num_frames):
+            if frame > 0:
+                self.scheduler.reset_simulation()
+            for core in self.lp_cores + self.hp_cores:
+                core.reset()
+
+            self.scheduler.simulate(self.lp_cores, self.hp_cores)
+
+            energy = self.get_energy_consumption()
+            total_energy += energy
+            yield {
+                "frame": frame,
+                "energy": energy,
+                "lp_active_durations": [lpcore.get_active_duration() for lpcore in self.lp_cores],
+                "hp_active_duration": self.get_hpcore_active_duration(),
+                "total_energy": total_energy,
+            }
+
+    def run_until_precision(self, taskset, rel_ci_width=0.01, confidence=0.95, min_runs=5, max_runs=1000, rng=None):
+        """
+        Adaptive repeats: simulates fault scenarios of the taskset (one frame each, see run_frames()) until the confidence interval
+        of the mean energy consumption is within rel_ci_width of the mean, or max_runs scenarios have been run.
+        The running mean and variance are tracked with Welford's updates, so low-variance tasksets stop after a few runs and the
+        simulation time goes to the high-variance ones.
+        Returns a dict {"energy", "energy_variance", "hp_active_duration", "lp_active_durations", "num_runs", "rel_ci_width",
+        "converged"} of the means over the runs, the sample variance of the energy, and the achieved relative precision,
+        or None if no feasible schedule could be generated.
+
+        taskset: the taskset to be scheduled by the algorithm.
+        rel_ci_width: target half-width of the confidence interval of the mean energy, relative to the mean (e.g. 0.01 = 1%)
+        confidence: confidence level of the interval
+        min_runs: minimum number of runs, so the variance estimate is not trusted too early
+        max_runs: maximum number of runs
+        rng: seed, np.random.SeedSequence or np.random.Generator for the fault generation of all runs (see run())
+        """
+        energy = RunningStats()
+        hp_active_duration = RunningStats()
+        lp_active_durations = [RunningStats() for _ in self.lp_cores]
+        for result in self.run_frames(taskset, max_runs, rng):
+            energy.add(result["energy"])
+            hp_active_duration.add(result["hp_active_duration"])
+            for stats, duration in zip(lp_active_durations, result["lp_active_durations"]):
+                stats.add(duration)
+            if energy.count >= min_runs and energy.get_relative_ci_width(confidence) <= rel_ci_width:
+                break
+
+        if energy.count == 0:
+            return None
+        achieved = energy.get_relative_ci_width(confidence)
+        if self.log_debug:
+            print("{0} runs, energy {1} +/- {2:.2%}".format(energy.count, energy.mean, achieved))
+        return {
+            "energy": energy.mean,
+            "energy_variance": energy.get_variance(),
+            "hp_active_duration": hp_active_duration.mean,
+            "lp_active_durations": [stats.mean for stats in lp_active_durations],
+            "num_runs": energy.count,
+            "rel_ci_width": achieved,
+            "converged": achieved <= rel_ci_width,
+        }
+
+    def expected_energy(self, taskset):
+        """
+        Compute the expected energy consumption of the taskset's schedule over the random fault times, and its variance,
+        exactly instead of by repeated runs (see expected_energy() in ExpectedEnergy.py). The cores are not simulated.
+        Returns the dict of expected_energy(), or None if no feasible schedule could be generated.
+        Raises ValueError if the expectation is not exact for the schedule (see expected_energy()).
+
+        taskset: the taskset to be scheduled by the algorithm (FEST or EnSuRe)
+        """
+        if self.scheduler_type == "EnSuRe-RL":
+            print("Expected energy is not supported for EnSuRe-RL, whose backup decisions depend on the learned policy")
+            return None
+        if self.scheduler_type == "FEST-Large":
+            print("Expected energy is not supported for FEST-Large, use FEST for the exact expectation of small tasksets")
+            return None
+        tasks = self.copy_taskset(taskset)
+        if not self.scheduler.generate_schedule(tasks):
+            print("Failed to generate schedule. Exiting simulation")
+            return None
+        return expected_energy(self.scheduler, self.lp_cores, self.hp_cores)
+
+    def copy_taskset(self, taskset):
+        """
+        Copy a taskset before it is scheduled, since the schedulers modify the tasks. FEST-Large does not modify them (and may be
+        given millions of tasks), so its taskset is not copied.
+
+        taskset: the taskset to be scheduled by the algorithm
+        """
+        if self.scheduler_type == "FEST-Large":
+            return taskset
+        return copy.deepcopy(taskset)
+
+    def set_rng(self, rng):
+        """
+        Pass the random number generator of a run to the scheduler's fault generation.
+
+        rng: seed, np.random.SeedSequence or np.random.Generator (None to use the global random module)
+        """
+        self.scheduler.rng = None if rng is None else np.random.default_rng(rng)
 
     def get_energy_consumption(self):
         """
@@ -108,12 +290,42 @@ class System:
         energy_consumption = 0
         for lpcore in self.lp_cores:
             energy_consumption += lpcore.get_energy_consumed()
-        energy_consumption += self.hp_core.get_energy_consumed()
+        for hpcore in self.hp_cores:
+            energy_consumption += hpcore.get_energy_consumed()
 
         return energy_consumption
 
+    def get_task_energy(self):
+        """
+        Get the active energy consumption attributed to each task, summed over all cores, as a dict of task id -> energy.
+        """
+        return self._merge_energy([core.get_task_energy() for core in self.lp_cores + self.hp_cores])
+
+    def get_window_energy(self):
+        """
+        Get the active energy consumption attributed to each time-window, summed over all cores, as a dict of time-window -> energy.
+        """
+        return self._merge_energy([core.get_window_energy() for core in self.lp_cores + self.hp_cores])
+
+    def _merge_energy(self, energies):
+        """
+        Sum a list of dicts of key -> energy into one dict.
+        """
+        merged = dict()
+        for energy in energies:
+            for key, value in energy.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def get_profile_stats(self):
+        """
+        Get the timers and counters recorded by the profiler during the last run() or run_frames() call (only populated if the
+        System was created with profile=True). Stats of several runs can be combined with aggregate_stats() from Profiler.py.
+        """
+        return self.profiler.get_stats()
+
     def get_hpcore_active_duration(self):
         """
-        Get the duration that the HP core was active.
+        Get the duration that the HP core was active (summed over the HP cores, if there are several).
         """
-        return self.hp_core.get_active_duration()
+        return sum(hpcore.get_active_duration() for hpcore in self.hp_cores)
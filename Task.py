@@ -98,6 +98,14 @@ class Task:
         """
         self.hpExecutedDuration = duration
     
+    def resetEncounteredFault(self):
+        """
+        Reset whether the task encountered a fault, so that the same schedule can be simulated again (e.g. in the next frame).
+        """
+        self.encounteredFault = False
+        self.lpExecutedDuration = self.lpExecTime
+        self.hpExecutedDuration = 0
+
     def getEncounteredFault(self):
         """
         Get whether the task encountered a fault during its execution.
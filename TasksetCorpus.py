@@ -0,0 +1,153 @@
+import json
+import sys
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+def attach_shared_memory(name):
+    """
+    Attach to a shared memory block created by another process, without this process ever unlinking it.
+
+    name: the name of the shared memory block
+    """
+    # the block is tracked only by the creating process, which unlinks it: a process with a resource tracker of its own
+    # (e.g. a spawned worker) would otherwise unlink the block when it exits, as if it had leaked it, and a forked worker,
+    # which shares the creator's tracker, must not unregister the creator's registration either
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    # before Python 3.13, attaching always registers the block, so the registration is skipped while attaching
+    register = resource_tracker.register
+
+    def register_untracked(resource_name, rtype):
+        if rtype != "shared_memory":
+            register(resource_name, rtype)
+
+    resource_tracker.register = register_untracked
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class TasksetCorpus:
+    """
+    Class which holds all tasksets of a sweep in one multiprocessing.shared_memory block, so that worker processes attach to
+    it by name and read the tasksets zero-copy, instead of each opening and parsing the taskset CSV files.
+
+    Block layout (all 8-byte aligned):
+        header:    int64[3]                  no. tasksets, no. tasks (over all tasksets), length of the names in bytes
+        offsets:   int64[no. tasksets + 1]   taskset t is tasks offsets[t]..offsets[t+1]
+        ids:       int64[no. tasks]          task ids
+        lp_exec:   float64[no. tasks]        LP execution times
+        hp_exec:   float64[no. tasks]        HP execution times
+        deadlines: float64[no. tasks]        deadlines
+        names:     the taskset names, as UTF-8 JSON
+    """
+    HEADER = 3
+
+    def __init__(self, shm, owner):
+        """
+        Class constructor (__init__). Use TasksetCorpus.create() or TasksetCorpus.attach() instead.
+
+        shm: the shared_memory.SharedMemory block
+        owner: whether this process created the block (and unlinks it with unlink())
+        """
+        self.shm = shm
+        self.owner = owner
+        num_tasksets, num_tasks, names_len = np.ndarray((TasksetCorpus.HEADER,), np.int64, shm.buf).tolist()
+        pos = TasksetCorpus.HEADER * 8
+        self.offsets = np.ndarray((num_tasksets + 1,), np.int64, shm.buf, pos)
+        pos += (num_tasksets + 1) * 8
+        self.ids = np.ndarray((num_tasks,), np.int64, shm.buf, pos)
+        pos += num_tasks * 8
+        self.lp_exec = np.ndarray((num_tasks,), np.float64, shm.buf, pos)
+        pos += num_tasks * 8
+        self.hp_exec = np.ndarray((num_tasks,), np.float64, shm.buf, pos)
+        pos += num_tasks * 8
+        self.deadlines = np.ndarray((num_tasks,), np.float64, shm.buf, pos)
+        pos += num_tasks * 8
+        self.names = json.loads(bytes(shm.buf[pos:pos + names_len]).decode())
+
+    @staticmethod
+    def create(tasksets, names):
+        """
+        Create a corpus in a new shared memory block.
+
+        tasksets: list of tasksets, each a list of (task id, LP execution time, HP execution time, deadline) rows (as loaded by
+                  load_taskset_rows() or generated by TasksetGenerator.generate_rows())
+        names: name of each taskset (e.g. its CSV file)
+        """
+        num_tasks = sum(len(rows) for rows in tasksets)
+        names_bytes = json.dumps(list(names)).encode()
+        size = (TasksetCorpus.HEADER + len(tasksets) + 1 + 4 * num_tasks) * 8 + len(names_bytes)
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+        pos = TasksetCorpus.HEADER * 8
+        np.ndarray((TasksetCorpus.HEADER,), np.int64, shm.buf)[:] = [len(tasksets), num_tasks, len(names_bytes)]
+        np.ndarray((len(tasksets) + 1,), np.int64, shm.buf, pos)[:] = np.cumsum([0] + [len(rows) for rows in tasksets])
+        pos += (len(tasksets) + 1) * 8
+        columns = np.array([row for rows in tasksets for row in rows], dtype=np.float64).reshape(num_tasks, 4)
+        np.ndarray((num_tasks,), np.int64, shm.buf, pos)[:] = columns[:, 0]
+        pos += num_tasks * 8
+        for c in range(1, 4):
+            np.ndarray((num_tasks,), np.float64, shm.buf, pos)[:] = columns[:, c]
+            pos += num_tasks * 8
+        shm.buf[pos:pos + len(names_bytes)] = names_bytes
+        return TasksetCorpus(shm, True)
+
+    @staticmethod
+    def attach(name):
+        """
+        Attach to a corpus created by another process.
+
+        name: the name of its shared memory block (TasksetCorpus.name)
+        """
+        return TasksetCorpus(attach_shared_memory(name), False)
+
+    @property
+    def name(self):
+        """
+        The name of the shared memory block, for TasksetCorpus.attach().
+        """
+        return self.shm.name
+
+    def __len__(self):
+        """
+        Get the number of tasksets in the corpus.
+        """
+        return len(self.offsets) - 1
+
+    def get_arrays(self, t):
+        """
+        Get the columns of a taskset as zero-copy NumPy views into the shared memory block: {"ids", "lp_exec", "hp_exec", "deadlines"}.
+        The views must be dropped before close() is called.
+
+        t: index of the taskset
+        """
+        start, end = self.offsets[t], self.offsets[t + 1]
+        return {"ids": self.ids[start:end], "lp_exec": self.lp_exec[start:end], "hp_exec": self.hp_exec[start:end],
+                "deadlines": self.deadlines[start:end]}
+
+    def get_rows(self, t):
+        """
+        Get a taskset as a list of (task id, LP execution time, HP execution time, deadline) rows, e.g. for tasks_from_rows().
+
+        t: index of the taskset
+        """
+        start, end = self.offsets[t], self.offsets[t + 1]
+        return list(zip(self.ids[start:end].tolist(), self.lp_exec[start:end].tolist(), self.hp_exec[start:end].tolist(),
+                        self.deadlines[start:end].tolist()))
+
+    def close(self):
+        """
+        Detach this process from the shared memory block.
+        """
+        self.offsets = self.ids = self.lp_exec = self.hp_exec = self.deadlines = None
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Free the shared memory block, once every process is done with it (only the process that created it can unlink it).
+        """
+        if self.owner:
+            self.shm.unlink()
@@ -16,6 +16,7 @@ class TasksetGenerator:
         precision_dp: the precision (number of decimal places) for task execution times
         num_lpcores: no. primary (LP) cores
         lp_hp_ratio: the frequency ratio of the LP/HP cores
+        seed: seed, np.random.Generator or np.random.RandomState for the taskset generation (the global np.random state if None)
         """
         self.distribution = distribution
         self.n = n
@@ -35,15 +36,33 @@ class TasksetGenerator:
         # Determine expected "magnitude" to meet target system utilisation (sys_util * frame_duration) * no. cores
         self.target_magnitude = self.sys_util * self.frame_duration * self.num_lpcores
 
-        # if seed is given, seed the rng
-        if seed is not None:
-            np.random.seed(seed)
+        # with a seed, an own rng, so that generating a taskset does not depend on or change the global np.random state
+        # (a seed gives the same tasksets as seeding the global np.random did; a Generator or RandomState is used as is);
+        # without one, the np.random module functions (the global np.random state), so that callers can still make the
+        # generation reproducible with np.random.seed()
+        if seed is None:
+            self.rng = np.random
+        elif isinstance(seed, (np.random.Generator, np.random.RandomState)):
+            self.rng = seed
+        else:
+            self.rng = np.random.RandomState(seed)
 
     def generate(self, filename):
         """
         Generates a random taskset and stores the taskset in a CSV file.
 
         filename: Name of the file to write to. If the file already exists, it will be overwritten, else it will be created.
+        """
+        tasks = ""
+        for task in self.generate_rows():
+            tasks = tasks + ",".join(str(x) for x in task) + "\n"
+        with open(filename, 'w') as f:
+            f.write(tasks)
+
+    def generate_rows(self):
+        """
+        Generates a random taskset in memory, as a list of (task id, LP execution time, HP execution time, deadline) tuples:
+        the rows generate() writes to the CSV file, with the same values as reading them back gives.
 
         Taskset Generation Procedure
         1. Randomise n numbers from 0 to 1  - uniform distribution or normal distribution
@@ -55,9 +74,9 @@ class TasksetGenerator:
 
         # 1. Randomly sample n numbers
         if self.distribution == "uniform":
-            rand_sample = np.random.random_sample(self.n)
+            rand_sample = self.rng.random(self.n)
         elif self.distribution == "normal":
-            rand_sample = np.random.normal(loc=self.mean, scale=self.sd, size=self.n)
+            rand_sample = self.rng.normal(loc=self.mean, scale=self.sd, size=self.n)
             # normalize to min_norm to 1
             rand_sample = (1-self.min_norm)*(rand_sample - np.min(rand_sample))/np.ptp(rand_sample) + self.min_norm
 
@@ -77,38 +96,18 @@ class TasksetGenerator:
         possible_deadlines = [(min_window_size+i*window_size) for i in range(1, num_time_windows)]
         possible_deadlines.append(self.frame_duration)
         for i in range(len(exec_times)):
-            deadline = np.random.choice(possible_deadlines)    # randomly pick one of the time windows as the deadline
+            deadline = self.rng.choice(possible_deadlines)    # randomly pick one of the time windows as the deadline
             deadlines.append(deadline)
 
         # 5. Generate the task data
-        tasks = ""
-        lpexec_check = []
-        hpexec_check = []
+        tasks = []
         for i in range(len(exec_times)):
-            # i. task id
-            tasks = tasks + str(i) + ","
+            # i. LP execution time (rounded to precision)
+            lp_exec = float(round(exec_times[i], self.precision))
 
-            # ii. LP execution time (rounded to precision)
-            lp_exec = round(exec_times[i], self.precision)
-            tasks = tasks + str(lp_exec) + ","
-            
-            lpexec_check.append(lp_exec)
+            # ii. HP execution time (rounded to precision)
+            hp_exec = float(round(lp_exec * self.lp_hp_ratio, self.precision))
 
-            # iii. HP execution time (rounded to precision)
-            hp_exec = round(lp_exec * self.lp_hp_ratio, self.precision)
-            tasks = tasks + str(hp_exec) + ","
-
-            hpexec_check.append(hp_exec)
-
-            # iii. task deadline (for EnSuRe only)
-            tasks = tasks + str(deadlines[i])
-
-            tasks = tasks + "\n"
-
-        # 5. Write task data to CSV file
-        # print(np.max(lpexec_check))
-        # print(np.min(lpexec_check))
-        # print(sum(lpexec_check))
-        # print(sum(hpexec_check))
-        with open(filename, 'w') as f:
-            f.write(tasks)
\ No newline at end of file
+            # iii. task id, execution times and deadline (for EnSuRe only)
+            tasks.append((i, lp_exec, hp_exec, float(deadlines[i])))
+        return tasks
\ No newline at end of file
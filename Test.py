@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 from TasksetGenerator import TasksetGenerator
 from System import System
+from Pipeline import Pipeline
 from Task import Task
 from ApproxTask import ApproxTask
 
@@ -18,7 +19,10 @@ time_step = 1 / 10 ** precision_dp  # Time step for execution time
 lp_hp_ratio = 0.8  # LP core:HP core speed ratio
 num_lpcores = [1, 2, 3, 4]
 seed = 50
-repeat = 5  # Times to run for average
+repeat = 5  # Times to run for average (the minimum number of runs, with rel_ci_width)
+max_repeat = 500  # Maximum times to run for average, with rel_ci_width
+rel_ci_width = None  # Target half-width of the 95% confidence interval of the average, relative to it, to run each taskset
+                     # until it is reached instead of repeat times (e.g. 0.01; much slower at this time_step)
 k = 20  # Scheduler parameters
 # Scheduler parameters for LP/HP core speed ratio
 lp_hp_ratios = [0.2, 0.4, 0.6, 0.8, 1.0]
@@ -39,10 +43,19 @@ def generate_tasksets():
                 taskset_gen.generate(f'tasksets/sysutil{sys_util}_cores{x}_{i}.csv')
 
 
+# Run the simulation of a taskset repeat times, or until the average energy consumption is precise enough with rel_ci_width
+# (None if no feasible schedule could be generated)
+def run_taskset(system, tasks):
+    if rel_ci_width is None:
+        return system.run_until_precision(tasks, 0, min_runs=repeat, max_runs=repeat)
+    return system.run_until_precision(tasks, rel_ci_width, min_runs=repeat, max_runs=max_repeat)
+
+
 # Run simulation and calculate energy consumption
 def run(scheduler_type, num_lpcores):
     sys_util = 0.5  # Fixed at 50% system utilization
     energy_consumed_per_sysutil = 0
+    feasible_sets = 0
 
     for i in range(num_sets):
         # Import task set from CSV
@@ -59,18 +72,17 @@ def run(scheduler_type, num_lpcores):
                 tasks.append(ApproxTask(task[0], task[1], task[2], task[3]))
 
         # Run the simulation and compute energy consumption
-        energy_consumed = 0
-        for x in range(repeat):
-            system = System(scheduler_type, k, frame_duration, time_step, num_lpcores, lp_hp_ratio, False)
-            system.run(tasks)
-            energy_consumed += system.get_energy_consumption()
-
-        energy_consumed /= repeat  # Average energy consumption
-        energy_consumed_per_sysutil += energy_consumed
+        system = System(scheduler_type, k, frame_duration, time_step, num_lpcores, lp_hp_ratio, False)
+        result = run_taskset(system, tasks)
+        if result is None:  # no feasible schedule, skip the taskset
+            print(f"  taskset {i}: infeasible, skipped")
+            continue
+        print(f"  taskset {i}: {result['num_runs']} runs, +/- {result['rel_ci_width']:.2%}")
+        energy_consumed_per_sysutil += result["energy"]  # Average energy consumption
+        feasible_sets += 1
 
-    # Average energy consumption for this sys_util value
-    energy_consumed_per_sysutil /= num_sets
-    return energy_consumed_per_sysutil
+    # Average energy consumption for this sys_util value, over the feasible tasksets
+    return energy_consumed_per_sysutil / feasible_sets if feasible_sets > 0 else np.nan
 
 
 # Run experiments for different configurations
@@ -86,9 +98,28 @@ def run_experiments():
     print(energy_consumed_results)
 
 
+# Run the same experiments as a pipeline: the tasksets are generated in memory and simulated as soon as they are generated,
+# on all CPUs, without writing the CSV files first (each cell is run with repeat seeds instead of until the target precision)
+def run_experiments_pipelined():
+    configs = [dict(distribution="normal", n=n, frame_duration=frame_duration, sys_util=0.5, precision_dp=precision_taskgen,
+                    num_lpcores=1, lp_hp_ratio=lp_hp_ratio, seed=seed) for i in range(num_sets)]
+    params = {"k": [k], "frame": [frame_duration], "time_step": [time_step], "lp_hp_ratio": [lp_hp_ratio], "num_lp_cores": num_lpcores}
+    results = Pipeline().run(configs, ["FEST", "EnSuRe"], params, range(repeat), log_progress=False)
+
+    # average energy consumption over the tasksets and seeds of each configuration
+    configurations = [("FEST", 1)] + [("EnSuRe", num_lp) for num_lp in num_lpcores]
+    for scheduler_type, num_lp in configurations:
+        energies = [r["energy"] for r in results
+                    if r["feasible"] and r["scheduler"] == scheduler_type and r["params"]["num_lp_cores"] == num_lp]
+        energy_consumed_results.append(np.mean(energies))
+
+    print("Done")
+    print(energy_consumed_results)
+
+
 # Normalize results for plotting
 def normalize_results():
-    max_energy = max(energy_consumed_results)
+    max_energy = np.nanmax(energy_consumed_results)
     results_norm = np.array(energy_consumed_results) / max_energy
     print(results_norm)
     return results_norm
@@ -105,10 +136,11 @@ def plot_results():
     plt.show()
 
 
-# Running the experiments
-generate_tasksets()
-run_experiments()
-plot_results()
+# Running the experiments (only when run as a script: see "python -m ftrt sweep" for running experiments headless)
+if __name__ == "__main__":
+    generate_tasksets()
+    run_experiments()
+    plot_results()
 
 
 
@@ -119,6 +151,7 @@ def run_with_speed_ratios():
     for spd_ratio in lp_hp_ratios:
         energy_consumed_per_sysutil = 0
         active_duration_per_spdratio = 0
+        feasible_sets = 0
         for i in range(num_sets):
             # Import task set from CSV
             with open(f'tasksets/sysutil{0.5}_cores{1}_{i}.csv') as read_obj:
@@ -135,21 +168,17 @@ def run_with_speed_ratios():
                     tasks.append(ApproxTask(task[0], task[1], hp_execTime, 0, 0, task[3]))
 
             # Run the simulation and compute energy consumption
-            energy_consumed = 0
-            active_duration = 0
-            for x in range(repeat):
-                system = System(scheduler_type, k, frame_duration, time_step, 1, spd_ratio)
-                system.run(tasks)
-                energy_consumed += system.get_energy_consumption()
-                active_duration += system.get_hpcore_active_duration()
-
-            energy_consumed /= repeat
-            active_duration /= repeat
-            energy_consumed_per_sysutil += energy_consumed
-            active_duration_per_spdratio += active_duration
-
-        energy_consumed_per_sysutil /= num_sets
-        active_duration_per_spdratio /= num_sets
+            system = System(scheduler_type, k, frame_duration, time_step, 1, spd_ratio)
+            result = run_taskset(system, tasks)
+            if result is None:  # no feasible schedule, skip the taskset
+                continue
+            energy_consumed_per_sysutil += result["energy"]
+            active_duration_per_spdratio += result["hp_active_duration"]
+            feasible_sets += 1
+
+        # averages over the feasible tasksets
+        energy_consumed_per_sysutil = energy_consumed_per_sysutil / feasible_sets if feasible_sets > 0 else np.nan
+        active_duration_per_spdratio = active_duration_per_spdratio / feasible_sets if feasible_sets > 0 else np.nan
         energy_consumed_results.append(energy_consumed_per_sysutil)
         active_duration_results.append(active_duration_per_spdratio)
 
@@ -157,7 +186,7 @@ def run_with_speed_ratios():
 # Plot energy consumption and active duration vs LP/HP core speed ratio
 def plot_speed_ratio_results():
     run_with_speed_ratios()
-    max_energy = max(energy_consumed_results)
+    max_energy = np.nanmax(energy_consumed_results)
     results_norm = np.array(energy_consumed_results) / max_energy
     plt.title('Energy Consumption vs LP/HP Core Speed (Ratio)')
     plt.xlabel('LP/HP Core Frequency (Ratio)')
@@ -0,0 +1,126 @@
+import json
+import numpy as np
+
+
+class TraceRecorder:
+    """
+    Class which records the execution trace of a simulation as fixed-size binary records.
+    Records are appended into a preallocated NumPy structured array (grown by doubling when full),
+    so schedules of thousands of tasks can be inspected without any console I/O during the run.
+    """
+    # event kinds
+    START = 0           # primary copy started on an LP core
+    COMPLETE = 1        # primary or backup copy completed successfully
+    FAULT = 2           # primary copy stopped because of a fault
+    BACKUP_START = 3    # backup copy started on the HP core
+    BACKUP_CANCEL = 4   # backup copy cancelled, since its primary copy completed
+    KIND_NAMES = ["start", "complete", "fault", "backup-start", "backup-cancel"]
+
+    # core id used for the (first) HP (backup) core; HP core i uses HP_CORE - i, and LP cores use their index in System.lp_cores
+    HP_CORE = -1
+
+    DTYPE = np.dtype([("time", np.float64), ("core", np.int16), ("task", np.int32), ("kind", np.uint8)])
+
+    def __init__(self, capacity=4096):
+        """
+        Class constructor (__init__).
+
+        capacity: no. records to preallocate
+        """
+        self.records = np.zeros(capacity, dtype=TraceRecorder.DTYPE)
+        self.size = 0
+
+    def record(self, time, core, task, kind):
+        """
+        Append a record to the trace.
+
+        time: simulation time of the event, in ms
+        core: index of the LP core, or TraceRecorder.HP_CORE - index of the HP core
+        task: the task id
+        kind: one of TraceRecorder.START, COMPLETE, FAULT, BACKUP_START, BACKUP_CANCEL
+        """
+        if self.size >= len(self.records):
+            grown = np.zeros(max(1, 2 * len(self.records)), dtype=TraceRecorder.DTYPE)
+            grown[:self.size] = self.records[:self.size]
+            self.records = grown
+        self.records[self.size] = (time, core, task, kind)
+        self.size += 1
+
+    def extend(self, records):
+        """
+        Append records recorded elsewhere (e.g. by a worker process simulating a time-window) to the trace.
+
+        records: structured array of records, as returned by get_records()
+        """
+        if self.size + len(records) > len(self.records):
+            grown = np.zeros(max(2 * len(self.records), self.size + len(records)), dtype=TraceRecorder.DTYPE)
+            grown[:self.size] = self.records[:self.size]
+            self.records = grown
+        self.records[self.size:self.size + len(records)] = records
+        self.size += len(records)
+
+    def get_records(self):
+        """
+        Get the recorded events, as a structured array with fields time, core, task and kind.
+        """
+        return self.records[:self.size]
+
+    def save(self, filename):
+        """
+        Dump the recorded events to a .npy file (load it back with TraceRecorder.load()).
+
+        filename: the .npy file to write to
+        """
+        np.save(filename, self.get_records())
+
+    @staticmethod
+    def load(filename):
+        """
+        Load a trace previously dumped with save().
+
+        filename: the .npy file to read from
+        """
+        trace = TraceRecorder(capacity=0)
+        trace.records = np.load(filename)
+        trace.size = len(trace.records)
+        return trace
+
+    def to_chrome_trace(self, filename, core_names=None):
+        """
+        Export the trace in the Chrome trace event format, which can be viewed as a timeline in chrome://tracing or Perfetto.
+        Every execution of a task copy becomes a complete ("X") event on its core's row, and faults/cancellations are also
+        shown as instant events. Simulation time (ms) is mapped to trace time (us).
+
+        filename: the .json file to write to
+        core_names: optional dict of core id -> row name
+        """
+        core_names = dict() if core_names is None else core_names
+        events = []
+        running = dict()    # core -> (start time, task id) of the copy currently executing on it
+        for time, core, task, kind in self.get_records().tolist():
+            if kind in (TraceRecorder.START, TraceRecorder.BACKUP_START):
+                running[core] = (time, task)
+                continue
+            if core in running and running[core][1] == task:
+                start, _ = running.pop(core)
+                events.append({"name": "Task {0}".format(task), "ph": "X", "pid": 0, "tid": core,
+                               "ts": start * 1000, "dur": (time - start) * 1000,
+                               "args": {"end": TraceRecorder.KIND_NAMES[kind]}})
+            if kind in (TraceRecorder.FAULT, TraceRecorder.BACKUP_CANCEL):
+                events.append({"name": "{0} (Task {1})".format(TraceRecorder.KIND_NAMES[kind], task), "ph": "i", "s": "t",
+                               "pid": 0, "tid": core, "ts": time * 1000})
+
+        # name the rows
+        for core in np.unique(self.get_records()["core"]).tolist():
+            if core in core_names:
+                name = core_names[core]
+            elif core == TraceRecorder.HP_CORE:
+                name = "HP_Core"
+            elif core < 0:
+                name = "HP_Core{0}".format(TraceRecorder.HP_CORE - core)
+            else:
+                name = "LP_Core{0}".format(core)
+            events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": core, "args": {"name": name}})
+
+        with open(filename, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
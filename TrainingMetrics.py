@@ -0,0 +1,183 @@
+import csv
+import os
+import time
+import gym
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+def observation_nbytes(observation):
+    """
+    Get the size in bytes of an observation: the sum over its arrays, for a Dict observation.
+
+    observation: the observation, an array or a dict of arrays
+    """
+    if isinstance(observation, dict):
+        return sum(observation_nbytes(value) for value in observation.values())
+    return np.asarray(observation).nbytes
+
+
+class TimedEnv(gym.Wrapper):
+    """
+    Class which wraps an env (e.g. EnSuReEnv) to time its reset() and step() calls, and measure the size of the observations
+    they return. The totals are read with get_timings() (e.g. by TrainingMetricsCallback through VecEnv.env_method(), which
+    works for subprocess envs too).
+    """
+    def __init__(self, env):
+        """
+        Class constructor (__init__).
+
+        env: the env to wrap
+        """
+        super(TimedEnv, self).__init__(env)
+        self.reset_time = 0.0   # total time spent in reset(), in s
+        self.step_time = 0.0    # total time spent in step(), in s
+        self.num_resets = 0
+        self.num_steps = 0
+        self.obs_bytes = 0      # total size of the observations returned by step(), in bytes
+
+    def reset(self, **kwargs):
+        """
+        Reset the wrapped env, timing the call.
+        """
+        start = time.perf_counter()
+        observation = self.env.reset(**kwargs)
+        self.reset_time += time.perf_counter() - start
+        self.num_resets += 1
+        return observation
+
+    def step(self, action):
+        """
+        Take a step of the wrapped env, timing the call and measuring the returned observation.
+
+        action: the action to take
+        """
+        start = time.perf_counter()
+        result = self.env.step(action)
+        self.step_time += time.perf_counter() - start
+        self.num_steps += 1
+        self.obs_bytes += observation_nbytes(result[0])
+        return result
+
+    def get_timings(self):
+        """
+        Get the totals recorded so far: {"reset_time", "step_time", "num_resets", "num_steps", "obs_bytes"}.
+        """
+        return {"reset_time": self.reset_time, "step_time": self.step_time, "num_resets": self.num_resets,
+                "num_steps": self.num_steps, "obs_bytes": self.obs_bytes}
+
+
+class TrainingMetricsCallback(BaseCallback):
+    """
+    Class which reports where the time of a stable_baselines3 training run goes, every log_interval env steps:
+    - env steps per second over the interval
+    - the share of the interval's wall time spent in env resets and env steps (from the TimedEnv wrappers of the training env),
+      in replay buffer sampling and in the rest of the learner updates (gradient steps), and elsewhere (e.g. action prediction)
+    - the observation bytes per env step
+    The learner update time is the time between the end of a rollout collection and the start of the next one, and the
+    replay buffer sampling time is measured by timing the replay buffer's sample() (off-policy algorithms only).
+    Each report is appended as a row to a CSV file, and recorded into the model's logger under "throughput/".
+    """
+    COLUMNS = ["timesteps", "wall_time", "steps_per_sec", "reset_share", "step_share", "sample_share", "update_share",
+               "other_share", "obs_bytes_per_step", "episodes"]
+
+    def __init__(self, filename, log_interval=1000, verbose=0):
+        """
+        Class constructor (__init__).
+
+        filename: the CSV file to append the reports to (its header is written if it does not exist yet)
+        log_interval: number of env steps between reports
+        verbose: whether to print each report
+        """
+        super(TrainingMetricsCallback, self).__init__(verbose)
+        self.filename = filename
+        self.log_interval = log_interval
+        self.learner_time = 0.0     # total time spent in learner updates, in s
+        self.sample_time = 0.0      # total time spent sampling the replay buffer, in s
+        self.rollout_end = None     # time the last rollout collection ended
+        self.sample = None          # the replay buffer's own sample(), while it is being timed
+        self.last = None            # totals at the last report
+
+    def get_totals(self):
+        """
+        Get the totals recorded so far, summed over the envs of the training env.
+        """
+        totals = {"wall_time": time.perf_counter(), "learner_time": self.learner_time, "sample_time": self.sample_time,
+                  "reset_time": 0.0, "step_time": 0.0, "num_resets": 0, "num_steps": 0, "obs_bytes": 0}
+        for timings in self.training_env.env_method("get_timings"):
+            for key, value in timings.items():
+                totals[key] += value
+        return totals
+
+    def _on_training_start(self):
+        buffer = getattr(self.model, "replay_buffer", None)
+        if buffer is not None:
+            self.sample = buffer.sample
+
+            def timed_sample(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return self.sample(*args, **kwargs)
+                finally:
+                    self.sample_time += time.perf_counter() - start
+            buffer.sample = timed_sample
+        if not os.path.exists(self.filename):
+            with open(self.filename, "w", newline="") as f:
+                csv.writer(f).writerow(TrainingMetricsCallback.COLUMNS)
+        self.last = self.get_totals()
+        self.last["timesteps"] = self.num_timesteps
+
+    def _on_rollout_start(self):
+        if self.rollout_end is not None:
+            self.learner_time += time.perf_counter() - self.rollout_end
+            self.rollout_end = None
+
+    def _on_rollout_end(self):
+        self.rollout_end = time.perf_counter()
+
+    def _on_step(self):
+        if self.num_timesteps - self.last["timesteps"] >= self.log_interval:
+            self.report()
+        return True
+
+    def _on_training_end(self):
+        self._on_rollout_start()
+        if self.num_timesteps > self.last["timesteps"]:
+            self.report()
+        if self.sample is not None:
+            self.model.replay_buffer.sample = self.sample
+            self.sample = None
+
+    def report(self):
+        """
+        Report the metrics of the interval since the last report.
+        """
+        totals = self.get_totals()
+        totals["timesteps"] = self.num_timesteps
+        delta = {key: totals[key] - self.last[key] for key in totals}
+        wall_time = max(delta["wall_time"], 1e-9)
+        shares = {
+            "reset_share": delta["reset_time"] / wall_time,
+            "step_share": delta["step_time"] / wall_time,
+            "sample_share": delta["sample_time"] / wall_time,
+            "update_share": (delta["learner_time"] - delta["sample_time"]) / wall_time,
+        }
+        row = {
+            "timesteps": self.num_timesteps,
+            "wall_time": delta["wall_time"],
+            "steps_per_sec": delta["num_steps"] / wall_time,
+            **shares,
+            "other_share": 1 - sum(shares.values()),
+            "obs_bytes_per_step": delta["obs_bytes"] / delta["num_steps"] if delta["num_steps"] > 0 else 0,
+            "episodes": delta["num_resets"],
+        }
+        with open(self.filename, "a", newline="") as f:
+            csv.writer(f).writerow([row[column] for column in TrainingMetricsCallback.COLUMNS])
+        for key, value in row.items():
+            if key != "timesteps":
+                self.logger.record("throughput/" + key, value)
+        if self.verbose:
+            print("{0} steps: {1:.0f} steps/s, reset {2:.0%}, step {3:.0%}, sample {4:.0%}, update {5:.0%}, {6:.0f} obs bytes/step".format(
+                row["timesteps"], row["steps_per_sec"], row["reset_share"], row["step_share"], row["sample_share"],
+                row["update_share"], row["obs_bytes_per_step"]))
+        self.last = totals
@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the FEST, EnSuRe and EnSuRe-RL schedulers.
+
+Run from the repository root with:
+    python -m benchmarks
+"""
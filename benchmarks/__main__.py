@@ -0,0 +1,58 @@
+"""
+Command-line entry point for the scheduler benchmarks.
+
+    python -m benchmarks                      run all sweeps, append to the history file, compare to the baseline
+    python -m benchmarks --save-baseline      ... and store this run as the new baseline
+    python -m benchmarks --schedulers FEST --sweeps n k --repeat 1
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.scheduler_bench import SCHEDULERS, SWEEPS, run_benchmarks, make_run_record, append_history, compare_to_baseline
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the FEST/EnSuRe schedulers.")
+    parser.add_argument("--schedulers", nargs="+", default=SCHEDULERS, choices=SCHEDULERS)
+    parser.add_argument("--sweeps", nargs="+", default=list(SWEEPS), choices=list(SWEEPS), help="parameters to sweep")
+    parser.add_argument("--repeat", type=int, default=3, help="no. times each phase is timed (the minimum is kept)")
+    parser.add_argument("--history", default=os.path.join(BENCH_DIR, "history.json"), help="JSON file results are appended to")
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"), help="JSON file with the baseline run")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.schedulers, {param: SWEEPS[param] for param in args.sweeps}, args.repeat)
+    record = make_run_record(results)
+    append_history(record, args.history)
+    print("Results appended to {0}".format(args.history))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(record, f, indent=1)
+        print("Baseline saved to {0}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found at {0}, run with --save-baseline to create one".format(args.baseline))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(record, baseline, args.threshold)
+    if not regressions:
+        print("No regressions against baseline ({0})".format(baseline.get("git_revision")))
+        return 0
+
+    print("Regressions against baseline ({0}):".format(baseline.get("git_revision")))
+    for key, phase, base_time, current_time, ratio in regressions:
+        print("  {0} {1}: {2:.4f} s -> {3:.4f} s ({4:.2f}x)".format(key, phase, base_time, current_time, ratio))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from ast import literal_eval
+from csv import reader
+
+import numpy as np
+
+from System import System
+from Task import Task
+from ApproxTask import ApproxTask
+from TasksetGenerator import TasksetGenerator
+
+# Configuration every sweep starts from; each sweep varies exactly one of these parameters
+BASE_CONFIG = {
+    "n": 100,            # no. tasks in set
+    "time_step": 0.01,   # simulation time step, in ms
+    "m_pri": 2,          # no. LP cores (FEST always uses 1)
+    "k": 5,              # no. faults
+    "windows": 10,       # no. deadline windows (EnSuRe only)
+}
+
+# One-factor-at-a-time sweeps around BASE_CONFIG
+SWEEPS = {
+    "n": [50, 100, 200, 400],
+    "time_step": [0.1, 0.01, 0.001],
+    "m_pri": [1, 2, 4, 8],
+    "k": [1, 5, 20, 40],
+    "windows": [1, 5, 10, 20],
+}
+
+SCHEDULERS = ["FEST", "EnSuRe", "EnSuRe-RL"]
+
+# Other parameters that stay fixed for every benchmark cell
+FRAME = 200
+SYS_UTIL = 0.4
+LP_HP_RATIO = 0.8
+PRECISION_TASKGEN = 2
+SEED = 50
+
+# Phases that are timed in every cell
+PHASES = ["generate_schedule", "generate_fault_occurrences", "simulate"]
+
+
+def make_taskset(scheduler_type, n, m_pri, windows, directory):
+    """
+    Generate a taskset with TasksetGenerator and load it as a list of Task/ApproxTask objects.
+    The deadlines are re-drawn so that the taskset has exactly `windows` distinct deadline windows.
+
+    scheduler_type: "FEST", "EnSuRe" or "EnSuRe-RL"
+    n: no. tasks in set
+    m_pri: no. LP cores the taskset utilisation is scaled for
+    windows: no. deadline windows
+    directory: directory to write the intermediate CSV file to
+    """
+    filename = os.path.join(directory, "bench_n{0}_cores{1}.csv".format(n, m_pri))
+    TasksetGenerator("normal", n, FRAME, SYS_UTIL, PRECISION_TASKGEN, m_pri, LP_HP_RATIO, SEED).generate(filename)
+    with open(filename) as read_obj:
+        tasks_data = [tuple(map(literal_eval, x)) for x in map(tuple, reader(read_obj))]
+
+    # as in TasksetGenerator, deadlines are spread between a minimum window size and the frame;
+    # every window gets at least one task, so the number of distinct deadlines is exactly `windows`
+    min_window_size = round(FRAME * SYS_UTIL)
+    possible_deadlines = [min_window_size + (FRAME - min_window_size) * (w + 1) / windows for w in range(windows)]
+    rng = np.random.default_rng(SEED)
+    choice = np.concatenate([np.arange(windows), rng.integers(0, windows, max(0, n - windows))])[:n]
+
+    tasks = []
+    for i, task in enumerate(tasks_data):
+        if scheduler_type == "FEST":
+            tasks.append(Task(task[0], task[1], task[2]))
+        else:
+            tasks.append(ApproxTask(task[0], task[1], task[2], possible_deadlines[choice[i]]))
+    return tasks
+
+
+def run_fault_generation(scheduler_type, scheduler):
+    """
+    Generate one round of fault occurrences on a scheduler that already has a schedule.
+    Returns the number of generate_fault_occurrences() calls made.
+    """
+    if scheduler_type != "FEST":  # EnSuRe-style: one call per time window
+        for i in range(len(scheduler.deadlines)):
+            for t in scheduler.pri_schedule[i].values():
+                t.resetEncounteredFault()
+            scheduler.generate_fault_occurrences(i)
+        return len(scheduler.deadlines)
+    scheduler.generate_fault_occurrences()
+    return 1
+
+
+def effective_config(scheduler_type, config):
+    """
+    Get the configuration a scheduler actually runs with: FEST always has one LP core and a single frame deadline.
+    """
+    if scheduler_type == "FEST":
+        return dict(config, m_pri=1, windows=1)
+    return dict(config)
+
+
+def run_cell(scheduler_type, config, repeat, directory):
+    """
+    Benchmark one (scheduler, configuration) cell.
+    Each phase is timed `repeat` times (the minimum is kept), and the peak memory of one full
+    generate_schedule + simulate run is measured separately with tracemalloc.
+
+    Returns a dict of results, with "status" set to "ok", "infeasible", "skipped" or "error".
+    """
+    config = effective_config(scheduler_type, config)
+    m_pri = config["m_pri"]
+    result = {"scheduler": scheduler_type, "config": config}
+
+    try:
+        System(scheduler_type, config["k"], FRAME, config["time_step"], m_pri, LP_HP_RATIO)
+    except Exception as e:     # e.g. stable_baselines3 or the trained model is unavailable
+        result["status"] = "skipped"
+        result["reason"] = "{0}: {1}".format(type(e).__name__, e)
+        return result
+
+    taskset = make_taskset(scheduler_type, config["n"], m_pri, config["windows"], directory)
+    timings = {phase: [] for phase in PHASES}
+    iterations = {}
+    try:
+        for r in range(repeat):
+            random.seed(SEED + r)
+            system = System(scheduler_type, config["k"], FRAME, config["time_step"], m_pri, LP_HP_RATIO)
+            scheduler = system.scheduler
+            tasks = copy.deepcopy(taskset)
+
+            # i. schedule generation
+            start = time.perf_counter()
+            feasible = scheduler.generate_schedule(tasks)
+            timings["generate_schedule"].append(time.perf_counter() - start)
+            if not feasible:
+                result["status"] = "infeasible"
+                return result
+            iterations["generate_schedule"] = len(taskset)
+
+            # ii. fault generation, on a copy so that the faults do not leak into the simulation
+            fault_scheduler = copy.deepcopy(scheduler)
+            start = time.perf_counter()
+            iterations["generate_fault_occurrences"] = run_fault_generation(scheduler_type, fault_scheduler)
+            timings["generate_fault_occurrences"].append(time.perf_counter() - start)
+
+            # iii. simulation (includes its own fault generation, as in System.run)
+            start = time.perf_counter()
+            scheduler.simulate(system.lp_cores, system.hp_cores)
+            timings["simulate"].append(time.perf_counter() - start)
+            iterations["simulate"] = int(round(FRAME / config["time_step"]))
+
+        # peak memory of a full schedule + simulate run
+        random.seed(SEED)
+        system = System(scheduler_type, config["k"], FRAME, config["time_step"], m_pri, LP_HP_RATIO)
+        tracemalloc.start()
+        system.run(taskset)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        result["status"] = "error"
+        result["reason"] = "{0}: {1}".format(type(e).__name__, e)
+        return result
+
+    result["status"] = "ok"
+    result["peak_memory_bytes"] = peak
+    result["phases"] = {}
+    for phase in PHASES:
+        wall = min(timings[phase])
+        result["phases"][phase] = {
+            "wall_time_s": wall,
+            "iterations": iterations[phase],
+            "iterations_per_s": iterations[phase] / wall if wall > 0 else None,
+        }
+    return result
+
+
+def cell_key(scheduler_type, config):
+    """
+    Key that identifies a benchmark cell across runs, used to match results against the baseline.
+    """
+    config = effective_config(scheduler_type, config)
+    return "{0}|n={1}|time_step={2}|m_pri={3}|k={4}|windows={5}".format(
+        scheduler_type, config["n"], config["time_step"], config["m_pri"], config["k"], config["windows"])
+
+
+def run_benchmarks(schedulers=None, sweeps=None, repeat=3, log=print):
+    """
+    Run every sweep for every scheduler. Cells shared between sweeps (i.e. BASE_CONFIG) are only run once.
+
+    schedulers: list of scheduler types to benchmark (default: all)
+    sweeps: dict of parameter -> list of values (default: SWEEPS)
+    repeat: no. times each phase is timed
+    log: function used to report progress
+    """
+    schedulers = SCHEDULERS if schedulers is None else schedulers
+    sweeps = SWEEPS if sweeps is None else sweeps
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for scheduler_type in schedulers:
+            for param, values in sweeps.items():
+                for value in values:
+                    config = dict(BASE_CONFIG)
+                    config[param] = value
+                    key = cell_key(scheduler_type, config)
+                    if key in results:
+                        continue
+                    # the schedulers report infeasible/incomplete schedules on stdout; keep that out of the benchmark log
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        result = run_cell(scheduler_type, config, repeat, directory)
+                    results[key] = result
+                    if result["status"] == "ok":
+                        log("{0}: simulate {1:.4f} s".format(key, result["phases"]["simulate"]["wall_time_s"]))
+                    else:
+                        log("{0}: {1} {2}".format(key, result["status"], result.get("reason", "")))
+    return results
+
+
+def git_revision():
+    """
+    Get the current git commit hash, or None if it cannot be determined.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_run_record(results):
+    """
+    Wrap the results of one benchmark run with the metadata needed to compare runs.
+    """
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def append_history(record, filename):
+    """
+    Append a run record to the JSON history file (a list of run records), creating it if needed.
+    """
+    history = []
+    if os.path.exists(filename):
+        with open(filename) as f:
+            history = json.load(f)
+    history.append(record)
+    with open(filename, 'w') as f:
+        json.dump(history, f, indent=1)
+
+
+def compare_to_baseline(record, baseline, threshold):
+    """
+    Compare the wall times of a run against a baseline run.
+    Returns a list of (cell key, phase, baseline time, current time, ratio) for every phase that got
+    slower than `threshold` times its baseline.
+
+    record: the current run record
+    baseline: the baseline run record
+    threshold: ratio (current / baseline) above which a phase counts as a regression
+    """
+    regressions = []
+    for key, result in record["results"].items():
+        base = baseline["results"].get(key)
+        if result["status"] != "ok" or base is None or base["status"] != "ok":
+            continue
+        for phase in PHASES:
+            current_time = result["phases"][phase]["wall_time_s"]
+            base_time = base["phases"][phase]["wall_time_s"]
+            if base_time > 0 and current_time / base_time > threshold:
+                regressions.append((key, phase, base_time, current_time, current_time / base_time))
+    return regressions
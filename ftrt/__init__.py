@@ -0,0 +1,6 @@
+"""
+Command-line entry point for running FEST/EnSuRe experiments headless (e.g. from cron or a batch job scheduler).
+
+Run from the repository root with:
+    python -m ftrt sweep --help
+"""
@@ -0,0 +1,187 @@
+"""
+Command-line entry point for headless experiment sweeps.
+
+    python -m ftrt sweep --schedulers FEST EnSuRe --sys-utils 0.5 0.6 --cores 1 2 --out results.csv
+    python -m ftrt sweep --ratios 0.2 0.4 0.6 0.8 1.0 --k 20 40 --repeats 10 --jobs 16 --store sweep.sqlite --out results.json
+    python -m ftrt sweep --profile --out results.csv       ... and write the aggregated profile to results.csv.profile.json
+    python -m ftrt dataset --num-sets 100000 --time-step 0.01 --out-dir expert_data
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from ExpertDataset import ExpertDatasetBuilder
+from Pipeline import Pipeline, taskset_name
+from Profiler import aggregate_stats
+from Sweep import DEFAULT_PARAMS, Sweep
+
+
+def number(value):
+    """
+    Parse a command-line number, as an int if it is integral (so that e.g. --frame 200 gives the same sweep cells as the default).
+    """
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def taskset_configs(args):
+    """
+    Get the TasksetGenerator config of every taskset of the sweep: args.num_sets tasksets per system utilization.
+    """
+    return [dict(distribution=args.distribution, n=args.n, frame_duration=args.frame, sys_util=sys_util,
+                 precision_dp=args.precision, num_lpcores=args.taskset_cores, lp_hp_ratio=DEFAULT_PARAMS["lp_hp_ratio"],
+                 seed=args.seed + i)
+            for sys_util in args.sys_utils for i in range(args.num_sets)]
+
+
+def results_table(results, configs):
+    """
+    Flatten the result dicts of Pipeline.run() into a DataFrame, one row per cell, with a column per System parameter.
+    """
+    rows = []
+    for result in results:
+        config = configs[result["taskset"]]
+        row = {"scheduler": result["scheduler"], "sys_util": config["sys_util"], "taskset_seed": config["seed"], "seed": result["seed"]}
+        row.update(result["params"])
+        row.update({key: result.get(key) for key in ("feasible", "reason", "energy", "hp_active_duration", "wall_time")})
+        row["lp_active_durations"] = json.dumps(result["lp_active_durations"])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def stored_results_table(store, configs, scheduler_types, params, seeds):
+    """
+    Get every cell of the sweep that is recorded in the store, including the cells of earlier runs, as a DataFrame in the format
+    of results_table(). Cells of other sweeps in the same store are left out.
+    """
+    table = store.get_results()
+    names = {taskset_name(config): config for config in configs}
+    cell_values = {name: [value] for name, value in DEFAULT_PARAMS.items()}
+    cell_values.update(params)
+    selected = table["scheduler"].isin(scheduler_types) & table["taskset"].isin(names) & table["seed"].isin(seeds)
+    for column in table.columns.difference(Sweep.COLUMNS):
+        # the System parameters of the sweep take its values, the ones it does not set (e.g. of expected-energy cells) are unset
+        selected &= table[column].isin(cell_values[column]) if column in cell_values else table[column].isna()
+    table = table[selected]
+    configs = [names[name] for name in table["taskset"]]
+    columns = {"scheduler": table["scheduler"].to_list(), "sys_util": [config["sys_util"] for config in configs],
+               "taskset_seed": [config["seed"] for config in configs], "seed": table["seed"].to_list()}
+    columns.update({name: table[name].to_list() for name in cell_values})
+    columns.update({key: table[key].to_list() for key in ("feasible", "reason", "energy", "hp_active_duration", "wall_time",
+                                                          "lp_active_durations")})
+    return pd.DataFrame(columns)
+
+
+def write_table(table, filename):
+    """
+    Write the results to a .csv or .json file (by its extension).
+    """
+    if filename.endswith(".json"):
+        table.to_json(filename, orient="records", indent=1)
+    else:
+        table.to_csv(filename, index=False)
+
+
+def sweep(args):
+    """
+    Run the sweep command.
+    """
+    configs = taskset_configs(args)
+    params = {"k": args.k, "frame": [args.frame], "time_step": [args.time_step], "num_lp_cores": args.cores,
+              "lp_hp_ratio": args.ratios}
+    store = Sweep(args.store) if args.store else None
+
+    start = time.perf_counter()
+    results = Pipeline(args.jobs).run(configs, args.schedulers, params, range(args.repeats), sweep=store,
+                                      log_progress=args.verbose, profile=args.profile)
+    wall_time = time.perf_counter() - start
+    if store is not None:
+        # the cells recorded by earlier runs were skipped, so the table is read back from the store
+        table = stored_results_table(store, configs, args.schedulers, params, range(args.repeats))
+        store.close()
+    else:
+        table = results_table(results, configs)
+    write_table(table, args.out)
+    print("{0} cells ({1} run) in {2:.1f} s, results written to {3}".format(len(table), len(results), wall_time, args.out))
+    if len(table) > 0:
+        feasible = table[table["feasible"]]
+        summary = feasible.groupby(["scheduler", "sys_util", "num_lp_cores", "lp_hp_ratio", "k"])["energy"].agg(["mean", "std", "count"])
+        print(summary.to_string())
+
+    if args.profile:
+        profile = aggregate_stats([result["profile"] for result in results if "profile" in result])
+        with open(args.out + ".profile.json", 'w') as f:
+            json.dump(profile, f, indent=1)
+        print("Profile written to {0}.profile.json".format(args.out))
+    return 0
+
+
+def dataset(args):
+    """
+    Run the dataset command.
+    """
+    params = {"k": args.k, "frame": args.frame, "time_step": args.time_step, "num_lp_cores": args.cores, "lp_hp_ratio": args.ratio}
+    start = time.perf_counter()
+    manifest = ExpertDatasetBuilder(args.out_dir, params, args.jobs, args.shard_rows).build(taskset_configs(args), args.verbose)
+    print("{0} tasksets ({1} infeasible) in {2:.1f} s: {3} rows in {4} shards, written to {5}".format(
+        manifest["tasksets"], manifest["infeasible"], time.perf_counter() - start, manifest["rows"], len(manifest["shards"]), args.out_dir))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ftrt", description="Run FEST/EnSuRe experiments headless.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_sweep = commands.add_parser("sweep", help="run a sweep over tasksets and System parameters, writing the results to a file",
+                                       formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser_sweep.add_argument("--schedulers", nargs="+", default=["FEST", "EnSuRe"], choices=["FEST", "FEST-Large", "EnSuRe", "EnSuRe-RL"])
+    parser_sweep.add_argument("--sys-utils", nargs="+", type=float, default=[0.5], help="system utilizations of the tasksets")
+    parser_sweep.add_argument("--cores", nargs="+", type=int, default=[DEFAULT_PARAMS["num_lp_cores"]], help="no. LP cores")
+    parser_sweep.add_argument("--ratios", nargs="+", type=float, default=[DEFAULT_PARAMS["lp_hp_ratio"]], help="LP:HP speed ratios")
+    parser_sweep.add_argument("--k", nargs="+", type=int, default=[DEFAULT_PARAMS["k"]], help="no. faults")
+    parser_sweep.add_argument("--repeats", type=int, default=5, help="no. fault scenarios (seeds) per cell")
+    parser_sweep.add_argument("--num-sets", type=int, default=4, help="no. tasksets per system utilization")
+    parser_sweep.add_argument("--n", type=int, default=100, help="no. tasks per taskset")
+    parser_sweep.add_argument("--frame", type=number, default=DEFAULT_PARAMS["frame"], help="frame duration, in ms")
+    parser_sweep.add_argument("--time-step", type=float, default=DEFAULT_PARAMS["time_step"], help="simulation time step, in ms")
+    parser_sweep.add_argument("--distribution", default="normal", choices=["normal", "uniform"], help="execution time distribution")
+    parser_sweep.add_argument("--precision", type=int, default=2, help="decimal places of the generated execution times")
+    parser_sweep.add_argument("--taskset-cores", type=int, default=1, help="no. LP cores the tasksets are generated for")
+    parser_sweep.add_argument("--seed", type=int, default=50, help="seed of the first taskset of each system utilization")
+    parser_sweep.add_argument("--jobs", type=int, default=os.cpu_count(), help="no. worker processes")
+    parser_sweep.add_argument("--profile", action="store_true", help="record per-phase timers and counters, written to OUT.profile.json")
+    parser_sweep.add_argument("--out", default="results.csv", help="results file (.csv or .json)")
+    parser_sweep.add_argument("--store", help="SQLite store to record cells into as they complete; cells already in it are skipped, and read back from it into OUT")
+    parser_sweep.add_argument("--verbose", action="store_true", help="print a line per cell")
+    parser_sweep.set_defaults(func=sweep)
+
+    parser_dataset = commands.add_parser("dataset", help="build an expert-trajectory dataset from EnSuRe, for pretraining the RL policy",
+                                         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser_dataset.add_argument("--sys-utils", nargs="+", type=float, default=[0.5], help="system utilizations of the tasksets")
+    parser_dataset.add_argument("--cores", type=int, default=DEFAULT_PARAMS["num_lp_cores"], help="no. LP cores")
+    parser_dataset.add_argument("--ratio", type=float, default=DEFAULT_PARAMS["lp_hp_ratio"], help="LP:HP speed ratio")
+    parser_dataset.add_argument("--k", type=int, default=DEFAULT_PARAMS["k"], help="no. faults")
+    parser_dataset.add_argument("--num-sets", type=int, default=1000, help="no. tasksets per system utilization")
+    parser_dataset.add_argument("--n", type=int, default=100, help="no. tasks per taskset")
+    parser_dataset.add_argument("--frame", type=number, default=DEFAULT_PARAMS["frame"], help="frame duration, in ms")
+    parser_dataset.add_argument("--time-step", type=float, default=DEFAULT_PARAMS["time_step"], help="simulation time step, in ms")
+    parser_dataset.add_argument("--distribution", default="normal", choices=["normal", "uniform"], help="execution time distribution")
+    parser_dataset.add_argument("--precision", type=int, default=2, help="decimal places of the generated execution times")
+    parser_dataset.add_argument("--taskset-cores", type=int, default=1, help="no. LP cores the tasksets are generated for")
+    parser_dataset.add_argument("--seed", type=int, default=50, help="seed of the first taskset of each system utilization")
+    parser_dataset.add_argument("--jobs", type=int, default=os.cpu_count(), help="no. worker processes")
+    parser_dataset.add_argument("--shard-rows", type=int, default=1000000, help="no. rows after which a shard is written")
+    parser_dataset.add_argument("--out-dir", default="expert_data", help="directory of the shards and manifest.json")
+    parser_dataset.add_argument("--verbose", action="store_true", help="print a line per shard")
+    parser_dataset.set_defaults(func=dataset)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())